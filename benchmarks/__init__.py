@@ -0,0 +1,30 @@
+# coding: utf-8
+
+"""
+Benchmarks
+==========
+
+This package measures the overhead of :class:`flask_sustainable.Sustainable`
+on the requests of a Flask test application:
+
+- ``indicator``: each indicator and score, requested with the ``Perf`` header,
+  compared to ``baseline`` (the extension without any header requested)
+  and ``plain`` (the application without the extension)
+- ``codec``: each codec, for payloads from 100 B to 50 MB
+  of several content types (HTML, JSON and random text)
+- ``dictionary``: small JSON responses with a shared dictionary (``dcz``)
+  and with zstd
+- ``parallel``: large bodies compressed on a pool of threads and inline
+
+For each scenario, the throughput, the p50 and p99 latencies
+and the peak memory allocated by a request are reported.
+
+.. code-block:: bash
+
+    $ python -m benchmarks --quick --output benchmark.json
+    $ python -m benchmarks --filter "indicator/*" --filter "codec/zstd/*"
+    $ python -m benchmarks --quick --baseline benchmark.json
+
+With ``--baseline``, the exit code is 1 when a scenario is slower
+(or allocates more memory) than in the baseline, beyond the tolerance.
+"""
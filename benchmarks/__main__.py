@@ -0,0 +1,257 @@
+# coding: utf-8
+
+"""
+Runner module
+=============
+
+This module runs the scenarios, saves the results as JSON
+and compares them to a baseline.
+
+.. code-block:: bash
+
+    $ python -m benchmarks --help
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Sequence
+
+import flask_sustainable
+from benchmarks.scenarios import Scenario, all_scenarios
+
+#: Metrics compared to the baseline, with the absolute difference ignored
+COMPARED: Dict[str, float] = {"p50_ms": 0.05, "peak_memory_bytes": 64 * 1024}
+
+
+def _version(distribution: str) -> str:
+    """Get the version of an installed distribution.
+
+    :param distribution: The name of the distribution
+    :type distribution: str
+    :return: The version, None if it's unknown
+    :rtype: str
+    """
+    try:
+        from importlib.metadata import (  # pylint: disable=import-outside-toplevel
+            version,
+        )
+    except ImportError:  # Python 3.7
+        return None
+    return version(distribution)
+
+
+def percentile(values: Sequence[float], quantile: float) -> float:
+    """Get a percentile with the nearest-rank method.
+
+    :param values: The values, sorted
+    :type values: Sequence[float]
+    :param quantile: The quantile, from 0 to 1
+    :type quantile: float
+    :return: The value at the quantile
+    :rtype: float
+    """
+    return values[max(math.ceil(quantile * len(values)) - 1, 0)]
+
+
+def peak_memory(scenario: Scenario) -> int:
+    """Measure the memory allocated by a request.
+
+    The memory is traced in a separate request, the tracing slows the allocations.
+
+    :param scenario: The scenario
+    :type scenario: Scenario
+    :return: The peak of the traced memory in bytes
+    :rtype: int
+    """
+    client, headers = scenario.app.test_client(), scenario.headers
+    gc.collect()
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+        tracemalloc.reset_peak()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        client.get(scenario.path, headers=headers).close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return max(peak - start, 0)
+
+
+def run(
+    scenario: Scenario,
+    min_time: float = 1.0,
+    min_iterations: int = 5,
+    max_iterations: int = 10000,
+) -> dict:
+    """Run a scenario.
+
+    The request is sent until ``min_time`` seconds have elapsed,
+    at least ``min_iterations`` and at most ``max_iterations`` times.
+
+    :param scenario: The scenario
+    :type scenario: Scenario
+    :param min_time: The minimum duration in seconds, defaults to 1
+    :type min_time: float
+    :param min_iterations: The minimum number of requests, defaults to 5
+    :type min_iterations: int
+    :param max_iterations: The maximum number of requests, defaults to 10000
+    :type max_iterations: int
+    :raises AssertionError: If the response isn't the expected one
+    :return: The number of requests, the throughput (requests and megabytes
+        per second), the latencies in milliseconds, the peak memory in bytes
+        and the sizes of the body
+    :rtype: dict
+    """
+    client, headers = scenario.app.test_client(), scenario.headers
+    # Warm up: caches, energy sampler, ...
+    response = client.get(scenario.path, headers=headers)
+    assert response.status_code == 200, (scenario.name, response.status)
+    assert response.content_encoding == scenario.encoding, scenario.name
+    size_out = len(response.data)
+    response.close()
+    gc.collect()
+    timings: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < max_iterations and (
+        len(timings) < min_iterations or time.perf_counter() < deadline
+    ):
+        start = time.perf_counter()
+        client.get(scenario.path, headers=headers).close()
+        timings.append(time.perf_counter() - start)
+    total = sum(timings)
+    timings.sort()
+    return {
+        "group": scenario.group,
+        "iterations": len(timings),
+        "requests_per_second": len(timings) / total,
+        "megabytes_per_second": scenario.size * len(timings) / total / 1e6,
+        "mean_ms": total / len(timings) * 1000,
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "peak_memory_bytes": peak_memory(scenario),
+        "size_in": scenario.size,
+        "size_out": size_out,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.2) -> List[str]:
+    """Compare results to a baseline.
+
+    A metric regresses when it exceeds the baseline by more than the tolerance,
+    and by more than the absolute difference of :data:`COMPARED`.
+
+    :param results: The results, see :func:`main`
+    :type results: dict
+    :param baseline: The results of the baseline
+    :type baseline: dict
+    :param tolerance: The relative increase tolerated, defaults to 20%
+    :type tolerance: float
+    :return: The description of each regression
+    :rtype: List[str]
+    """
+    regressions = []
+    for name, result in results["scenarios"].items():
+        reference = baseline["scenarios"].get(name)
+        if reference is None:
+            continue
+        for metric, minimum in COMPARED.items():
+            value, expected = result[metric], reference[metric]
+            if value > expected * (1 + tolerance) and value - expected > minimum:
+                regressions.append(
+                    f"{name}: {metric} {expected:.6g} -> {value:.6g} "
+                    f"(+{(value / expected - 1) * 100 if expected else math.inf:.0f}%)"
+                )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the benchmarks.
+
+    :param argv: The arguments, defaults to the arguments of the command line
+    :type argv: List[str]
+    :return: The exit code, 1 if there is a regression
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description=sys.modules["benchmarks"].__doc__
+    )
+    parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    parser.add_argument(
+        "--quick", action="store_true", help="Payloads of at most 1 MB."
+    )
+    parser.add_argument(
+        "--filter",
+        "-k",
+        action="append",
+        default=[],
+        help="Run the scenarios matching a pattern (e.g. 'codec/gzip/*'), "
+        "can be repeated.",
+    )
+    parser.add_argument("--min-time", type=float, default=1.0)
+    parser.add_argument("--min-iterations", type=int, default=5)
+    parser.add_argument("--max-iterations", type=int, default=10000)
+    parser.add_argument("--output", "-o", help="Save the results in this file.")
+    parser.add_argument("--baseline", "-b", help="Compare to the results of a file.")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Defaults to 0.2 (20%%)."
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "flask": _version("flask"),
+            "werkzeug": _version("werkzeug"),
+            "flask_sustainable": flask_sustainable.__version__,
+            "quick": args.quick,
+            "timestamp": time.time(),
+        },
+        "scenarios": {},
+    }
+    print(
+        f"{'scenario':<40} {'requests':>9} {'req/s':>10} {'MB/s':>9}"
+        f" {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'ratio':>6}"
+    )
+    for scenario in all_scenarios(args.quick):
+        if args.filter and not any(
+            fnmatch.fnmatchcase(scenario.name, x) for x in args.filter
+        ):
+            continue
+        result = run(scenario, args.min_time, args.min_iterations, args.max_iterations)
+        results["scenarios"][scenario.name] = result
+        ratio = result["size_out"] / result["size_in"] if result["size_in"] else 1.0
+        print(
+            f"{scenario.name:<40} {result['iterations']:>9}"
+            f" {result['requests_per_second']:>10.1f}"
+            f" {result['megabytes_per_second']:>9.1f}"
+            f" {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f}"
+            f" {result['peak_memory_bytes'] / 1024:>10.1f} {ratio:>6.3f}",
+            flush=True,
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+# coding: utf-8
+
+"""
+Scenarios module
+================
+
+This module builds the applications and the requests of the benchmarks.
+
+The applications are built when a scenario runs:
+the scenarios that aren't selected cost nothing (energy sampler, dictionary, ...).
+"""
+
+import base64
+import functools
+import os
+from typing import Callable, Dict, Iterator, List, Union
+
+import flask
+
+from flask_sustainable import Sustainable
+from flask_sustainable.codec import default_registry
+from flask_sustainable.compress import CompressionPolicy
+from flask_sustainable.dictionary import CompressionDictionary
+from flask_sustainable.indicator import (
+    PerfCPU,
+    PerfEnergy,
+    PerfPower,
+    PerfRAM,
+    PerfTime,
+)
+from flask_sustainable.parallel import ParallelCompressor
+from flask_sustainable.score import PerfScoreCO2
+
+#: Sizes of the payloads in bytes
+SIZES: tuple = (100, 10_000, 1_000_000, 10_000_000, 50_000_000)
+#: Sizes of the payloads with ``--quick``
+QUICK_SIZES: tuple = (100, 10_000, 1_000_000)
+#: Mimetype of each kind of payload
+CONTENT_TYPES: Dict[str, str] = {
+    "html": "text/html",
+    "json": "application/json",
+    "random": "text/plain",
+}
+
+
+def lazy(factory: Callable[[], flask.Flask]) -> Callable[[], flask.Flask]:
+    """Build an application on the first call only.
+
+    :param factory: The function building the application
+    :type factory: Callable[[], flask.Flask]
+    :return: A function returning the application, shared by its scenarios
+    :rtype: Callable[[], flask.Flask]
+    """
+    return functools.lru_cache(maxsize=1)(factory)
+
+
+class Scenario:
+    """A request sent to an application."""
+
+    def __init__(
+        self,
+        name: str,
+        app: Callable[[], flask.Flask],
+        path: str = "/",
+        headers: Union[Dict[str, str], Callable[[], Dict[str, str]]] = None,
+        encoding: str = None,
+        size: int = 0,
+    ) -> None:
+        """Initialize the scenario.
+
+        :param name: The name of the scenario, its group is the first part
+        :type name: str
+        :param app: The function building the application, see :func:`lazy`
+        :type app: Callable[[], flask.Flask]
+        :param path: The path of the request, defaults to ``/``
+        :type path: str
+        :param headers: The headers of the request (optional),
+            or a function returning them when the scenario runs
+        :type headers: Union[Dict[str, str], Callable[[], Dict[str, str]]]
+        :param encoding: The Content-Encoding expected in the response (optional)
+        :type encoding: str
+        :param size: The size of the uncompressed body in bytes, defaults to 0
+        :type size: int
+        """
+        self.name = name
+        self.group = name.split("/")[0]
+        self._app = app
+        self.path = path
+        self._headers = headers or {}
+        self.encoding = encoding
+        self.size = size
+
+    @property
+    def app(self) -> flask.Flask:
+        """The application, built on the first access."""
+        return self._app()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """The headers of the request."""
+        return self._headers() if callable(self._headers) else self._headers
+
+
+def _item(kind: str, index: int) -> str:
+    """Make an item of a payload.
+
+    :param kind: ``json`` or ``html``
+    :type kind: str
+    :param index: The index of the item
+    :type index: int
+    :return: A JSON object or an HTML list item
+    :rtype: str
+    """
+    if kind == "json":
+        active = "true" if index % 3 else "false"
+        return (
+            f'{{"id": {index}, "name": "user {index}", '
+            f'"active": {active}, "score": {index % 97 / 7:.3f}}}'
+        )
+    return f'<li class="item"><a href="/items/{index}">Item {index}</a></li>\n'
+
+
+@functools.lru_cache(maxsize=1)
+def make_payload(kind: str, size: int) -> bytes:
+    """Make a payload.
+
+    The payloads are deterministic, except ``random``.
+    The last one is cached: the scenarios of a payload follow each other.
+
+    :param kind: The kind of payload, see :data:`CONTENT_TYPES`
+    :type kind: str
+    :param size: The size of the payload in bytes
+    :type size: int
+    :return: The payload, truncated to the size
+    :rtype: bytes
+    """
+    if kind == "random":
+        return base64.b64encode(os.urandom(size * 3 // 4 + 3))[:size]
+    chunks, length, index = [], 0, 0
+    while length < size:
+        chunk = _item(kind, index).encode()
+        chunks.append(chunk)
+        length += len(chunk) + 1
+        index += 1
+    return b",".join(chunks)[:size]
+
+
+def make_app(**options) -> flask.Flask:
+    """Make the application of the benchmarks.
+
+    The routes are:
+
+    - ``/``: a short text
+    - ``/payload/<kind>/<size>``: a payload, see :func:`make_payload`
+
+    :param options: The options of the extension, see :class:`Sustainable`
+    :return: The application, with the extension at ``app.extensions["sustainable"]``
+    :rtype: flask.Flask
+    """
+    app = flask.Flask(__name__)
+
+    @app.route("/")
+    def _():
+        return "Welcome!"
+
+    @app.route("/payload/<kind>/<int:size>")
+    def _payload(kind: str, size: int):
+        return flask.Response(make_payload(kind, size), mimetype=CONTENT_TYPES[kind])
+
+    app.extensions["sustainable"] = Sustainable(
+        app, compress_policy=CompressionPolicy(min_size=0), **options
+    )
+    return app
+
+
+def make_plain_app() -> flask.Flask:
+    """Make the application of the benchmarks, without the extension.
+
+    :return: The application with the ``/`` route
+    :rtype: flask.Flask
+    """
+    app = flask.Flask(__name__)
+    app.add_url_rule("/", view_func=lambda: "Welcome!")
+    return app
+
+
+def make_indicator_app() -> flask.Flask:
+    """Make the application of the benchmarks with all the indicators and scores.
+
+    :return: The application, see :func:`make_app`
+    :rtype: flask.Flask
+    """
+    app = make_app()
+    sustainable: Sustainable = app.extensions["sustainable"]
+    sustainable.add_indicators(
+        PerfTime(), PerfCPU(), PerfRAM(), PerfEnergy(), PerfPower()
+    )
+    sustainable.add_score(PerfScoreCO2())
+    return app
+
+
+@functools.lru_cache(maxsize=1)
+def make_dictionary() -> CompressionDictionary:
+    """Train a dictionary on responses similar to the JSON payloads.
+
+    :return: The dictionary, trained once
+    :rtype: CompressionDictionary
+    """
+    samples: List[bytes] = [
+        ",".join(_item("json", x * 10 + y) for y in range(10)).encode()
+        for x in range(500)
+    ]
+    return CompressionDictionary.train(samples)
+
+
+def make_dictionary_app() -> flask.Flask:
+    """Make the application of the benchmarks with a shared dictionary.
+
+    :return: The application, see :func:`make_app`
+    :rtype: flask.Flask
+    """
+    return make_app(compress_dictionary=make_dictionary())
+
+
+def indicator_scenarios() -> Iterator[Scenario]:
+    """Measure each indicator and score.
+
+    :return: The scenarios
+    :rtype: Iterator[Scenario]
+    """
+    yield Scenario("indicator/plain", lazy(make_plain_app))
+    app = lazy(make_indicator_app)
+    yield Scenario("indicator/baseline", app)
+    for name in ("Perf-Time", "Perf-CPU", "Perf-RAM", "Perf-Energy", "Perf-Power"):
+        yield Scenario(f"indicator/{name}", app, headers={"Perf": name})
+    yield Scenario(
+        "indicator/Perf-Score-1", app, headers={"Perf": "Perf-Energy, Perf-Score-1"}
+    )
+    yield Scenario(
+        "indicator/all",
+        app,
+        headers={
+            "Perf": "Perf-Time, Perf-CPU, Perf-RAM, Perf-Energy, Perf-Power, "
+            "Perf-Score-1"
+        },
+    )
+
+
+def codec_scenarios(sizes: tuple = SIZES) -> Iterator[Scenario]:
+    """Measure each codec with each payload.
+
+    :param sizes: The sizes of the payloads, defaults to :data:`SIZES`
+    :type sizes: tuple
+    :return: The scenarios
+    :rtype: Iterator[Scenario]
+    """
+    app = lazy(make_app)
+    for size in sizes:
+        for kind in CONTENT_TYPES:
+            path = f"/payload/{kind}/{size}"
+            yield Scenario(f"codec/identity/{kind}/{size}", app, path, size=size)
+            for encoding in default_registry().encodings:
+                yield Scenario(
+                    f"codec/{encoding}/{kind}/{size}",
+                    app,
+                    path,
+                    headers={"Accept-Encoding": encoding},
+                    encoding=encoding,
+                    size=size,
+                )
+
+
+def dictionary_scenarios(sizes: tuple = (1_000, 10_000)) -> Iterator[Scenario]:
+    """Measure the shared dictionary against zstd on small JSON responses.
+
+    :param sizes: The sizes of the payloads, defaults to 1 kB and 10 kB
+    :type sizes: tuple
+    :return: The scenarios
+    :rtype: Iterator[Scenario]
+    """
+    app = lazy(make_dictionary_app)
+    for size in sizes:
+        path = f"/payload/json/{size}"
+        yield Scenario(
+            f"dictionary/zstd/json/{size}",
+            app,
+            path,
+            headers={"Accept-Encoding": "zstd"},
+            encoding="zstd",
+            size=size,
+        )
+        yield Scenario(
+            f"dictionary/dcz/json/{size}",
+            app,
+            path,
+            headers=lambda: {
+                "Accept-Encoding": "dcz, zstd",
+                "Available-Dictionary": make_dictionary().available,
+            },
+            encoding="dcz",
+            size=size,
+        )
+
+
+def make_parallel_app() -> flask.Flask:
+    """Make the application of the benchmarks compressing on a pool of threads.
+
+    :return: The application, see :func:`make_app`
+    :rtype: flask.Flask
+    """
+    return make_app(compress_parallel=ParallelCompressor(threshold=0))
+
+
+def parallel_scenarios(sizes: tuple = (1_000_000, 10_000_000)) -> Iterator[Scenario]:
+    """Measure the parallel compression against the inline compression.
+
+    :param sizes: The sizes of the payloads, defaults to 1 MB and 10 MB
+    :type sizes: tuple
+    :return: The scenarios
+    :rtype: Iterator[Scenario]
+    """
+    inline = lazy(make_app)
+    parallel = lazy(make_parallel_app)
+    for size in sizes:
+        path = f"/payload/html/{size}"
+        for encoding in sorted(ParallelCompressor.ENCODINGS):
+            headers = {"Accept-Encoding": encoding}
+            for name, app in (("inline", inline), ("parallel", parallel)):
+                yield Scenario(
+                    f"parallel/{encoding}/{name}/{size}",
+                    app,
+                    path,
+                    headers=headers,
+                    encoding=encoding,
+                    size=size,
+                )
+
+
+def all_scenarios(quick: bool = False) -> Iterator[Scenario]:
+    """Get all the scenarios.
+
+    :param quick: If True, the payloads are at most 1 MB, defaults to False
+    :type quick: bool
+    :return: The scenarios
+    :rtype: Iterator[Scenario]
+    """
+    yield from indicator_scenarios()
+    yield from codec_scenarios(QUICK_SIZES if quick else SIZES)
+    yield from dictionary_scenarios()
+    yield from parallel_scenarios((1_000_000,) if quick else (1_000_000, 10_000_000))
@@ -0,0 +1,163 @@
+# coding: utf-8
+
+"""
+Accounting module
+=================
+
+This module measures the CPU time of a request, even when requests run concurrently.
+
+The CPU time of the process (:func:`time.process_time`) includes the work
+of all the threads, so the concurrent requests are counted together.
+The CPU time of the thread (:func:`time.thread_time`) is used instead.
+
+An ``async def`` view is run by Flask on an event loop in another thread,
+while the thread of the request waits. Its coroutine is wrapped
+(see :func:`install`): the CPU time of each step between two ``await``
+is added to the request, so the other coroutines of the loop aren't counted.
+The thread of the request only waits for the event loop: its CPU time
+during the call isn't counted, e.g. the import of ``asgiref``
+and the creation of the event loop by the first async request.
+
+The state is stored in a :class:`contextvars.ContextVar`,
+which follows the request in the thread of the event loop.
+
+.. code-block:: python
+
+    start = start_request()
+    # ... handle the request ...
+    cpu = cpu_time() - start
+"""
+
+import contextvars
+import functools
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Generator, List, Optional
+
+import flask
+
+# CPU time of the coroutines of the current request, in a mutable cell
+# shared with the context copied in the thread of the event loop
+_TASK_CPU: contextvars.ContextVar = contextvars.ContextVar(
+    "flask_sustainable_task_cpu", default=None
+)
+
+
+def start_request() -> float:
+    """Start the accounting of the coroutines of the current request.
+
+    It can be called by several indicators, the accounting starts once per request.
+
+    :return: The CPU time of the request at the start, see :func:`cpu_time`
+    :rtype: float
+    """
+    if not flask.g.get("perf_accounting"):
+        _TASK_CPU.set([0.0])
+        flask.g.perf_accounting = True
+    return cpu_time()
+
+
+def cpu_time() -> float:
+    """Get the CPU time of the current request.
+
+    It's the CPU time of the thread, plus the CPU time
+    of the coroutines of the request run in other threads.
+    Only the differences between two calls are meaningful.
+
+    :return: The CPU time in seconds
+    :rtype: float
+    """
+    cell: Optional[List[float]] = _TASK_CPU.get()
+    return time.thread_time() + (cell[0] if cell is not None else 0.0)
+
+
+class MeasuredCoroutine:
+    """Awaitable measuring the CPU time of each step of a coroutine."""
+
+    __slots__ = ("coroutine", "cell")
+
+    def __init__(self, coroutine: Awaitable, cell: List[float]) -> None:
+        """Initialize the awaitable.
+
+        :param coroutine: The coroutine to measure
+        :type coroutine: Awaitable
+        :param cell: The cell where the CPU time is added
+        :type cell: List[float]
+        """
+        self.coroutine = coroutine
+        self.cell = cell
+
+    def __await__(self) -> Generator[Any, Any, Any]:
+        iterator = self.coroutine.__await__()
+        value, error = None, None
+        while True:
+            start = time.thread_time()
+            try:
+                if error is None:
+                    yielded = iterator.send(value)
+                else:
+                    yielded = iterator.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.cell[0] += time.thread_time() - start
+            try:
+                value, error = (yield yielded), None
+            except BaseException as exception:  # pylint: disable=broad-except
+                value, error = None, exception
+
+
+def measure(func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+    """Wrap a coroutine function to add its CPU time to the current request.
+
+    :param func: The coroutine function, e.g. an ``async def`` view
+    :type func: Callable[..., Awaitable]
+    :return: The wrapped coroutine function
+    :rtype: Callable[..., Awaitable]
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        cell = _TASK_CPU.get()
+        if cell is None:
+            return await func(*args, **kwargs)
+        return await MeasuredCoroutine(func(*args, **kwargs), cell)
+
+    return wrapper
+
+
+def install(app: flask.Flask) -> None:
+    """Measure the ``async def`` views and handlers of an application.
+
+    :meth:`flask.Flask.ensure_sync` is wrapped,
+    the other functions are unchanged.
+    The CPU time of a coroutine function is the sum of its steps,
+    the work of the thread of the request to run the event loop isn't counted.
+
+    :param app: The flask application
+    :type app: flask.Flask
+    :return: None
+    """
+    ensure_sync = app.ensure_sync
+    if getattr(ensure_sync, "sustainable", False):
+        return
+
+    def measured_ensure_sync(func: Callable) -> Callable:
+        if not inspect.iscoroutinefunction(func):
+            return ensure_sync(func)
+        measured = measure(func)
+
+        @functools.wraps(func)
+        def bridge(*args, **kwargs):
+            cell = _TASK_CPU.get()
+            start = time.thread_time()
+            try:
+                return ensure_sync(measured)(*args, **kwargs)
+            finally:
+                if cell is not None:
+                    cell[0] -= time.thread_time() - start
+
+        return bridge
+
+    measured_ensure_sync.sustainable = True
+    app.ensure_sync = measured_ensure_sync
@@ -0,0 +1,189 @@
+# coding: utf-8
+
+"""
+Adaptive module
+===============
+
+This module chooses the compression level of each response
+from the load of the process.
+
+When the process is idle, the strongest levels save bandwidth for free.
+When the process is busy, the compression competes with the requests,
+so the cheapest levels keep the latency bounded.
+
+.. code-block:: python
+
+    adaptive = AdaptiveProfile(latency_budget=5)
+    sustainable = Sustainable(app, compress_adaptive=adaptive)
+    adaptive.stats()
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from flask_sustainable.codec import PROFILES
+
+logger = logging.getLogger(__name__)
+
+
+def _cpu_count() -> int:
+    """Get the number of CPU usable by the process.
+
+    :return: The number of CPU
+    :rtype: int
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class AdaptiveProfile:
+    """Choose the level profile of a response from the load and the body size.
+
+    The profile is chosen with these rules:
+
+    - the CPU utilisation of the process is higher than ``high_load``: ``fast``
+    - the body is larger than ``large_size`` (or is streamed):
+      ``balanced`` if the process is idle, ``fast`` otherwise
+    - the body is smaller than ``small_size`` and the process is idle: ``max``
+    - otherwise: ``balanced``
+
+    Then, the compression time is estimated with the throughput measured
+    for the codec and the profile. The profile is lowered while the estimation
+    exceeds ``latency_budget`` milliseconds.
+
+    The process is idle when its CPU utilisation is lower than ``low_load``.
+    The CPU utilisation is measured over ``window`` seconds.
+    """
+
+    def __init__(
+        self,
+        low_load: float = 0.3,
+        high_load: float = 0.75,
+        small_size: int = 64 * 1024,
+        large_size: int = 1024 * 1024,
+        latency_budget: float = 10.0,
+        window: float = 1.0,
+    ) -> None:
+        """Initialize the AdaptiveProfile object.
+
+        :param low_load: CPU utilisation (0 to 1) under which the process is idle
+        :type low_load: float
+        :param high_load: CPU utilisation (0 to 1) above which the process is busy
+        :type high_load: float
+        :param small_size: Size in bytes under which a body is small
+        :type small_size: int
+        :param large_size: Size in bytes above which a body is large
+        :type large_size: int
+        :param latency_budget: Maximum estimated compression time in milliseconds
+        :type latency_budget: float
+        :param window: Duration in seconds of the CPU utilisation measure
+        :type window: float
+        """
+        self.low_load = low_load
+        self.high_load = high_load
+        self.small_size = small_size
+        self.large_size = large_size
+        self.latency_budget = latency_budget
+        self.window = window
+        self.load = 0.0
+        self._cpu_count = _cpu_count()
+        self._last_sample: Tuple[float, float] = (time.monotonic(), time.process_time())
+        # Throughput in bytes per millisecond of each (encoding, profile)
+        self._throughput: Dict[Tuple[str, str], float] = {}
+        self._decisions: Dict[str, int] = dict.fromkeys(PROFILES, 0)
+        self._lock = threading.Lock()
+
+    def _update_load(self) -> float:
+        """Update the CPU utilisation if the window is over.
+
+        :return: The CPU utilisation of the process, from 0 to 1
+        :rtype: float
+        """
+        now, cpu = time.monotonic(), time.process_time()
+        last_now, last_cpu = self._last_sample
+        elapsed = now - last_now
+        if elapsed >= self.window:
+            with self._lock:
+                self.load = min((cpu - last_cpu) / (elapsed * self._cpu_count), 1.0)
+                self._last_sample = (now, cpu)
+        return self.load
+
+    def choose(self, encoding: str, size: int = None) -> str:
+        """Choose the profile of a response.
+
+        :param encoding: The encoding negotiated with the client
+        :type encoding: str
+        :param size: The size of the body in bytes, None if it's unknown
+        :type size: int
+        :return: The name of the profile
+        :rtype: str
+        """
+        load = self._update_load()
+        idle = load < self.low_load
+        if load >= self.high_load:
+            profile = "fast"
+        elif size is None or size >= self.large_size:
+            profile = "balanced" if idle else "fast"
+        elif idle and size <= self.small_size:
+            profile = "max"
+        else:
+            profile = "balanced"
+        # Lower the profile while the compression would be too long
+        index = PROFILES.index(profile)
+        while index > 0 and size:
+            throughput = self._throughput.get((encoding, PROFILES[index]))
+            if not throughput or size / throughput <= self.latency_budget:
+                break
+            index -= 1
+        profile = PROFILES[index]
+        with self._lock:
+            self._decisions[profile] += 1
+        logger.debug(
+            "Profile %s for %s (size: %s, load: %.2f)", profile, encoding, size, load
+        )
+        return profile
+
+    def record(self, encoding: str, profile: str, size: int, seconds: float) -> None:
+        """Record the duration of a compression.
+
+        The throughput is an exponential moving average.
+
+        :param encoding: The encoding of the codec
+        :type encoding: str
+        :param profile: The profile used
+        :type profile: str
+        :param size: The size of the uncompressed body in bytes
+        :type size: int
+        :param seconds: The duration of the compression in seconds
+        :type seconds: float
+        """
+        if seconds <= 0 or not size:
+            return
+        throughput = size / (seconds * 1000)
+        key = (encoding, profile)
+        with self._lock:
+            previous = self._throughput.get(key)
+            self._throughput[key] = (
+                throughput if previous is None else 0.8 * previous + 0.2 * throughput
+            )
+
+    def stats(self) -> dict:
+        """Get the statistics of the controller.
+
+        :return: The CPU utilisation, the number of decisions of each profile
+            and the throughput (bytes/ms) of each codec and profile
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "load": self.load,
+                "decisions": dict(self._decisions),
+                "throughput": {
+                    f"{encoding}:{profile}": value
+                    for (encoding, profile), value in self._throughput.items()
+                },
+            }
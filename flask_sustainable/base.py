@@ -14,10 +14,38 @@ It exist two classes that implement theses base class:
 - ``score`` : correspond to the :file:`score.py` module
 """
 
+import re
 from abc import ABCMeta, abstractmethod
+from typing import FrozenSet, Tuple
 
 import flask
 
+# Separators of the names in the "Perf" header
+_SEPARATORS = re.compile(r"[\s,]+")
+
+
+def requested_headers() -> FrozenSet[str]:
+    """Get the names of the headers requested by the client.
+
+    The ``Perf`` header is parsed once per request,
+    the names are lowercased and cached on :obj:`flask.g`.
+
+    .. code-block:: python
+
+        # Perf: Perf-Time, perf-cpu
+        requested_headers()
+        frozenset({'perf-time', 'perf-cpu'})
+
+    :return: The lowercased names of the requested headers
+    :rtype: FrozenSet[str]
+    """
+    requested = flask.g.get("perf_requested")
+    if requested is None:
+        header = flask.request.headers.get("Perf", default="")
+        requested = frozenset(_SEPARATORS.split(header.lower())) - {""}
+        flask.g.perf_requested = requested
+    return requested
+
 
 class BaseHeader(metaclass=ABCMeta):
     """Base class for all indicators and scores.
@@ -26,6 +54,10 @@ class BaseHeader(metaclass=ABCMeta):
     that are indicators or scores.
     """
 
+    #: Names of the headers that must be executed before this one,
+    #: they are executed when this one is requested
+    requires: Tuple[str, ...] = ()
+
     @property
     @abstractmethod
     def name(self):
@@ -88,8 +120,23 @@ class BaseHeader(metaclass=ABCMeta):
         :type app: flask.Flask
         :return: None
         """
+        self.setup(app)
         app.after_request(self.after_request)
 
+    def setup(self, app: flask.Flask) -> None:
+        """Prepare the header once, when it's registered on the application.
+
+        This method is called by :class:`Sustainable` when the header is registered
+        and the application is known. It can be used to start long-lived resources
+        shared by all requests, instead of creating them on each request.
+
+        By default, nothing is done.
+
+        :param app: The flask application
+        :type app: flask.Flask
+        :return: None
+        """
+
     def should_use(self) -> bool:
         """Check if the indicator should be used.
 
@@ -98,9 +145,7 @@ class BaseHeader(metaclass=ABCMeta):
         :return: True if the indicator/score should be used, False otherwise
         :rtype: bool
         """
-        return (
-            self.name.lower() in flask.request.headers.get("Perf", default="").lower()
-        )
+        return self.name.lower() in requested_headers()
 
 
 class BaseIndicator(BaseHeader, metaclass=ABCMeta):
@@ -0,0 +1,264 @@
+# coding: utf-8
+
+"""
+Cache module
+============
+
+This module provides caches of compressed bodies.
+
+Many endpoints return the same body to many clients (configuration, catalog, ...).
+With a cache, a body already compressed with the same codec and level
+is served without calling the codec again.
+
+The key of an entry is the digest of the uncompressed body,
+the encoding and the level.
+
+Two caches are available:
+
+- :class:`LRUCompressionCache`: an in-memory cache, local to the process
+- :class:`FileCompressionCache`: a cache stored in a directory,
+  shared by all the processes (e.g. the workers of gunicorn)
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Tuple
+
+from flask_sustainable.codec import Codec
+
+logger = logging.getLogger(__name__)
+
+#: Key of an entry: (digest of the body, encoding, level)
+CacheKey = Tuple[bytes, str, int]
+
+
+class BaseCompressionCache(metaclass=ABCMeta):
+    """Base class for all caches of compressed bodies.
+
+    The size of the cache is bounded by ``max_bytes``,
+    the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        """Initialize the cache.
+
+        :param max_bytes: The maximum size of the cache in bytes
+        :type max_bytes: int
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(data: bytes, encoding: str, level: int) -> CacheKey:
+        """Make the key of an entry.
+
+        :param data: The uncompressed body
+        :type data: bytes
+        :param encoding: The encoding of the codec
+        :type encoding: str
+        :param level: The compression level
+        :type level: int
+        :return: The key of the entry
+        :rtype: CacheKey
+        """
+        return hashlib.blake2b(data, digest_size=16).digest(), encoding, level
+
+    @abstractmethod
+    def get(self, key: CacheKey) -> bytes:
+        """Get a compressed body.
+
+        :param key: The key of the entry
+        :type key: CacheKey
+        :return: The compressed body, None if the entry doesn't exist
+        :rtype: bytes
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: CacheKey, value: bytes) -> None:
+        """Store a compressed body.
+
+        An entry bigger than the cache is not stored.
+
+        :param key: The key of the entry
+        :type key: CacheKey
+        :param value: The compressed body
+        :type value: bytes
+        :return: None
+        """
+        raise NotImplementedError
+
+    def compress(
+        self,
+        codec: Codec,
+        data: bytes,
+        level: int = None,
+        function: Callable[[bytes, int], bytes] = None,
+    ) -> bytes:
+        """Compress the data with the codec, unless it's already in the cache.
+
+        :param codec: The codec to use
+        :type codec: Codec
+        :param data: The data to compress
+        :type data: bytes
+        :param level: The compression level,
+            if None, the level of the ``balanced`` profile is used
+        :type level: int
+        :param function: The function compressing the data,
+            defaults to :meth:`Codec.compress`
+        :type function: Callable[[bytes, int], bytes]
+        :return: The compressed data
+        :rtype: bytes
+        """
+        level = codec.get_level() if level is None else level
+        key = self.make_key(data, codec.encoding, level)
+        compressed = self.get(key)
+        with self._lock:
+            if compressed is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if compressed is None:
+            compressed = (function or codec.compress)(data, level)
+            self.set(key, compressed)
+        return compressed
+
+    def stats(self) -> dict:
+        """Get the statistics of the cache.
+
+        :return: The number of hits and misses
+        :rtype: dict
+        """
+        return {"hits": self.hits, "misses": self.misses, "max_bytes": self.max_bytes}
+
+
+class LRUCompressionCache(BaseCompressionCache):
+    """In-memory cache of compressed bodies, local to the process.
+
+    .. code-block:: python
+
+        cache = LRUCompressionCache(max_bytes=32 * 1024 * 1024)
+        sustainable = Sustainable(app, compress_cache=cache)
+        cache.stats()
+        {'hits': 10, 'misses': 1, 'max_bytes': 33554432, 'size': 1370, 'entries': 1}
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        super().__init__(max_bytes)
+        self.size = 0
+        self._entries: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+
+    def get(self, key: CacheKey) -> bytes:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: CacheKey, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "size": self.size, "entries": len(self._entries)}
+
+
+class FileCompressionCache(BaseCompressionCache):
+    """Cache of compressed bodies stored in a directory.
+
+    The directory can be shared by several processes,
+    each entry is written atomically in its own file.
+    The modification time of a file is updated when it's read,
+    the oldest files are removed when the directory exceeds ``max_bytes``.
+
+    The hits and misses are counted by process.
+
+    .. code-block:: python
+
+        cache = FileCompressionCache("/tmp/flask-sustainable")
+        sustainable = Sustainable(app, compress_cache=cache)
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024) -> None:
+        """Initialize the cache.
+
+        :param directory: The directory of the cache, created if needed
+        :type directory: str
+        :param max_bytes: The maximum size of the cache in bytes
+        :type max_bytes: int
+        """
+        super().__init__(max_bytes)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._size = self._evict()
+
+    def _path(self, key: CacheKey) -> str:
+        digest, encoding, level = key
+        return os.path.join(self.directory, f"{digest.hex()}.{encoding}.{level}")
+
+    def get(self, key: CacheKey) -> bytes:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                value = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def set(self, key: CacheKey, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        descriptor, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError as error:
+            logger.warning("Unable to write in the compression cache: %s", error)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            # Other processes also write, the size is checked on the directory
+            self._size += len(value)
+            if self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _evict(self) -> int:
+        """Remove the least recently used files until the size is under the limit.
+
+        :return: The size of the directory after the eviction
+        :rtype: int
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(x[1] for x in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:  # Already removed by another process
+                pass
+            size -= file_size
+        return size
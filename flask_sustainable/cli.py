@@ -0,0 +1,70 @@
+# coding: utf-8
+
+"""
+CLI module
+==========
+
+This module provides the ``flask sustainable`` commands.
+They are registered by :meth:`Sustainable.init_app`.
+
+.. code-block:: bash
+
+    $ flask sustainable --help
+"""
+
+import os
+
+import click
+import flask
+from flask.cli import AppGroup
+
+from flask_sustainable.dictionary import CompressionDictionary, load_samples
+from flask_sustainable.precompress import EXTENSIONS, precompress_folder
+
+cli = AppGroup("sustainable", help="Flask-Sustainable commands.")
+
+
+@cli.command("precompress")
+@click.option(
+    "--encoding",
+    "-e",
+    "encodings",
+    multiple=True,
+    type=click.Choice(tuple(EXTENSIONS)),
+    default=tuple(EXTENSIONS),
+    help="Encoding to write, can be repeated.",
+)
+@click.option("--profile", default="max", help="Level profile of the codecs.")
+@click.option("--force", is_flag=True, help="Rewrite the existing files.")
+def precompress_command(encodings: tuple, profile: str, force: bool) -> None:
+    """Write the compressed siblings of the static files."""
+    app = flask.current_app
+    extension = app.extensions.get("sustainable")
+    registry = extension and extension.codecs
+    policy = extension and extension.compress_policy
+    folders = [app.static_folder] + [
+        x.static_folder for x in app.blueprints.values() if x.static_folder
+    ]
+    written = 0
+    for folder in folders:
+        if folder and os.path.isdir(folder):
+            written += precompress_folder(
+                folder, registry, encodings, profile, policy, force
+            )
+    click.echo(f"{written} files written")
+
+
+@cli.command("train-dictionary")
+@click.argument("samples", type=click.Path(exists=True, file_okay=False))
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    "--size", default=16 * 1024, show_default=True, help="Size of the dictionary."
+)
+def train_dictionary_command(samples: str, output: str, size: int) -> None:
+    """Train a compression dictionary with the samples of a directory.
+
+    The samples can be written by a DictionarySampler.
+    """
+    dictionary = CompressionDictionary.train(load_samples(samples), size)
+    dictionary.save(output)
+    click.echo(f"Dictionary of {len(dictionary.data)} bytes written in {output}")
@@ -0,0 +1,475 @@
+# coding: utf-8
+
+"""
+Codec module
+============
+
+This module describes the compression algorithms (codecs)
+that can be negotiated through the ``Accept-Encoding`` header.
+
+Each codec carries:
+
+- its encoding token, used in the ``Content-Encoding`` header
+- a function that compresses a whole payload
+- a factory of incremental compressors, used for streamed responses
+- named level profiles (``fast``, ``balanced`` and ``max``)
+
+Codecs are grouped in a :class:`CodecRegistry`.
+The order of the registry is the server side preference.
+The registry negotiates the codec of an ``Accept-Encoding`` header
+(see :meth:`CodecRegistry.negotiate`), the result is cached by header.
+
+The ``lzma``, ``brotli`` and ``zstandard`` modules are imported
+when a codec uses them for the first time, not when this module is imported.
+"""
+
+import gzip
+import zlib
+from abc import ABCMeta, abstractmethod
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+#: Name of the available profiles, from the cheapest to the strongest
+PROFILES: tuple = ("fast", "balanced", "max")
+#: Profile used when none is given
+DEFAULT_PROFILE: str = "balanced"
+
+
+class StreamCompressor(metaclass=ABCMeta):
+    """Incremental compressor used to compress a response chunk by chunk.
+
+    The output of :meth:`compress`, :meth:`flush` and :meth:`finish`
+    must be concatenated to get the complete compressed data.
+    """
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of data.
+
+        The returned data may be empty if the compressor buffers the input.
+
+        :param data: The chunk to compress
+        :type data: bytes
+        :return: The compressed data available so far
+        :rtype: bytes
+        """
+        raise NotImplementedError
+
+    def flush(self) -> bytes:
+        """Flush the data buffered by the compressor.
+
+        After a flush, the client is able to decompress all the data given so far.
+        By default, nothing is flushed (e.g. lzma doesn't support it).
+
+        :return: The compressed data buffered by the compressor
+        :rtype: bytes
+        """
+        return b""
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        """Finish the compressed stream.
+
+        The compressor can't be used after this call.
+
+        :return: The remaining compressed data
+        :rtype: bytes
+        """
+        raise NotImplementedError
+
+
+class ZlibStreamCompressor(StreamCompressor):
+    """Incremental compressor for ``gzip`` and ``deflate``."""
+
+    def __init__(self, level: int, wbits: int = zlib.MAX_WBITS) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliStreamCompressor(StreamCompressor):
+    """Incremental compressor for ``br``."""
+
+    def __init__(self, level: int) -> None:
+        import brotli  # pylint: disable=import-outside-toplevel
+
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdStreamCompressor(StreamCompressor):
+    """Incremental compressor for ``zstd``."""
+
+    def __init__(self, level: int) -> None:
+        import zstandard  # pylint: disable=import-outside-toplevel
+
+        self._zstandard = zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(self._zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(self._zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class LzmaStreamCompressor(StreamCompressor):
+    """Incremental compressor for ``lzma``.
+
+    The lzma format doesn't support a flush that keeps the stream open,
+    so the data is only available to the client when the stream is finished.
+    """
+
+    def __init__(self, level: int) -> None:
+        import lzma  # pylint: disable=import-outside-toplevel
+
+        self._compressor = lzma.LZMACompressor(preset=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class Codec:
+    """A compression algorithm that can be negotiated through Accept-Encoding.
+
+    A codec wraps the compress function of an algorithm.
+    The function is only invoked when the codec has been chosen,
+    so registering a codec costs nothing per request.
+
+    .. code-block:: python
+
+        codec = Codec(
+            "gzip",
+            lambda data, level: gzip.compress(data, level),
+            compressobj=lambda level: ZlibStreamCompressor(level, 31),
+            profiles={"fast": 1, "balanced": 6, "max": 9},
+        )
+        codec.compress(b"Welcome!", codec.get_level("max"))
+    """
+
+    def __init__(
+        self,
+        encoding: str,
+        compress: Callable[[bytes, int], bytes],
+        compressobj: Callable[[int], StreamCompressor] = None,
+        profiles: Dict[str, int] = None,
+        wildcard: bool = True,
+    ) -> None:
+        """Initialize the Codec object.
+
+        :param encoding: The token used in the Content-Encoding header
+        :type encoding: str
+        :param compress: A function that takes the data and a level
+            and returns the compressed data
+        :type compress: Callable[[bytes, int], bytes]
+        :param compressobj: A function that takes a level
+            and returns a :class:`StreamCompressor` (optional)
+        :type compressobj: Callable[[int], StreamCompressor]
+        :param profiles: The level of each profile, see :data:`PROFILES`.
+            A missing profile falls back to the ``balanced`` profile.
+        :type profiles: Dict[str, int]
+        :param wildcard: Whether the codec is accepted by ``*`` in Accept-Encoding,
+            False for an encoding that isn't registered for HTTP, defaults to True
+        :type wildcard: bool
+        """
+        self.encoding = encoding.lower()
+        self._compress = compress
+        self._compressobj = compressobj
+        self.profiles: Dict[str, int] = dict(profiles or {})
+        self.wildcard = wildcard
+
+    @property
+    def streamable(self) -> bool:
+        """Whether the codec can compress a response chunk by chunk."""
+        return self._compressobj is not None
+
+    def get_level(self, profile: str = DEFAULT_PROFILE) -> int:
+        """Get the compression level of a profile.
+
+        :param profile: The name of the profile, defaults to ``balanced``
+        :type profile: str
+        :return: The level of the profile, None if the codec has no level
+        :rtype: int
+        """
+        return self.profiles.get(profile, self.profiles.get(DEFAULT_PROFILE))
+
+    def compress(self, data: bytes, level: int = None) -> bytes:
+        """Compress the data with this codec.
+
+        :param data: The data to compress
+        :type data: bytes
+        :param level: The compression level,
+            if None, the level of the ``balanced`` profile is used
+        :type level: int
+        :return: The compressed data
+        :rtype: bytes
+        """
+        return self._compress(data, self.get_level() if level is None else level)
+
+    def compressobj(self, level: int = None) -> StreamCompressor:
+        """Create an incremental compressor.
+
+        :param level: The compression level,
+            if None, the level of the ``balanced`` profile is used
+        :type level: int
+        :raises TypeError: If the codec is not streamable
+        :return: A new incremental compressor
+        :rtype: StreamCompressor
+        """
+        if not self.streamable:
+            raise TypeError(f"Codec {self.encoding} can't compress a stream")
+        return self._compressobj(self.get_level() if level is None else level)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header.
+
+    An invalid quality is read as 0.
+    When an encoding is repeated, its first quality is kept.
+
+    .. code-block:: python
+
+        parse_accept_encoding("gzip, br;q=0.8, *;q=0")
+        {'gzip': 1.0, 'br': 0.8, '*': 0.0}
+
+    :param header: The value of the header
+    :type header: str
+    :return: The quality of each encoding (lowercase)
+    :rtype: Dict[str, float]
+    """
+    qualities: Dict[str, float] = {}
+    for item in header.split(","):
+        encoding, _, parameters = item.partition(";")
+        encoding = encoding.strip().lower()
+        if not encoding or encoding in qualities:
+            continue
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+                if not 0.0 <= quality <= 1.0:
+                    quality = 0.0
+        qualities[encoding] = quality
+    return qualities
+
+
+class CodecRegistry:
+    """An ordered collection of codecs.
+
+    The order of registration is the server side preference,
+    used when the client accepts several encodings with the same quality.
+
+    .. code-block:: python
+
+        registry = default_registry()
+        registry.unregister("lzma")
+        registry.register(Codec("x-custom", custom_compress))
+        sustainable = Sustainable(app, codecs=registry)
+    """
+
+    #: Maximum number of distinct Accept-Encoding headers cached
+    MAX_NEGOTIATIONS: int = 256
+
+    def __init__(self, *codecs: Codec) -> None:
+        self._codecs: Dict[str, Codec] = {}
+        self._negotiations: Dict[str, Optional[str]] = {}
+        self.encodings: tuple = ()
+        for codec in codecs:
+            self.register(codec)
+
+    def register(self, codec: Codec) -> None:
+        """Register a codec.
+
+        If a codec with the same encoding exists, it's replaced
+        and keeps its position.
+
+        :param codec: The codec to register
+        :type codec: Codec
+        :return: None
+        """
+        self._codecs[codec.encoding] = codec
+        self.encodings = tuple(self._codecs)
+        self._negotiations.clear()
+
+    def unregister(self, encoding: str) -> None:
+        """Remove a codec.
+
+        :param encoding: The encoding of the codec to remove
+        :type encoding: str
+        :raises KeyError: If the codec is not registered
+        :return: None
+        """
+        del self._codecs[encoding.lower()]
+        self.encodings = tuple(self._codecs)
+        self._negotiations.clear()
+
+    def negotiate(
+        self, accept_encoding: str, encodings: Iterable[str] = None
+    ) -> Optional[str]:
+        """Choose the codec of a response from the Accept-Encoding header.
+
+        - the codec with the highest quality is chosen,
+          the order of the registry breaks the ties (server side preference)
+        - a codec not listed by the client gets the quality of ``*``,
+          unless it's not a wildcard codec (e.g. ``lzma``)
+        - a quality of 0 (e.g. ``gzip;q=0``, ``*;q=0``) refuses a codec
+        - no codec is chosen when ``identity`` (listed or through ``*``)
+          has a higher quality than all the codecs.
+          ``identity;q=0`` can't be honored when no codec is accepted:
+          the response is sent uncompressed.
+
+        The result is cached by header, there are few distinct headers:
+        once cached, a negotiation is a dict lookup.
+
+        :param accept_encoding: The Accept-Encoding header of the request
+        :type accept_encoding: str
+        :param encodings: Only choose among these encodings,
+            the result isn't cached (optional)
+        :type encodings: Iterable[str]
+        :return: The encoding of the codec, None if the response isn't compressed
+        :rtype: Optional[str]
+        """
+        if encodings is not None:
+            return self._negotiate(accept_encoding, frozenset(encodings))
+        try:
+            return self._negotiations[accept_encoding]
+        except KeyError:
+            encoding = self._negotiate(accept_encoding)
+            if len(self._negotiations) >= self.MAX_NEGOTIATIONS:
+                self._negotiations.clear()
+            self._negotiations[accept_encoding] = encoding
+            return encoding
+
+    def _negotiate(
+        self, accept_encoding: str, encodings: frozenset = None
+    ) -> Optional[str]:
+        """Choose the codec of a response, without cache.
+
+        :param accept_encoding: The Accept-Encoding header of the request
+        :type accept_encoding: str
+        :param encodings: Only choose among these encodings (optional)
+        :type encodings: frozenset
+        :return: The encoding of the codec, None if the response isn't compressed
+        :rtype: Optional[str]
+        """
+        qualities = parse_accept_encoding(accept_encoding or "")
+        wildcard = qualities.get("*")
+        best, best_quality = None, 0.0
+        for codec in self:
+            if encodings is not None and codec.encoding not in encodings:
+                continue
+            quality = qualities.get(codec.encoding)
+            if quality is None and codec.wildcard:
+                quality = wildcard
+            if quality and quality > best_quality:
+                best, best_quality = codec.encoding, quality
+        identity = qualities.get("identity", wildcard)
+        if identity is not None and identity > best_quality:
+            return None
+        return best
+
+    def copy(self) -> "CodecRegistry":
+        """Copy the registry, the codecs are shared.
+
+        :return: A new registry
+        :rtype: CodecRegistry
+        """
+        return CodecRegistry(*self)
+
+    def __getitem__(self, encoding: str) -> Codec:
+        return self._codecs[encoding.lower()]
+
+    def __contains__(self, encoding: str) -> bool:
+        return encoding.lower() in self._codecs
+
+    def __iter__(self) -> Iterator[Codec]:
+        return iter(self._codecs.values())
+
+    def __len__(self) -> int:
+        return len(self._codecs)
+
+
+def _lzma_compress(data: bytes, level: int) -> bytes:
+    import lzma  # pylint: disable=import-outside-toplevel
+
+    return lzma.compress(data, preset=level)
+
+
+def _zstd_compress(data: bytes, level: int) -> bytes:
+    import zstandard  # pylint: disable=import-outside-toplevel
+
+    return zstandard.compress(data, level)
+
+
+def _brotli_compress(data: bytes, level: int) -> bytes:
+    import brotli  # pylint: disable=import-outside-toplevel
+
+    return brotli.compress(data, mode=brotli.MODE_TEXT, quality=level)
+
+
+def default_registry() -> CodecRegistry:
+    """Create a registry with the builtin codecs.
+
+    The builtin codecs are ``lzma``, ``zstd``, ``br``, ``gzip`` and ``deflate``.
+    ``lzma`` isn't registered for HTTP, it's only chosen when the client lists it.
+
+    :return: A new registry
+    :rtype: CodecRegistry
+    """
+    return CodecRegistry(
+        Codec(
+            "lzma",
+            _lzma_compress,
+            compressobj=LzmaStreamCompressor,
+            profiles={"fast": 0, "balanced": 6, "max": 9},
+            wildcard=False,
+        ),
+        Codec(
+            "zstd",
+            _zstd_compress,
+            compressobj=ZstdStreamCompressor,
+            profiles={"fast": 1, "balanced": 3, "max": 22},
+        ),
+        Codec(
+            "br",
+            _brotli_compress,
+            compressobj=BrotliStreamCompressor,
+            profiles={"fast": 1, "balanced": 5, "max": 11},
+        ),
+        Codec(
+            "gzip",
+            lambda data, level: gzip.compress(data, level),
+            compressobj=lambda level: ZlibStreamCompressor(level, 16 + zlib.MAX_WBITS),
+            profiles={"fast": 1, "balanced": 6, "max": 9},
+        ),
+        Codec(
+            "deflate",
+            lambda data, level: zlib.compress(data, level),
+            compressobj=ZlibStreamCompressor,
+            profiles={"fast": 1, "balanced": 6, "max": 9},
+        ),
+    )
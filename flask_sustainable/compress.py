@@ -5,34 +5,232 @@ Compress module
 ===============
 
 This module provides a way to compress a Flask Response.
+
+A compressed response is a distinct representation for the HTTP caches:
+
+- ``Vary: Accept-Encoding`` is added when the encoding depends on the request
+- its ETag is derived from the uncompressed one: ``"abc"`` becomes ``W/"abc-gzip"``
+- a request with a matching ``If-None-Match`` gets a ``304 Not Modified``,
+  before the body is compressed
 """
 
 import copy
-import gzip
+import fnmatch
+import functools
 import logging
-import lzma
-import zlib
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
 
-import brotli
 import flask
-import zstandard
 from werkzeug.datastructures import Accept
 from werkzeug.http import parse_accept_header
 
+from flask_sustainable.adaptive import AdaptiveProfile
+from flask_sustainable.cache import BaseCompressionCache
+from flask_sustainable.codec import (
+    DEFAULT_PROFILE,
+    Codec,
+    CodecRegistry,
+    StreamCompressor,
+    default_registry,
+)
+from flask_sustainable.dictionary import DCZ, CompressionDictionary
+from flask_sustainable.parallel import ParallelCompressor
+
 logger = logging.getLogger(__name__)
 
 
+class CompressionObserver:
+    """Observe the compression of the responses, e.g. to export metrics.
+
+    The methods are called in the request thread, they must be cheap.
+    By default, nothing is done.
+
+    .. code-block:: python
+
+        class Counter(CompressionObserver):
+            def compressed(self, encoding, size_in, size_out, seconds):
+                print(f"{encoding}: {size_in} -> {size_out} bytes")
+
+        sustainable = Sustainable(app, compress_observer=Counter())
+    """
+
+    def compressed(
+        self, encoding: str, size_in: int, size_out: int, seconds: float
+    ) -> None:
+        """Called when a body is compressed.
+
+        For a streamed response, it's called when the stream ends.
+
+        :param encoding: The encoding of the codec
+        :type encoding: str
+        :param size_in: The size of the uncompressed body in bytes
+        :type size_in: int
+        :param size_out: The size of the compressed body in bytes
+        :type size_out: int
+        :param seconds: The duration of the compression in seconds
+        :type seconds: float
+        :return: None
+        """
+
+    def skipped(self, reason: str) -> None:
+        """Called when a response is not compressed.
+
+        :param reason: The reason, see :meth:`CompressionPolicy.check`
+            and ``encoding`` when the client accepts no codec
+        :type reason: str
+        :return: None
+        """
+
+
+class CompressionPolicy:
+    """Decide whether a response is worth compressing.
+
+    A response is not compressed when:
+
+    - its size is known and lower than ``min_size`` bytes
+    - its mimetype doesn't match ``mimetypes`` or matches ``exclude_mimetypes``
+    - its status code is in ``exclude_statuses`` or is informational (1xx)
+    - it already has a Content-Encoding
+    - it has the Cache-Control ``no-transform`` directive
+
+    The mimetypes are shell-style patterns (e.g. ``text/*``), compared in lowercase.
+
+    .. code-block:: python
+
+        policy = CompressionPolicy(min_size=1024, exclude_mimetypes=("text/csv",))
+        sustainable = Sustainable(app, compress_policy=policy)
+    """
+
+    #: Mimetypes compressed by default
+    MIMETYPES: tuple = (
+        "text/*",
+        "application/json",
+        "application/*+json",
+        "application/javascript",
+        "application/ecmascript",
+        "application/xml",
+        "application/*+xml",
+        "application/wasm",
+        "image/svg+xml",
+        "image/x-icon",
+        "font/ttf",
+        "font/otf",
+    )
+    #: Status codes without a body (or with a partial body)
+    EXCLUDE_STATUSES: tuple = (204, 206, 304)
+
+    def __init__(
+        self,
+        min_size: int = 500,
+        mimetypes: Iterable[str] = MIMETYPES,
+        exclude_mimetypes: Iterable[str] = (),
+        exclude_statuses: Iterable[int] = EXCLUDE_STATUSES,
+    ) -> None:
+        """Initialize the CompressionPolicy object.
+
+        :param min_size: The minimum size in bytes of a compressed body,
+            defaults to 500
+        :type min_size: int
+        :param mimetypes: The patterns of the mimetypes to compress,
+            defaults to :attr:`MIMETYPES`
+        :type mimetypes: Iterable[str]
+        :param exclude_mimetypes: The patterns of the mimetypes to never compress
+        :type exclude_mimetypes: Iterable[str]
+        :param exclude_statuses: The status codes to never compress,
+            defaults to :attr:`EXCLUDE_STATUSES`
+        :type exclude_statuses: Iterable[int]
+        """
+        self.min_size = min_size
+        self.mimetypes = tuple(x.lower() for x in mimetypes)
+        self.exclude_mimetypes = tuple(x.lower() for x in exclude_mimetypes)
+        self.exclude_statuses = frozenset(exclude_statuses)
+        self._mimetypes_cache: Dict[str, bool] = {}
+
+    def match_mimetype(self, mimetype: str) -> bool:
+        """Check if a mimetype must be compressed.
+
+        The result is cached, there are few distinct mimetypes in an application.
+
+        :param mimetype: The mimetype, without parameters
+        :type mimetype: str
+        :return: True if the mimetype is allowed, False otherwise
+        :rtype: bool
+        """
+        try:
+            return self._mimetypes_cache[mimetype]
+        except KeyError:
+            lowered = mimetype.lower()
+            allowed = any(
+                fnmatch.fnmatchcase(lowered, x) for x in self.mimetypes
+            ) and not any(
+                fnmatch.fnmatchcase(lowered, x) for x in self.exclude_mimetypes
+            )
+            self._mimetypes_cache[mimetype] = allowed
+            return allowed
+
+    def should_compress(self, response: flask.Response, min_size: int = None) -> bool:
+        """Check if a response must be compressed.
+
+        :param response: The response to check
+        :type response: flask.Response
+        :param min_size: Override the minimum size of the policy (optional)
+        :type min_size: int
+        :return: True if the response must be compressed, False otherwise
+        :rtype: bool
+        """
+        return self.check(response, min_size) is None
+
+    def check(self, response: flask.Response, min_size: int = None) -> Optional[str]:
+        """Get the reason why a response must not be compressed.
+
+        :param response: The response to check
+        :type response: flask.Response
+        :param min_size: Override the minimum size of the policy (optional)
+        :type min_size: int
+        :return: ``status``, ``already encoded``, ``no-transform``, ``mimetype``
+            or ``size``, None if the response must be compressed
+        :rtype: Optional[str]
+        """
+        min_size = self.min_size if min_size is None else min_size
+        reason = None
+        if response.status_code < 200 or response.status_code in self.exclude_statuses:
+            reason = "status"
+        elif response.content_encoding not in (None, "", "identity"):
+            reason = "already encoded"
+        elif response.cache_control.no_transform:
+            reason = "no-transform"
+        elif not self.match_mimetype((response.mimetype or "").lower()):
+            reason = "mimetype"
+        elif min_size > 0:
+            length = response.content_length
+            if length is None and not response.is_streamed:
+                length = response.calculate_content_length()
+            if length is not None and length < min_size:
+                reason = "size"
+        if reason:
+            logger.debug("Compression skipped (%s)", reason)
+        return reason
+
+
 class Compression:
     """Compress the response data when it's possible.
 
     This class is a wrapper around the flask.Response object.
     It adds the Content-Encoding header to the response.
-    The response passed through this class is not modified.
+    By default, the response passed through this class is not modified:
+    a lightweight copy sharing the body is compressed.
+    With ``inplace=True``, the response is compressed in place
+    and the only allocation is the compressed body.
 
     To do this, it checks the Accept-Encoding header of the request.
     The best compression algorithm is chosen based on the Accept-Encoding header.
     etc.
 
+    Streamed responses (generators, :func:`flask.send_file`, ...)
+    are compressed chunk by chunk while they are sent,
+    so the body is never loaded in memory.
+
     .. code-block:: python
 
         response = flask.Response("Welcome!")
@@ -41,29 +239,139 @@ class Compression:
         "gzip"
     """
 
-    SUPPORTED_ALGORITHMS: tuple = ("lzma", "zstd", "br", "gzip", "deflate")
+    CODECS: CodecRegistry = default_registry()
+    SUPPORTED_ALGORITHMS: tuple = CODECS.encodings
+    #: Number of bytes given to a stream compressor between two flushes
+    FLUSH_SIZE: int = 64 * 1024
 
-    def __init__(self, response: flask.Response, accept_encodings: str = None) -> None:
+    def __init__(
+        self,
+        response: flask.Response,
+        accept_encodings: str = None,
+        registry: CodecRegistry = None,
+        profile: str = DEFAULT_PROFILE,
+        stream: bool = True,
+        flush_size: int = None,
+        inplace: bool = False,
+        policy: CompressionPolicy = None,
+        cache: BaseCompressionCache = None,
+        dictionary: CompressionDictionary = None,
+        adaptive: AdaptiveProfile = None,
+        parallel: ParallelCompressor = None,
+        observer: CompressionObserver = None,
+    ) -> None:
         """Initialize the Compression object.
 
-        If the ``accept_encodings`` is not given, it will be taken from the request
-        If it's given, we'll use werkzeug.http.parse_accept_header to parse it
+        If the ``accept_encodings`` is not given, it will be taken from the request.
+        The codec is negotiated by the registry, see :meth:`CodecRegistry.negotiate`.
 
         :param response: The response object
         :type response: flask.Response
         :param accept_encodings: The Accept-Encoding header of the request (optional)
         :type accept_encodings: str
+        :param registry: The codecs that can be used, defaults to :attr:`CODECS`
+        :type registry: CodecRegistry
+        :param profile: The level profile of the codecs, defaults to ``balanced``
+            (see :data:`flask_sustainable.codec.PROFILES`)
+        :type profile: str
+        :param stream: If True, streamed responses are compressed chunk by chunk,
+            otherwise they are loaded in memory, defaults to True
+        :type stream: bool
+        :param flush_size: Number of bytes compressed between two flushes
+            of a streamed response, defaults to :attr:`FLUSH_SIZE`
+        :type flush_size: int
+        :param inplace: If True, the given response is compressed in place,
+            otherwise a copy is made, defaults to False
+        :type inplace: bool
+        :param policy: The policy deciding whether the response is compressed,
+            if None, the response is always compressed
+        :type policy: CompressionPolicy
+        :param cache: The cache of the compressed bodies (optional),
+            see :mod:`flask_sustainable.cache`
+        :type cache: BaseCompressionCache
+        :param dictionary: The dictionary shared with the clients (optional),
+            see :mod:`flask_sustainable.dictionary`
+        :type dictionary: CompressionDictionary
+        :param adaptive: Choose the profile of each response from the load
+            of the process, instead of ``profile`` (optional)
+        :type adaptive: AdaptiveProfile
+        :param parallel: Compress the large bodies on several threads (optional)
+        :type parallel: ParallelCompressor
+        :param observer: Observe the compression, e.g. to export metrics (optional)
+        :type observer: CompressionObserver
         """
-        self.accept_encodings: Accept = (
-            parse_accept_header(accept_encodings) or flask.request.accept_encodings
+        self.observer = observer
+        self.policy = policy
+        self.cache = cache
+        self.dictionary = dictionary
+        self.adaptive = adaptive
+        self.parallel = parallel
+        self.registry: CodecRegistry = registry or self.CODECS
+        self.profile = profile
+        self.stream = stream
+        self.flush_size = flush_size or self.FLUSH_SIZE
+        #: The Accept-Encoding header of the request
+        self.accept_encoding: str = accept_encodings or flask.request.headers.get(
+            "Accept-Encoding", ""
         )
-        logger.debug("Accept-Encoding: %s", self.accept_encodings)
-        self.response = copy.deepcopy(response)
+        logger.debug("Accept-Encoding: %s", self.accept_encoding)
+        self._accept_encodings: Accept = None
+        # Encoding of the validators set on the response
+        self._validators: Optional[str] = None
+        self.response = response if inplace else self._copy_response(response)
+
+    @property
+    def accept_encodings(self) -> Accept:
+        """The parsed Accept-Encoding header, parsed on the first access."""
+        if self._accept_encodings is None:
+            self._accept_encodings = parse_accept_header(self.accept_encoding)
+        return self._accept_encodings
 
     @staticmethod
-    def compress_data(algorithm: str, data: bytes, level: int = None) -> bytes:
+    def _copy_response(response: flask.Response) -> flask.Response:
+        """Copy a response without copying its body.
+
+        The body is shared because it's replaced (not modified) by the compression.
+        The headers and the callbacks called on close are copied.
+
+        :param response: The response to copy
+        :type response: flask.Response
+        :return: The copy of the response
+        :rtype: flask.Response
+        """
+        copied = copy.copy(response)
+        copied.headers = response.headers.copy()
+        # pylint: disable=w0212
+        copied._on_close = list(response._on_close)
+        return copied
+
+    @classmethod
+    def register_codec(cls, codec: Codec) -> None:
+        """Register a new codec (or replace an existing one).
+
+        The codec is registered on the class it's called on,
+        so registering on a subclass doesn't affect :class:`Compression`.
+
+        .. code-block:: python
+
+            class MyCompression(Compression):
+                pass
+
+            MyCompression.register_codec(Codec("x-custom", custom_compress))
+
+        :param codec: The codec to register
+        :type codec: Codec
+        :return: None
+        """
+        cls.CODECS = cls.CODECS.copy()
+        cls.CODECS.register(codec)
+        cls.SUPPORTED_ALGORITHMS = cls.CODECS.encodings
+
+    @classmethod
+    def compress_data(cls, algorithm: str, data: bytes, level: int = None) -> bytes:
         """Compress the data with the given algorithm.
 
+        Only the codec of the given algorithm is invoked.
         This function raises an KeyError exception if the algorithm is not supported.
 
         .. code-block:: python
@@ -76,23 +384,93 @@ class Compression:
         :type algorithm: str
         :param data: The data to compress
         :type data: bytes
-        :param level: The compression level, if None, the default level is used
+        :param level: The compression level,
+            if None, the level of the ``balanced`` profile is used
         :type level: int
         :return: The compressed data
         :rtype: bytes
         """
-        return {
-            "gzip": gzip.compress(data, compresslevel=level or 9),
-            "br": brotli.compress(data, mode=brotli.MODE_TEXT, quality=level or 0),
-            "zstd": zstandard.compress(data, level=level or 22),
-            "lzma": lzma.compress(data, preset=level or 9),
-            "deflate": zlib.compress(data, level=level or 9),
-        }[algorithm]
+        return cls.CODECS[algorithm].compress(data, level)
+
+    def _set_validators(self, encoding: str) -> None:
+        """Set the cache headers of the response encoded with a codec.
+
+        ``Accept-Encoding`` is added to the Vary header,
+        the ETag becomes weak and specific to the encoding.
+        The headers are only set once.
+
+        :param encoding: The encoding of the codec
+        :type encoding: str
+        :return: None
+        """
+        if self._validators == encoding:
+            return
+        self._validators = encoding
+        self.response.vary.add("Accept-Encoding")
+        etag, _ = self.response.get_etag()
+        if etag:
+            self.response.set_etag(f"{etag}-{encoding}", weak=True)
+
+    def _not_modified(self) -> bool:
+        """Check if the client already has the response.
+
+        The ETag of the response must have been set by :meth:`_set_validators`.
+
+        :return: True if the If-None-Match header of the request
+            matches the ETag of the response
+        :rtype: bool
+        """
+        if (
+            self.response.status_code != 200
+            or not flask.has_request_context()
+            or flask.request.method not in ("GET", "HEAD")
+        ):
+            return False
+        etag, _ = self.response.get_etag()
+        return bool(etag) and flask.request.if_none_match.contains_weak(etag)
+
+    def make_not_modified_response(self, encoding: str) -> flask.Response:
+        """Make the ``304 Not Modified`` response of a compressed response.
+
+        The headers are kept (Vary, ETag, Cache-Control, ...),
+        the body is neither compressed nor sent.
+
+        :param encoding: The encoding that would have been used
+        :type encoding: str
+        :return: The response object
+        :rtype: flask.Response
+        """
+        logger.debug("Not modified (%s)", encoding)
+        source = self.response.response
+        if hasattr(source, "close"):
+            self.response.call_on_close(source.close)
+        self.response.response = []
+        self.response.direct_passthrough = False
+        self.response.status_code = 304
+        self.response.headers.pop("Content-Length", None)
+        if self.observer is not None:
+            self.observer.skipped("not modified")
+        return self.response
+
+    def _choose_profile(self, encoding: str, size: int = None) -> str:
+        """Choose the level profile of the response.
+
+        :param encoding: The encoding negotiated with the client
+        :type encoding: str
+        :param size: The size of the body in bytes, None if it's unknown
+        :type size: int
+        :return: The profile chosen by :attr:`adaptive`, :attr:`profile` otherwise
+        :rtype: str
+        """
+        if self.adaptive is None:
+            return self.profile
+        return self.adaptive.choose(encoding, size)
 
     def make_response(self, algorithm: str, check: bool = True) -> flask.Response:
         """Make a response with the given algorithm.
 
-        This function change the reponse data and adds the Content-Encoding header.
+        This function change the reponse data and adds the Content-Encoding header,
+        the Vary header and the ETag of the encoding.
 
         Example::
 
@@ -114,12 +492,182 @@ class Compression:
         :rtype: flask.Response
         """
         if check:
-            assert algorithm.lower() in self.SUPPORTED_ALGORITHMS
-        logger.debug("Compressing with %s", algorithm)
-        self.response.content_encoding = algorithm.lower()
-        self.response.data = self.compress_data(algorithm.lower(), self.response.data)
+            assert algorithm.lower() in self.registry
+        codec: Codec = self.registry[algorithm]
+        data = self.response.data
+        profile = self._choose_profile(codec.encoding, len(data))
+        level = codec.get_level(profile)
+        logger.debug("Compressing with %s (level %s)", codec.encoding, level)
+        function = codec.compress
+        if self.parallel is not None and self.parallel.accepts(
+            codec.encoding, len(data)
+        ):
+            function = functools.partial(self.parallel.compress, codec)
+        if self.adaptive is not None:
+            function = self._timed(function, codec.encoding, profile)
+        start = time.perf_counter()
+        if self.cache is None:
+            self.response.data = function(data, level)
+        else:
+            self.response.data = self.cache.compress(codec, data, level, function)
+        if self.observer is not None:
+            self.observer.compressed(
+                codec.encoding,
+                len(data),
+                self.response.content_length,
+                time.perf_counter() - start,
+            )
+        self.response.content_encoding = codec.encoding
+        self._set_validators(codec.encoding)
+        return self.response
+
+    def _timed(
+        self, function: Callable[[bytes, int], bytes], encoding: str, profile: str
+    ) -> Callable[[bytes, int], bytes]:
+        """Wrap a compression function to record its duration in :attr:`adaptive`.
+
+        With a cache, only the misses are recorded: a hit compresses nothing.
+
+        :param function: The function compressing the data
+        :type function: Callable[[bytes, int], bytes]
+        :param encoding: The encoding of the codec
+        :type encoding: str
+        :param profile: The profile of the level
+        :type profile: str
+        :return: The wrapped function
+        :rtype: Callable[[bytes, int], bytes]
+        """
+
+        def timed(data: bytes, level: int) -> bytes:
+            start = time.perf_counter()
+            compressed = function(data, level)
+            duration = time.perf_counter() - start
+            self.adaptive.record(encoding, profile, len(data), duration)
+            return compressed
+
+        return timed
+
+    def make_dictionary_response(self) -> flask.Response:
+        """Make a response compressed with the shared dictionary.
+
+        The response is encoded with ``dcz``, the client must have the dictionary.
+
+        :return: The response object
+        :rtype: flask.Response
+        """
+        data = self.response.data
+        level = self.dictionary.get_level(self._choose_profile(DCZ, len(data)))
+        logger.debug("Compressing with dictionary (level %s)", level)
+        start = time.perf_counter()
+        self.response.data = self.dictionary.compress(data, level)
+        if self.observer is not None:
+            self.observer.compressed(
+                DCZ,
+                len(data),
+                self.response.content_length,
+                time.perf_counter() - start,
+            )
+        self.response.content_encoding = DCZ
+        self.response.vary.add("Available-Dictionary")
+        self._set_validators(DCZ)
+        return self.response
+
+    def make_stream_response(
+        self, algorithm: str, check: bool = True
+    ) -> flask.Response:
+        """Make a streamed response with the given algorithm.
+
+        The body of the response is wrapped in a generator
+        that compresses each chunk when it's sent to the client.
+        The Content-Length header is removed because the final size is unknown.
+
+        The compressor is flushed after the first chunk, to keep a low
+        time-to-first-byte, and then each time :attr:`flush_size` bytes are given.
+
+        :param algorithm: The algorithm to use, must be a streamable codec
+        :type algorithm: str
+        :param check: If True, check if the compression is supported (KeyError if not),
+            defaults to True
+        :type check: bool
+        :return: The response object
+        :rtype: flask.Response
+        """
+        if check:
+            assert algorithm.lower() in self.registry
+        codec: Codec = self.registry[algorithm]
+        level = codec.get_level(self._choose_profile(codec.encoding))
+        logger.debug("Compressing stream with %s (level %s)", codec.encoding, level)
+        compressor = codec.compressobj(level)
+        source = self.response.response
+        if hasattr(source, "close"):
+            self.response.call_on_close(source.close)
+        self.response.response = self._iter_compressed(
+            source, compressor, self.flush_size, self._stream_observer(codec.encoding)
+        )
+        self.response.direct_passthrough = False
+        self.response.content_encoding = codec.encoding
+        self.response.headers.pop("Content-Length", None)
+        self._set_validators(codec.encoding)
         return self.response
 
+    def _stream_observer(self, encoding: str) -> Optional[Callable]:
+        """Get the callback notifying :attr:`observer` at the end of a stream.
+
+        :param encoding: The encoding of the codec
+        :type encoding: str
+        :return: A callback taking the sizes and the duration, None without observer
+        :rtype: Optional[Callable]
+        """
+        if self.observer is None:
+            return None
+        return functools.partial(self.observer.compressed, encoding)
+
+    @staticmethod
+    def _iter_compressed(
+        chunks: Iterable,
+        compressor: StreamCompressor,
+        flush_size: int,
+        observe: Callable[[int, int, float], None] = None,
+    ) -> Iterator[bytes]:
+        """Compress an iterable of chunks.
+
+        :param chunks: The body of the response
+        :type chunks: Iterable
+        :param compressor: The compressor to use
+        :type compressor: StreamCompressor
+        :param flush_size: Number of bytes compressed between two flushes
+        :type flush_size: int
+        :param observe: Called at the end with the uncompressed and compressed
+            sizes and the duration of the compression (optional)
+        :type observe: Callable[[int, int, float], None]
+        :return: The compressed chunks
+        :rtype: Iterator[bytes]
+        """
+        pending = flush_size  # Flush after the first chunk
+        size_in = size_out = 0
+        seconds = 0.0
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            start = time.perf_counter()
+            data = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending >= flush_size:
+                data += compressor.flush()
+                pending = 0
+            seconds += time.perf_counter() - start
+            size_in += len(chunk)
+            size_out += len(data)
+            if data:
+                yield data
+        start = time.perf_counter()
+        data = compressor.finish()
+        if observe is not None:
+            observe(
+                size_in, size_out + len(data), seconds + time.perf_counter() - start
+            )
+        yield data
+
     def compress(self, check=False) -> flask.Response:
         """Compress the response data with the highest compression level
         available.
@@ -138,8 +686,45 @@ class Compression:
         :return: The response object
         :rtype: flask.Response
         """
+        # A shared dictionary is worth it even for the smallest bodies
+        with_dictionary = (
+            self.dictionary is not None
+            and not self.response.is_streamed
+            and flask.has_request_context()
+            and "Available-Dictionary" in flask.request.headers
+            and self.dictionary.accepted(
+                self.accept_encodings,
+                flask.request.headers["Available-Dictionary"],
+            )
+        )
+        if self.policy:
+            reason = self.policy.check(
+                self.response, min_size=0 if with_dictionary else None
+            )
+            if reason:
+                if self.observer is not None:
+                    self.observer.skipped(reason)
+                return self.response
+        if with_dictionary:
+            self.response.vary.add("Available-Dictionary")
+            self._set_validators(DCZ)
+            if self._not_modified():
+                return self.make_not_modified_response(DCZ)
+            return self.make_dictionary_response()
+        # Check if the client want any compression
+        algo = self.registry.negotiate(self.accept_encoding)
+        # The representation depends on the header, even if it's not compressed
+        self.response.vary.add("Accept-Encoding")
+        if not algo:
+            if self.observer is not None:
+                self.observer.skipped("encoding")
+            return self.response
+        self._set_validators(algo)
+        # Revalidation: neither compressed nor sent
+        if self._not_modified():
+            return self.make_not_modified_response(algo)
+        if self.stream and self.response.is_streamed and self.registry[algo].streamable:
+            return self.make_stream_response(algo, check=check)
         # https://github.com/closeio/Flask-gzip/issues/7
         self.response.direct_passthrough = False
-        # Check if the client want any compression
-        algo = self.accept_encodings.best_match(self.SUPPORTED_ALGORITHMS)
-        return self.make_response(algo, check=check) if algo else self.response
+        return self.make_response(algo, check=check)
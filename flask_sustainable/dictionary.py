@@ -0,0 +1,314 @@
+# coding: utf-8
+
+"""
+Dictionary module
+=================
+
+This module provides the compression of small responses with a shared dictionary.
+
+Small JSON documents compress badly because each response starts from scratch.
+With a dictionary trained on similar documents, a few dozen bytes are enough.
+
+The dictionary is negotiated with the Compression Dictionary Transport:
+
+1. the client fetches the dictionary,
+   the response has a ``Use-As-Dictionary`` header
+2. the next requests have an ``Available-Dictionary`` header
+   with the SHA-256 of the dictionary and ``dcz`` in ``Accept-Encoding``
+3. the responses are compressed with zstd and the dictionary
+   (``Content-Encoding: dcz``)
+
+Clients without the dictionary get the usual encodings.
+
+The workflow to build a dictionary is:
+
+.. code-block:: python
+
+    # 1. Sample the bodies of the responses
+    sustainable = Sustainable(app, dictionary_sampler=DictionarySampler("samples/"))
+
+.. code-block:: bash
+
+    # 2. Train the dictionary
+    $ flask sustainable train-dictionary samples/ dictionary.zdict
+
+.. code-block:: python
+
+    # 3. Load the dictionary
+    sustainable = Sustainable(app, compress_dictionary="dictionary.zdict")
+
+The ``dcb`` encoding (brotli with a dictionary) is not supported,
+because the brotli module doesn't support custom dictionaries.
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import random
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable
+
+import flask
+
+if TYPE_CHECKING:  # pragma: no cover
+    import zstandard
+
+    from flask_sustainable.compress import CompressionPolicy
+
+logger = logging.getLogger(__name__)
+
+#: Header of a ``dcz`` response, followed by the SHA-256 of the dictionary
+DCZ_MAGIC: bytes = b"\x5e\x2a\x4d\x18\x20\x00\x00\x00"
+#: Encoding token of zstd with a dictionary
+DCZ: str = "dcz"
+#: zstd level of each profile
+PROFILES: Dict[str, int] = {"fast": 1, "balanced": 3, "max": 19}
+
+
+class CompressionDictionary:
+    """A dictionary shared with the clients to compress the responses.
+
+    The dictionary is used as raw content by zstd,
+    as required by the Compression Dictionary Transport.
+
+    .. code-block:: python
+
+        dictionary = CompressionDictionary.train(samples)
+        dictionary.save("dictionary.zdict")
+        dictionary = CompressionDictionary.load("dictionary.zdict", match="/api/*")
+    """
+
+    def __init__(self, data: bytes, match: str = "/*") -> None:
+        """Initialize the CompressionDictionary object.
+
+        :param data: The content of the dictionary
+        :type data: bytes
+        :param match: The URL pattern of the responses
+            that can be compressed with this dictionary, defaults to ``/*``
+        :type match: str
+        """
+        self.data = data
+        self.match = match
+        self.hash = hashlib.sha256(data).digest()
+        #: Value of the ``Available-Dictionary`` header sent by the clients
+        self.available = f":{base64.b64encode(self.hash).decode()}:"
+        self._dicts: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, match: str = "/*") -> "CompressionDictionary":
+        """Load a dictionary from a file.
+
+        :param path: The path of the file
+        :type path: str
+        :param match: The URL pattern of the responses, defaults to ``/*``
+        :type match: str
+        :return: The dictionary
+        :rtype: CompressionDictionary
+        """
+        with open(path, "rb") as file:
+            return cls(file.read(), match)
+
+    @classmethod
+    def train(
+        cls, samples: Iterable[bytes], size: int = 16 * 1024, match: str = "/*"
+    ) -> "CompressionDictionary":
+        """Train a dictionary with samples of responses.
+
+        The samples must be similar to the responses to compress.
+        A few hundred samples are required.
+
+        :param samples: The bodies of the responses
+        :type samples: Iterable[bytes]
+        :param size: The maximum size of the dictionary in bytes, defaults to 16 KiB
+        :type size: int
+        :param match: The URL pattern of the responses, defaults to ``/*``
+        :type match: str
+        :return: The dictionary
+        :rtype: CompressionDictionary
+        """
+        import zstandard  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        trained = zstandard.train_dictionary(size, list(samples))
+        return cls(trained.as_bytes(), match)
+
+    def save(self, path: str) -> None:
+        """Save the dictionary in a file.
+
+        :param path: The path of the file
+        :type path: str
+        :return: None
+        """
+        with open(path, "wb") as file:
+            file.write(self.data)
+
+    def accepted(self, accept_encodings, available_dictionary: str) -> bool:
+        """Check if the client can decompress a response with this dictionary.
+
+        :param accept_encodings: The Accept-Encoding header of the request
+        :type accept_encodings: werkzeug.datastructures.Accept
+        :param available_dictionary: The Available-Dictionary header of the request
+        :type available_dictionary: str
+        :return: True if the client has this dictionary and accepts ``dcz``
+        :rtype: bool
+        """
+        if not available_dictionary or available_dictionary.strip() != self.available:
+            return False
+        return any(x.lower() == DCZ and q > 0 for x, q in accept_encodings)
+
+    def _dict(self, level: int) -> "zstandard.ZstdCompressionDict":
+        """Get the dictionary prepared for a level.
+
+        :param level: The compression level
+        :type level: int
+        :return: The dictionary
+        :rtype: zstandard.ZstdCompressionDict
+        """
+        try:
+            return self._dicts[level]
+        except KeyError:
+            # pylint: disable=import-outside-toplevel,redefined-outer-name
+            import zstandard
+
+            with self._lock:
+                prepared = zstandard.ZstdCompressionDict(
+                    self.data, dict_type=zstandard.DICT_TYPE_RAWCONTENT
+                )
+                prepared.precompute_compress(level=level)
+                self._dicts[level] = prepared
+                return prepared
+
+    @staticmethod
+    def get_level(profile: str) -> int:
+        """Get the zstd level of a profile.
+
+        :param profile: The name of the profile
+        :type profile: str
+        :return: The level of the profile, the ``balanced`` level if it's unknown
+        :rtype: int
+        """
+        return PROFILES.get(profile, PROFILES["balanced"])
+
+    def compress(self, data: bytes, level: int = PROFILES["balanced"]) -> bytes:
+        """Compress the data in the ``dcz`` format.
+
+        :param data: The data to compress
+        :type data: bytes
+        :param level: The zstd compression level, defaults to 3
+        :type level: int
+        :return: The compressed data
+        :rtype: bytes
+        """
+        import zstandard  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        # A ZstdCompressor can't be shared between threads, its creation is cheap
+        compressor = zstandard.ZstdCompressor(
+            level=level, dict_data=self._dict(level), write_dict_id=False
+        )
+        return DCZ_MAGIC + self.hash + compressor.compress(data)
+
+    def make_response(self) -> flask.Response:
+        """Make the response that sends the dictionary to the client.
+
+        :return: The response with the ``Use-As-Dictionary`` header
+        :rtype: flask.Response
+        """
+        response = flask.Response(self.data, mimetype="application/octet-stream")
+        response.headers["Use-As-Dictionary"] = f'match="{self.match}"'
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response
+
+
+class DictionarySampler:
+    """Write a sample of the response bodies in a directory.
+
+    The samples are used to train a dictionary,
+    see :meth:`CompressionDictionary.train`.
+
+    Only the successful responses (2xx) with a mimetype compressed by the policy
+    and a small body (lower than ``max_size``) are sampled,
+    until ``max_samples`` files are written.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        rate: float = 0.01,
+        max_samples: int = 10000,
+        max_size: int = 64 * 1024,
+        policy: "CompressionPolicy" = None,
+    ) -> None:
+        """Initialize the DictionarySampler object.
+
+        :param directory: The directory of the samples, created if needed
+        :type directory: str
+        :param rate: The probability to sample a response, defaults to 1%
+        :type rate: float
+        :param max_samples: The maximum number of samples, defaults to 10000
+        :type max_samples: int
+        :param max_size: The maximum size of a sample in bytes, defaults to 64 KiB
+        :type max_size: int
+        :param policy: The policy selecting the mimetypes and the status codes,
+            defaults to a new :class:`compress.CompressionPolicy`
+        :type policy: CompressionPolicy
+        """
+        if policy is None:
+            # pylint: disable=import-outside-toplevel
+            from flask_sustainable.compress import CompressionPolicy
+
+            policy = CompressionPolicy()
+        self.policy = policy
+        self.directory = directory
+        self.rate = rate
+        self.max_samples = max_samples
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        self._count = len(os.listdir(directory))
+
+    def sample(
+        self, response: flask.Response, policy: "CompressionPolicy" = None
+    ) -> bool:
+        """Sample the body of a response, if it's selected.
+
+        :param response: The response, its body is read only if it's not streamed
+        :type response: flask.Response
+        :param policy: The policy selecting the mimetypes and the status codes,
+            defaults to :attr:`policy`
+        :type policy: CompressionPolicy
+        :return: True if the body has been written
+        :rtype: bool
+        """
+        policy = policy or self.policy
+        if (
+            self._count >= self.max_samples
+            or not 200 <= response.status_code < 300
+            or response.status_code in policy.exclude_statuses
+            or response.is_streamed
+            or not policy.match_mimetype(response.mimetype or "")
+            or random.random() >= self.rate
+        ):
+            return False
+        data = response.get_data()
+        if not data or len(data) > self.max_size:
+            return False
+        path = os.path.join(self.directory, hashlib.sha256(data).hexdigest())
+        with open(path, "wb") as file:
+            file.write(data)
+        self._count += 1
+        return True
+
+
+def load_samples(directory: str) -> Iterable[bytes]:
+    """Read the samples written by a :class:`DictionarySampler`.
+
+    :param directory: The directory of the samples
+    :type directory: str
+    :return: The samples
+    :rtype: Iterable[bytes]
+    """
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            with open(entry.path, "rb") as file:
+                yield file.read()
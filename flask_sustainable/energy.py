@@ -0,0 +1,376 @@
+# coding: utf-8
+
+"""
+Energy module
+=============
+
+This module measures the power of the process in the background.
+
+Measuring the energy is slow: the hardware must be probed
+and the counters read at a regular interval.
+Doing it for each request adds hundreds of milliseconds.
+
+Instead, a single :class:`EnergySampler` per process samples the power
+in a background thread. The power comes from an :class:`EnergySource`:
+
+- :class:`RAPLSource`: the RAPL counters of the processor (Linux powercap)
+- :class:`TDPSource`: the CPU time of the process and the TDP of the processor,
+  used when RAPL isn't available
+- :class:`CodecarbonSource`: codecarbon (CPU, GPU and RAM)
+
+The energy of a request is derived from it: the energy of the machine
+during the samples that cover the request, weighted by the share of the CPU time
+of the process used by the request during these samples.
+A request waiting for I/O uses little CPU time, so little energy.
+
+.. code-block:: python
+
+    sampler = get_sampler()
+    start = sampler.snapshot()
+    # ... handle the request ...
+    joules = sampler.energy(start)
+"""
+
+import atexit
+import collections
+import logging
+import os
+import re
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from typing import Deque, Tuple
+
+from flask_sustainable.accounting import cpu_time
+
+logger = logging.getLogger(__name__)
+
+#: State of a request: (wall time, CPU time of the request)
+Snapshot = Tuple[float, float]
+
+
+class EnergySource(metaclass=ABCMeta):
+    """Source of the energy consumed by the machine."""
+
+    @abstractmethod
+    def read(self) -> float:
+        """Read the energy consumed since an arbitrary origin.
+
+        :return: The energy in joules
+        :rtype: float
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the resources of the source.
+
+        :return: None
+        """
+
+
+class CodecarbonSource(EnergySource):
+    """Energy measured by codecarbon (CPU, GPU and RAM).
+
+    A single tracker is created, its measures are triggered by :meth:`read`.
+    """
+
+    def __init__(self, country_iso_code: str = "FRA") -> None:
+        """Initialize the source.
+
+        :param country_iso_code: The country of the server, defaults to ``FRA``
+        :type country_iso_code: str
+        """
+        # pylint: disable=import-outside-toplevel
+        from codecarbon import OfflineEmissionsTracker
+
+        self._tracker = OfflineEmissionsTracker(
+            country_iso_code=country_iso_code,
+            # The measures are triggered by the sampler
+            measure_power_secs=3600,
+            log_level="error",
+            save_to_file=False,
+        )
+        self._tracker.start()
+
+    def read(self) -> float:
+        # pylint: disable=w0212
+        self._tracker._measure_power_and_energy()
+        return self._tracker._total_energy.kWh * 3.6e6
+
+    def close(self) -> None:
+        self._tracker.stop()
+
+
+class RAPLSource(EnergySource):
+    """Energy read from the RAPL counters of the Linux powercap interface.
+
+    The counters of the top-level domains (one per CPU package) are read,
+    the sub-domains (cores, dram, ...) are included in them.
+    The file descriptors are opened once, a reading is a ``pread`` per domain.
+    The wraparound of the counters is handled.
+
+    Reading the counters may require root privileges.
+    """
+
+    PATTERN = re.compile(r"^[a-z-]*rapl:\d+$")
+
+    def __init__(self, root: str = "/sys/class/powercap") -> None:
+        """Initialize the source.
+
+        :param root: The powercap directory, defaults to ``/sys/class/powercap``
+        :type root: str
+        :raises OSError: If there is no readable RAPL domain
+        """
+        self._domains = []  # [file descriptor, max range, last value]
+        try:
+            for name in sorted(os.listdir(root)):
+                if not self.PATTERN.match(name):
+                    continue
+                path = os.path.join(root, name)
+                with open(os.path.join(path, "max_energy_range_uj")) as file:
+                    max_range = int(file.read())
+                descriptor = os.open(os.path.join(path, "energy_uj"), os.O_RDONLY)
+                self._domains.append([descriptor, max_range, 0])
+                self._domains[-1][2] = self._pread(descriptor)
+        except OSError:
+            self.close()
+            raise
+        if not self._domains:
+            raise OSError(f"No RAPL domain found in {root}")
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _pread(descriptor: int) -> int:
+        return int(os.pread(descriptor, 32, 0))
+
+    def read(self) -> float:
+        with self._lock:
+            for domain in self._domains:
+                descriptor, max_range, last = domain
+                value = self._pread(descriptor)
+                # The counter restarts from zero when it reaches its maximum
+                self._total += (
+                    value - last if value >= last else max_range - last + value
+                )
+                domain[2] = value
+            return self._total / 1e6
+
+    def close(self) -> None:
+        for domain in self._domains:
+            os.close(domain[0])
+        self._domains = []
+
+
+class TDPSource(EnergySource):
+    """Energy estimated from the CPU time of the process and the TDP of the CPU.
+
+    Each CPU is supposed to consume ``tdp / cpu_count`` watts when it's busy.
+    It's used when the RAPL counters are not available.
+    """
+
+    def __init__(self, tdp: float = 65.0, cpu_count: int = None) -> None:
+        """Initialize the source.
+
+        :param tdp: The thermal design power of the processor in watts,
+            defaults to 65
+        :type tdp: float
+        :param cpu_count: The number of CPU of the processor, defaults to all
+        :type cpu_count: int
+        """
+        self.power_per_cpu = tdp / (cpu_count or os.cpu_count() or 1)
+
+    def read(self) -> float:
+        return time.process_time() * self.power_per_cpu
+
+
+def default_source() -> EnergySource:
+    """Get the cheapest accurate source available.
+
+    :return: A :class:`RAPLSource` if the counters are readable,
+        a :class:`TDPSource` otherwise
+    :rtype: EnergySource
+    """
+    try:
+        return RAPLSource()
+    except (OSError, ValueError) as error:
+        logger.info("RAPL is not available (%s), the TDP is used", error)
+        return TDPSource()
+
+
+class EnergySampler:
+    """Sample the power of the machine in a background thread.
+
+    The sampler is shared by all the requests of the process,
+    see :func:`get_sampler`. The thread is restarted after a fork.
+    """
+
+    def __init__(
+        self, source: EnergySource = None, interval: float = 1.0, history: int = 60
+    ) -> None:
+        """Initialize the sampler.
+
+        :param source: The source of the energy, defaults to :func:`default_source`
+        :type source: EnergySource
+        :param interval: The duration in seconds between two samples, defaults to 1
+        :type interval: float
+        :param history: The number of samples kept, defaults to 60
+        :type history: int
+        """
+        self.source = source
+        self.interval = interval
+        #: Last sampled power in watts
+        self.power: float = 0.0
+        # (end of the sample, energy in joules, CPU time of the process in seconds)
+        self._samples: Deque[Tuple[float, float, float]] = collections.deque(
+            maxlen=history
+        )
+        self._thread: threading.Thread = None
+        self._pid: int = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Whether the thread of the sampler is running in this process."""
+        return (
+            self._thread is not None
+            and self._pid == os.getpid()
+            and self._thread.is_alive()
+        )
+
+    def start(self) -> None:
+        """Start the background thread, if it's not running.
+
+        :return: None
+        """
+        with self._lock:
+            if self.running:
+                return
+            if self.source is None:
+                self.source = default_source()
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="flask-sustainable-energy", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and close the source.
+
+        :return: None
+        """
+        self._stop.set()
+        if self.running:
+            self._thread.join()
+        if self.source is not None:
+            self.source.close()
+
+    def sample(self, last: Tuple[float, float, float]) -> Tuple[float, float, float]:
+        """Take a sample.
+
+        :param last: The previous reading: (time, energy in joules,
+            CPU time of the process in seconds)
+        :type last: Tuple[float, float, float]
+        :return: The new reading
+        :rtype: Tuple[float, float, float]
+        """
+        now, energy, cpu = time.monotonic(), self.source.read(), time.process_time()
+        elapsed = now - last[0]
+        if elapsed > 0:
+            joules = max(energy - last[1], 0.0)
+            self.power = joules / elapsed
+            self._samples.append((now, joules, max(cpu - last[2], 0.0)))
+        return now, energy, cpu
+
+    def _run(self) -> None:
+        try:
+            last = (time.monotonic(), self.source.read(), time.process_time())
+            while not self._stop.wait(self.interval):
+                last = self.sample(last)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("The energy sampler has stopped")
+
+    def window(self, start: float, end: float) -> Tuple[float, float]:
+        """Get the energy and the CPU time of the process between two instants.
+
+        The window is extended to the samples that cover the instants.
+        When no sample covers the window, the last sample is used.
+
+        :param start: The start of the window (:func:`time.monotonic`)
+        :type start: float
+        :param end: The end of the window (:func:`time.monotonic`)
+        :type end: float
+        :return: The energy in joules and the CPU time in seconds
+        :rtype: Tuple[float, float]
+        """
+        samples = list(self._samples)
+        # A sample covers the interval that precedes it
+        covering = [
+            (joules, cpu)
+            for sample_end, joules, cpu in samples
+            if sample_end >= start and sample_end - self.interval <= end
+        ]
+        if not covering:
+            covering = [x[1:] for x in samples[-1:]]
+        return sum(x[0] for x in covering), sum(x[1] for x in covering)
+
+    @staticmethod
+    def snapshot() -> Snapshot:
+        """Get the state at the beginning of a request.
+
+        :return: The wall time and the CPU time of the request
+            (see :func:`accounting.cpu_time`)
+        :rtype: Snapshot
+        """
+        return time.monotonic(), cpu_time()
+
+    def attribute(self, start: Snapshot) -> Tuple[float, float]:
+        """Attribute the power and the energy of the process to a request.
+
+        The energy of the request is the CPU time of the request divided by
+        the CPU time of the process during the window (see :meth:`window`),
+        multiplied by the energy of the window.
+        The power is this energy divided by the duration of the request.
+
+        :param start: The snapshot taken at the beginning of the request
+        :type start: Snapshot
+        :return: The power in watts and the energy in joules of the request
+        :rtype: Tuple[float, float]
+        """
+        end = self.snapshot()
+        wall, request_cpu = end[0] - start[0], end[1] - start[1]
+        joules, process_cpu = self.window(start[0], end[0])
+        share = min(request_cpu / process_cpu, 1.0) if process_cpu > 0 else 0.0
+        energy = joules * share
+        return (energy / wall if wall > 0 else 0.0), energy
+
+    def energy(self, start: Snapshot) -> float:
+        """Get the energy attributed to a request.
+
+        :param start: The snapshot taken at the beginning of the request
+        :type start: Snapshot
+        :return: The energy in joules
+        :rtype: float
+        """
+        return self.attribute(start)[1]
+
+
+_SAMPLER: EnergySampler = None
+_SAMPLER_LOCK = threading.Lock()
+
+
+def get_sampler() -> EnergySampler:
+    """Get the sampler shared by the process, it's started if needed.
+
+    :return: The sampler of the process
+    :rtype: EnergySampler
+    """
+    global _SAMPLER  # pylint: disable=global-statement
+    with _SAMPLER_LOCK:
+        if _SAMPLER is None:
+            _SAMPLER = EnergySampler()
+            atexit.register(_SAMPLER.stop)
+    _SAMPLER.start()
+    return _SAMPLER
@@ -0,0 +1,420 @@
+# coding: utf-8
+
+"""
+Exporter module
+===============
+
+This module exports the values of the measured requests, off the request thread.
+
+The request thread only puts a record in a bounded queue.
+When the queue is full, the record is dropped: the requests never wait.
+A background thread takes the records by batch and writes them to a sink:
+
+- :class:`JSONLinesSink`: a JSON Lines file, rotated by size
+- :class:`StatsDSink`: StatsD metrics sent over UDP (e.g. to a local agent)
+- :class:`HTTPSink`: batches posted as JSON to a local collector
+
+.. code-block:: python
+
+    exporter = TelemetryExporter(JSONLinesSink("telemetry.jsonl"))
+    sustainable = Sustainable(app, exporter=exporter)
+    exporter.stats()
+    {'depth': 0, 'exported': 120, 'dropped': 0, 'errors': 0}
+
+A record is a dict:
+
+.. code-block:: python
+
+    {
+        "timestamp": 1660000000.0,
+        "endpoint": "index",
+        "method": "GET",
+        "status": 200,
+        "values": {"Perf-Time": 1.2, "Perf-CPU": 0.8},
+    }
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import threading
+import urllib.request
+import weakref
+from abc import ABCMeta, abstractmethod
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+class BaseSink(metaclass=ABCMeta):
+    """Base class for all destinations of the records."""
+
+    @abstractmethod
+    def write(self, records: List[dict]) -> None:
+        """Write a batch of records.
+
+        This method is called by the thread of the exporter only.
+
+        :param records: The records
+        :type records: List[dict]
+        :return: None
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the resources of the sink.
+
+        :return: None
+        """
+
+
+class JSONLinesSink(BaseSink):
+    """Write the records in a JSON Lines file.
+
+    When the file exceeds ``max_bytes``, it's renamed with the suffix ``.1``
+    (the previous ``.1`` becomes ``.2``, ...) and a new file is started.
+    """
+
+    def __init__(
+        self, path: str, max_bytes: int = 64 * 1024 * 1024, backups: int = 3
+    ) -> None:
+        """Initialize the sink.
+
+        :param path: The path of the file
+        :type path: str
+        :param max_bytes: The size of the file before the rotation, defaults to 64 MiB
+        :type max_bytes: int
+        :param backups: The number of rotated files kept, defaults to 3
+        :type backups: int
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+
+    def _rotate(self) -> None:
+        """Rename the file and the previous backups.
+
+        :return: None
+        """
+        self.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, records: List[dict]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")  # pylint: disable=r1732
+        self._file.write("".join(json.dumps(x) + "\n" for x in records))
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StatsDSink(BaseSink):
+    """Send the values as StatsD metrics over UDP.
+
+    The name of a metric is ``<prefix>.<endpoint>.<header>``,
+    e.g. ``sustainable.index.perf_time``.
+    The durations (``Perf-Time`` and ``Perf-CPU``) are sent as timers (``ms``),
+    the other values (RAM, energy, power, scores) as histograms (``h``,
+    e.g. with DogStatsD) or gauges (``g``).
+    A signed gauge is a variation of the stored value in StatsD,
+    so a negative gauge (e.g. the RAM released by a request) is preceded by ``0``.
+    """
+
+    #: Characters replaced in the names of the metrics
+    INVALID = re.compile(r"[^a-zA-Z0-9_]")
+    #: Headers sent as timers, in lowercase
+    TIMERS = frozenset(("perf-time", "perf-cpu"))
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8125,
+        prefix: str = "sustainable",
+        max_packet: int = 1432,
+        metric_type: str = "h",
+    ) -> None:
+        """Initialize the sink.
+
+        :param host: The host of the StatsD agent, defaults to ``127.0.0.1``
+        :type host: str
+        :param port: The port of the StatsD agent, defaults to 8125
+        :type port: int
+        :param prefix: The prefix of the metrics, defaults to ``sustainable``
+        :type prefix: str
+        :param max_packet: The maximum size of a UDP packet, defaults to 1432
+        :type max_packet: int
+        :param metric_type: The type of the values that aren't durations,
+            ``h`` (histogram) or ``g`` (gauge), defaults to ``h``
+        :type metric_type: str
+        :raises ValueError: If the type isn't ``g`` or ``h``
+        """
+        if metric_type not in ("g", "h"):
+            raise ValueError(f"Unknown StatsD metric type: {metric_type!r}")
+        self.metric_type = metric_type
+        self.address = (host, port)
+        self.prefix = prefix
+        self.max_packet = max_packet
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _name(self, endpoint: str, header: str) -> str:
+        return ".".join(
+            (
+                self.prefix,
+                self.INVALID.sub("_", endpoint or "none"),
+                self.INVALID.sub("_", header.lower()),
+            )
+        )
+
+    def _line(self, endpoint: str, header: str, value: float) -> str:
+        name = self._name(endpoint, header)
+        if header.lower() in self.TIMERS:
+            return f"{name}:{value}|ms"
+        if self.metric_type == "g" and value < 0:
+            # Reset the gauge, then decrement it: both in the same packet
+            return f"{name}:0|g\n{name}:{value}|g"
+        return f"{name}:{value}|{self.metric_type}"
+
+    def write(self, records: List[dict]) -> None:
+        lines = [
+            self._line(record["endpoint"], name, value)
+            for record in records
+            for name, value in record["values"].items()
+        ]
+        # Several lines per packet, under the MTU
+        packet = ""
+        for line in lines:
+            if packet and len(packet) + len(line) + 1 > self.max_packet:
+                self._socket.sendto(packet.encode(), self.address)
+                packet = ""
+            packet = f"{packet}\n{line}" if packet else line
+        if packet:
+            self._socket.sendto(packet.encode(), self.address)
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+class HTTPSink(BaseSink):
+    """Post the batches of records as JSON to a local collector.
+
+    The body is ``{"records": [...]}``.
+    """
+
+    def __init__(
+        self, url: str = "http://127.0.0.1:4318/sustainable", timeout: float = 2.0
+    ) -> None:
+        """Initialize the sink.
+
+        :param url: The URL of the collector
+        :type url: str
+        :param timeout: The timeout of a request in seconds, defaults to 2
+        :type timeout: float
+        """
+        self.url = url
+        self.timeout = timeout
+
+    def write(self, records: List[dict]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"records": records}).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class TelemetryExporter:
+    """Export the records on a background thread.
+
+    The thread is started with the first record, and restarted after a fork.
+    The remaining records are written when the process exits.
+    Once stopped, the exporter drops the records.
+    """
+
+    def __init__(
+        self,
+        sink: BaseSink,
+        max_queue: int = 10000,
+        batch_size: int = 100,
+        interval: float = 1.0,
+    ) -> None:
+        """Initialize the exporter.
+
+        :param sink: The destination of the records
+        :type sink: BaseSink
+        :param max_queue: The maximum number of records waiting, defaults to 10000
+        :type max_queue: int
+        :param batch_size: The maximum number of records of a batch, defaults to 100
+        :type batch_size: int
+        :param interval: The maximum duration in seconds a record waits
+            for its batch to be full, defaults to 1
+        :type interval: float
+        """
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self.exported = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue: "queue.Queue[dict]" = queue.Queue(max_queue)
+        self._thread: threading.Thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._closed = False
+        _EXPORTERS.add(self)
+
+    def _after_fork(self) -> None:
+        # The thread doesn't exist in the child process
+        self._thread = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(self.max_queue)
+
+    def start(self) -> None:
+        """Start the background thread, if it's not running.
+
+        :return: None
+        """
+        with self._lock:
+            if self._thread is not None or self._closed:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="flask-sustainable-exporter", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, record: dict) -> bool:
+        """Queue a record, without waiting.
+
+        :param record: The record
+        :type record: dict
+        :return: False if the queue is full or the exporter is stopped,
+            and the record is dropped
+        :rtype: bool
+        """
+        if self._closed:
+            return False
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def _batch(self) -> List[dict]:
+        """Wait for the records of a batch.
+
+        :return: The records, an empty list if there is none
+        :rtype: List[dict]
+        """
+        try:
+            records = [self._queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        return records + self._batch_nowait(self.batch_size - 1)
+
+    def _batch_nowait(self, size: int) -> List[dict]:
+        """Take the records already queued.
+
+        :param size: The maximum number of records
+        :type size: int
+        :return: The records, an empty list if there is none
+        :rtype: List[dict]
+        """
+        records = []
+        while len(records) < size:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _write(self, records: List[dict]) -> None:
+        try:
+            self.sink.write(records)
+            self.exported += len(records)
+        except Exception:  # pylint: disable=broad-except
+            self.errors += 1
+            logger.exception("Unable to export %s records", len(records))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            records = self._batch()
+            if records:
+                self._write(records)
+        # Write the remaining records
+        records = self._batch_nowait(self.batch_size)
+        while records:
+            self._write(records)
+            records = self._batch_nowait(self.batch_size)
+
+    def stop(self) -> None:
+        """Write the remaining records, stop the thread and close the sink.
+
+        :return: None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join()
+        self._thread = None
+        self.sink.close()
+
+    def stats(self) -> dict:
+        """Get the counters of the exporter.
+
+        :return: The number of records waiting (depth), exported, dropped,
+            and the number of failed batches
+        :rtype: dict
+        """
+        return {
+            "depth": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+# The exporters of the process, the hooks are registered once
+_EXPORTERS: "weakref.WeakSet[TelemetryExporter]" = weakref.WeakSet()
+
+
+def _after_fork() -> None:
+    for exporter in list(_EXPORTERS):
+        exporter._after_fork()  # pylint: disable=protected-access
+
+
+def _stop_exporters() -> None:
+    for exporter in list(_EXPORTERS):
+        exporter.stop()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+atexit.register(_stop_exporters)
@@ -12,11 +12,27 @@ Also, it add a compression to the response.
 """
 
 import logging
+import time
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, Union
 
 import flask
 
-from flask_sustainable.base import BaseHeader, BaseIndicator, BaseScore
-from flask_sustainable.compress import Compression
+from flask_sustainable.accounting import install as install_accounting
+from flask_sustainable.base import (
+    BaseHeader,
+    BaseIndicator,
+    BaseScore,
+    requested_headers,
+)
+from flask_sustainable.cli import cli
+from flask_sustainable.codec import DEFAULT_PROFILE, CodecRegistry
+from flask_sustainable.compress import Compression, CompressionPolicy
+from flask_sustainable.dictionary import CompressionDictionary, DictionarySampler
+from flask_sustainable.exporter import TelemetryExporter
+from flask_sustainable.metrics import MetricsAggregator
+from flask_sustainable.plan import ExecutionPlan
+from flask_sustainable.precompress import serve_precompressed
+from flask_sustainable.sampling import BaseSampler
 
 logger = logging.getLogger(__name__)
 
@@ -27,12 +43,79 @@ class Sustainable:
     This extension add the following features:
     - compress response
     - add new headers about indicators and scores to the response
+
+    The compression can be configured with the following options:
+
+    - ``codecs`` (:class:`CodecRegistry`): the codecs that can be negotiated,
+      defaults to :attr:`Compression.CODECS`
+    - ``compress_profile`` (str or callable): the level profile of the codecs,
+      defaults to ``balanced``. A callable receives the response
+      and returns the name of the profile.
+    - ``compress_adaptive`` (:class:`adaptive.AdaptiveProfile`): choose the profile
+      of each response from the load of the process, instead of
+      ``compress_profile``, disabled by default
+    - ``compress_parallel`` (:class:`parallel.ParallelCompressor`): compress
+      the large bodies on a pool of threads, disabled by default
+    - ``compress_stream`` (bool): compress streamed responses chunk by chunk,
+      defaults to True
+    - ``compress_flush_size`` (int): number of bytes compressed between two flushes
+      of a streamed response, defaults to :attr:`Compression.FLUSH_SIZE`
+    - ``compress_policy`` (:class:`CompressionPolicy`): decide which responses
+      are compressed, defaults to ``CompressionPolicy()``
+    - ``compress_cache`` (:class:`cache.BaseCompressionCache`): cache of the
+      compressed bodies, disabled by default
+    - ``precompressed`` (bool): serve the precompressed siblings of the static
+      files, written by ``flask sustainable precompress``, defaults to True
+    - ``compress_dictionary`` (:class:`dictionary.CompressionDictionary` or str):
+      the dictionary (or the path of the dictionary) shared with the clients,
+      disabled by default
+    - ``compress_dictionary_url`` (str): the URL of the dictionary,
+      defaults to ``/sustainable/dictionary``
+    - ``dictionary_sampler`` (:class:`dictionary.DictionarySampler`):
+      write samples of the response bodies to train a dictionary,
+      disabled by default
+
+    .. code-block:: python
+
+        def profile(response):
+            return "max" if response.cache_control.public else "fast"
+
+        sustainable = Sustainable(app, compress_profile=profile)
+
+    The server can also measure a sample of the requests,
+    whether the client sends the ``Perf`` header or not:
+
+    - ``sampling`` (:class:`sampling.BaseSampler`): choose the requests
+      measured with all the indicators and scores, disabled by default
+    - ``metrics`` (:class:`metrics.MetricsAggregator`): aggregate the values
+      of the measured requests by endpoint, see :attr:`metrics`
+    - ``metrics_requested`` (bool): also aggregate the values of the requests
+      measured because the client sent the ``Perf`` header, defaults to True
+    - ``metrics_url`` (str): the URL of the aggregates as JSON, disabled by default
+    - ``prometheus`` (:class:`prometheus.PrometheusMetrics`): expose the
+      indicators and the compression to Prometheus, disabled by default
+    - ``prometheus_url`` (str): the URL of the Prometheus metrics,
+      defaults to ``/metrics``
+    - ``compress_observer`` (:class:`compress.CompressionObserver`): observe
+      the compression of the responses, defaults to the ``prometheus`` option
+    - ``exporter`` (:class:`exporter.TelemetryExporter`): export the values
+      of the measured requests on a background thread, disabled by default
     """
 
     def __init__(self, app: flask.Flask = None, **kwargs) -> None:
         self._options = kwargs
+        self._app: flask.Flask = None
+        self._compression_options: dict = {}
+        self._compress_profile: Union[str, Callable] = DEFAULT_PROFILE
+        self._precompressed: bool = True
+        self._dictionary_sampler: DictionarySampler = None
         self._registered_indicators: list[BaseIndicator] = []
         self._registered_scores: list[BaseScore] = []
+        self._plan = ExecutionPlan()
+        self._sampling: BaseSampler = None
+        self._metrics = MetricsAggregator()
+        self._metrics_requested: bool = True
+        self._exporter: TelemetryExporter = None
         if app is not None:
             self.init_app(app, **kwargs)
 
@@ -45,11 +128,140 @@ class Sustainable:
 
         :param app: The flask application to initialize
         :type app: flask.Flask
+        :param kwargs: The options of the extension, see :class:`Sustainable`
         :return: None
         """
+        self._options.update(kwargs)
+        dictionary = self._options.get("compress_dictionary")
+        if isinstance(dictionary, str):
+            dictionary = CompressionDictionary.load(dictionary)
+        if dictionary is not None:
+            app.add_url_rule(
+                self._options.get("compress_dictionary_url", "/sustainable/dictionary"),
+                "sustainable_dictionary",
+                dictionary.make_response,
+            )
+        self._dictionary_sampler = self._options.get("dictionary_sampler")
+        prometheus = self._options.get("prometheus")
+        self._compression_options = {
+            "registry": self._options.get("codecs"),
+            "stream": self._options.get("compress_stream", True),
+            "flush_size": self._options.get("compress_flush_size"),
+            "policy": self._options.get("compress_policy") or CompressionPolicy(),
+            "cache": self._options.get("compress_cache"),
+            "dictionary": dictionary,
+            "adaptive": self._options.get("compress_adaptive"),
+            "parallel": self._options.get("compress_parallel"),
+            "observer": self._options.get("compress_observer", prometheus),
+        }
+        self._compress_profile = self._options.get("compress_profile", DEFAULT_PROFILE)
+        self._precompressed = self._options.get("precompressed", True)
+        self._sampling = self._options.get("sampling")
+        self._metrics = self._options.get("metrics") or self._metrics
+        self._metrics_requested = self._options.get("metrics_requested", True)
+        self._exporter = self._options.get("exporter")
+        if self._options.get("metrics_url"):
+            app.add_url_rule(
+                self._options["metrics_url"],
+                "sustainable_metrics",
+                lambda: flask.jsonify(self._metrics.snapshot()),
+            )
+        if prometheus is not None:
+            self._metrics.add_listener(prometheus.record)
+            app.add_url_rule(
+                self._options.get("prometheus_url", "/metrics"),
+                "sustainable_prometheus",
+                prometheus.make_response,
+            )
+        app.extensions["sustainable"] = self
+        self._app = app
+        for header in (*self._registered_indicators, *self._registered_scores):
+            header.setup(app)
+        # The CPU time of the async views is added to their request
+        install_accounting(app)
+        app.cli.add_command(cli)
         app.before_request(self.before_request)
         app.after_request(self.after_request)
 
+    @property
+    def codecs(self) -> CodecRegistry:
+        """The codecs that can be negotiated.
+
+        :return: The registry given by the ``codecs`` option,
+            defaults to :attr:`Compression.CODECS`
+        :rtype: CodecRegistry
+        """
+        return self._compression_options.get("registry") or Compression.CODECS
+
+    @property
+    def metrics(self) -> MetricsAggregator:
+        """The aggregates of the values of the sampled requests.
+
+        :return: The aggregator given by the ``metrics`` option
+        :rtype: MetricsAggregator
+        """
+        return self._metrics
+
+    @property
+    def compress_policy(self) -> CompressionPolicy:
+        """The policy deciding which responses are compressed.
+
+        :return: The policy given by the ``compress_policy`` option
+        :rtype: CompressionPolicy
+        """
+        return self._compression_options.get("policy") or CompressionPolicy()
+
+    def stream_json(
+        self, records: Iterable[Any], chunk_size: int = None
+    ) -> flask.Response:
+        """Make a streamed response of a JSON array, serialised record by record.
+
+        Unlike :func:`flask.jsonify`, the whole document is never built:
+        the records are serialised while the response is sent,
+        and the chunks are compressed one by one (see ``compress_stream``).
+        The memory used is bounded by the size of a chunk.
+
+        The indicators are measured when the response is returned by the view,
+        the serialisation happens after them.
+
+        .. code-block:: python
+
+            @app.route("/users")
+            def users():
+                return sustainable.stream_json(x.to_dict() for x in User.query)
+
+        :param records: The items of the array, serialised with :func:`flask.json.dumps`
+        :type records: Iterable[Any]
+        :param chunk_size: The number of characters of a chunk,
+            defaults to the ``compress_flush_size`` option
+        :type chunk_size: int
+        :return: The streamed response
+        :rtype: flask.Response
+        """
+        chunk_size = (
+            chunk_size
+            or self._compression_options.get("flush_size")
+            or Compression.FLUSH_SIZE
+        )
+
+        def generate() -> Iterator[str]:
+            chunk, size, separator = ["["], 1, ""
+            for record in records:
+                item = separator + flask.json.dumps(record)
+                separator = ","
+                chunk.append(item)
+                size += len(item)
+                if size >= chunk_size:
+                    yield "".join(chunk)
+                    chunk, size = [], 0
+            chunk.append("]")
+            yield "".join(chunk)
+
+        # The records may need the request (e.g. a lazy database query)
+        return flask.Response(
+            flask.stream_with_context(generate()), mimetype="application/json"
+        )
+
     def before_request(self) -> None:
         """When this extension is enabled, this method is called before each
         request.
@@ -62,13 +274,22 @@ class Sustainable:
         that are registered in the application.
         To register a new BaseHeader, use the :meth:`add_indicator` method.
 
-        Internally, this functions use the :attr:`_registered_indicators` attribute.
+        Only the indicators requested in the ``Perf`` header are called,
+        see :func:`base.requested_headers` and :class:`plan.ExecutionPlan`.
+
+        A request selected by the ``sampling`` option is measured
+        by all the indicators.
 
         :return: None
         """
-        for registered_header in self._registered_indicators:
-            if registered_header.should_use():
-                registered_header.before_request()
+        token = None
+        if self._sampling is not None:
+            token = self._sampling.sample(flask.request.endpoint)
+        if token is None:
+            self._plan.before_request()
+        else:
+            flask.g.perf_sample = token
+            self._plan.before_request(self._plan.names)
 
     def after_request(self, response: flask.Response) -> flask.Response:
         """When this extension is enabled, this method is called after each
@@ -81,32 +302,133 @@ class Sustainable:
         To register a new :class:`BaseHeader`,
         use the :meth:`add_indicator` or :meth:`add_score` method.
 
-        Internally, this functions use the
-        :attr:`_registered_indicators` and :attr:`_registered_scores` attribute
+        Only the headers requested in the ``Perf`` header are called,
+        in the order of :class:`plan.ExecutionPlan`.
         """
-        # Compress the response
-        try:
-            response = Compression(response).compress(check=True)
-        except TypeError as error:
-            logger.warning("Error while compressing the response")
-            logger.exception(error)
-        # Retrieve all registered headers
-        registered: list[BaseHeader] = [
-            *self._registered_indicators,
-            *self._registered_scores,
-        ]
+        if self._dictionary_sampler is not None:
+            self._dictionary_sampler.sample(response, self.compress_policy)
+        # A static file with a fresh precompressed sibling isn't compressed
+        precompressed = None
+        if self._precompressed:
+            precompressed = serve_precompressed(response, self.codecs)
+        if precompressed is not None:
+            response = precompressed
+        else:
+            response = self._compress(response)
         # Add allowed headers
         if flask.request.method == "OPTIONS":
-            headers = [x.name for x in registered]
             response.headers.extend(
-                {"Access-Control-Allow-Headers": ", ".join(headers)}
+                {"Access-Control-Allow-Headers": self._plan.allow_headers}
             )
-        # Run after_request on all registered headers
-        for header in registered:
-            if header.should_use():
-                header.after_request(response=response)
+        token = flask.g.get("perf_sample")
+        if token is None:
+            requested = requested_headers()
+            self._plan.after_request(response, requested)
+            if requested and (self._metrics_requested or self._exporter):
+                values = self._collect(response, requested)
+                if values and self._metrics_requested:
+                    self._metrics.record(flask.request.endpoint or "", values)
+                if values and self._exporter is not None:
+                    self._export(response, values)
+            return response
+        # A sampled request: all the headers have been measured
+        self._plan.after_request(response, self._plan.names)
+        values = self._collect(response, self._plan.names, remove=True)
+        self._sampling.record(
+            token, flask.request.endpoint or "", values, self._metrics
+        )
+        if self._exporter is not None:
+            self._export(response, values)
         return response
 
+    def _compress(self, response: flask.Response) -> flask.Response:
+        """Compress a response, see :class:`Compression`.
+
+        :param response: The response
+        :type response: flask.Response
+        :return: The compressed response
+        :rtype: flask.Response
+        """
+        profile = self._compress_profile
+        if callable(profile):
+            profile = profile(response)
+        try:
+            response = Compression(
+                response, profile=profile, inplace=True, **self._compression_options
+            ).compress(check=True)
+        except TypeError as error:
+            logger.warning("Error while compressing the response")
+            logger.exception(error)
+        return response
+
+    def _export(self, response: flask.Response, values: Dict[str, float]) -> None:
+        """Queue the values of a request in the exporter.
+
+        :param response: The response of the request
+        :type response: flask.Response
+        :param values: The value of each header
+        :type values: Dict[str, float]
+        :return: None
+        """
+        self._exporter.submit(
+            {
+                "timestamp": time.time(),
+                "endpoint": flask.request.endpoint,
+                "method": flask.request.method,
+                "status": response.status_code,
+                "values": values,
+            }
+        )
+
+    def _collect(
+        self, response: flask.Response, names: FrozenSet[str], remove: bool = False
+    ) -> Dict[str, float]:
+        """Collect the values of the headers of a response.
+
+        :param response: The response
+        :type response: flask.Response
+        :param names: The lowercased names of the headers to collect
+        :type names: FrozenSet[str]
+        :param remove: If True, the headers that the client didn't request
+            are removed from the response, defaults to False
+        :type remove: bool
+        :return: The value of each header
+        :rtype: Dict[str, float]
+        """
+        requested = requested_headers()
+        values = {}
+        for position in self._plan.select(names):
+            name = self._plan.headers[position].name
+            value = response.headers.get(name)
+            if value is None:
+                continue
+            try:
+                values[name] = float(value)
+            except ValueError:
+                pass
+            if remove and name.lower() not in requested:
+                del response.headers[name]
+        return values
+
+    def _register(self, header: BaseHeader) -> None:
+        """Rebuild the execution plan with a new header.
+
+        :param header: The header to register
+        :type header: BaseHeader
+        :raises ValueError: If a header with the same name is already registered,
+            or if the requirements of the headers have a cycle
+        :return: None
+        """
+        self._plan = ExecutionPlan(
+            (*self._registered_indicators, *self._registered_scores, header)
+        )
+        if isinstance(header, BaseIndicator):
+            self._registered_indicators.append(header)
+        else:
+            self._registered_scores.append(header)
+        if self._app is not None:
+            header.setup(self._app)
+
     def add_indicator(self, indicator: BaseIndicator) -> None:
         """Add an indicator to the response.
 
@@ -116,6 +438,7 @@ class Sustainable:
         :param header: Indicator to add, must be a subclass of BaseIndicator
         :type header: BaseIndicator
         :raises AssertionError: If indicator is not a subclass of BaseIndicator
+        :raises ValueError: If a header with the same name is already registered
         :return: None
         """
         assert isinstance(
@@ -124,7 +447,7 @@ class Sustainable:
         assert indicator.name and indicator.name.lower().startswith(
             "perf-"
         ), "Indicator name must start with 'Perf-'"
-        self._registered_indicators.append(indicator)
+        self._register(indicator)
 
     def add_indicators(self, *indicators: BaseIndicator) -> None:
         """Add multiple indicators to the response.
@@ -134,6 +457,7 @@ class Sustainable:
         :param indicators: Indicators to add, must be a subclass of BaseIndicator
         :type indicators: BaseIndicator
         :raises AssertionError: If indicator is not a subclass of BaseIndicator
+        :raises ValueError: If a header with the same name is already registered
         :return: None
         """
         for indicator in indicators:
@@ -148,6 +472,7 @@ class Sustainable:
         :param header: Score to add, must be a subclass of BaseScore
         :type header: BaseScore
         :raises AssertionError: If score is not a subclass of BaseScore
+        :raises ValueError: If a header with the same name is already registered
         :return: None
         """
         assert isinstance(score, BaseScore), "Score must be a subclass of BaseScore"
@@ -159,7 +484,7 @@ class Sustainable:
                 "Score name must start with 'Perf-score' and end with a number, "
                 "check base.BaseScore"
             ) from error
-        self._registered_scores.append(score)
+        self._register(score)
 
     def add_scores(self, *scores: BaseScore) -> None:
         """Add multiple scores to the response.
@@ -169,6 +494,7 @@ class Sustainable:
         :param scores: Scores to add, must be a subclass of BaseScore
         :type scores: BaseScore
         :raises AssertionError: If score is not a subclass of BaseScore
+        :raises ValueError: If a header with the same name is already registered
         :return: None
         """
         for score in scores:
@@ -6,13 +6,24 @@ For more information about an indicator, see :class:`BaseIndicator`
 class.
 """
 
+import itertools
+import os
+import sys
+import threading
 import time
 import tracemalloc
+from typing import Tuple
 
 import flask
-from codecarbon import OfflineEmissionsTracker
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from flask_sustainable.accounting import cpu_time, start_request
 from flask_sustainable.base import BaseIndicator
+from flask_sustainable.energy import EnergySampler, get_sampler
 
 
 class PerfTime(BaseIndicator):
@@ -48,8 +59,10 @@ class PerfCPU(BaseIndicator):
     When the request is done, the response will contain a header named "Perf-CPU"
     with the CPU time of the request in milliseconds.
 
-    The CPU time is the time spent by the process
+    The CPU time is the time spent by the processor on the request,
     that is different from the execution time.
+    Only the thread of the request is counted (and the steps of its coroutines,
+    see :mod:`accounting`), so the concurrent requests aren't counted.
 
     Example ::
 
@@ -64,20 +77,91 @@ class PerfCPU(BaseIndicator):
     name = "Perf-CPU"
 
     def before_request(self) -> None:
-        flask.g.perf_cpu = time.process_time()
+        flask.g.perf_cpu = start_request()
 
     def after_request(self, response: flask.Response) -> flask.Response:
-        perf_cpu = (time.process_time() - flask.g.perf_cpu) * 1000
+        perf_cpu = (cpu_time() - flask.g.perf_cpu) * 1000
         response.headers.update({self.name: f"{perf_cpu:.5f}"})
         return response
 
 
+#: The process that opened ``/proc/self/statm`` and the file descriptor
+_STATM: Tuple[int, int] = (None, None)
+_STATM_LOCK = threading.Lock()
+_PAGE_SIZE: int = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _statm_after_fork() -> None:
+    # The lock may have been held by another thread of the parent process
+    global _STATM_LOCK  # pylint: disable=global-statement
+    _STATM_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_statm_after_fork)
+
+
+def _rss_statm() -> int:
+    """Get the resident set size of the process from ``/proc/self/statm``.
+
+    The file is opened once per process and read with a single ``pread``.
+
+    :return: The resident set size in bytes
+    :rtype: int
+    """
+    global _STATM  # pylint: disable=global-statement
+    pid, fd = _STATM
+    if pid != os.getpid():
+        with _STATM_LOCK:
+            pid, fd = _STATM
+            if pid != os.getpid():
+                # /proc/self is resolved when the file is opened: the descriptor
+                # inherited from the parent process reads the parent's memory
+                inherited = fd
+                fd = os.open("/proc/self/statm", os.O_RDONLY)
+                _STATM = (os.getpid(), fd)
+                if inherited is not None:
+                    os.close(inherited)
+    return int(os.pread(fd, 64, 0).split()[1]) * _PAGE_SIZE
+
+
+def _rss_getrusage() -> int:
+    """Get the maximum resident set size of the process with ``getrusage``.
+
+    :return: The maximum resident set size in bytes
+    :rtype: int
+    """
+    if resource is None:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+_RSS = _rss_statm if os.path.exists("/proc/self/statm") else _rss_getrusage
+
+
 class PerfRAM(BaseIndicator):
     """Indicator that measure the RAM usage of the request.
 
     When the request is done, the response will contain a header named "Perf-RAM"
     with the RAM usage of the request in megabytes.
 
+    Two backends are available:
+
+    - ``rss`` (default): the variation of the resident set size of the process,
+      from ``/proc/self/statm`` (or ``getrusage`` when it's not available).
+      Its overhead is negligible, but memory reused by the process isn't counted.
+    - ``tracemalloc``: the memory allocated by Python during the request.
+      The tracing slows down the allocations, use ``sample_rate``
+      to trace only 1 request out of N.
+
+    The tracing of tracemalloc is shared by the concurrent requests:
+    it starts with the first traced request and stops with the last one.
+    With threads, the memory allocated by the other requests is counted.
+
+    When a request isn't sampled, the header is not added.
+
     Example ::
 
         from flask_sustainable import Sustainable
@@ -85,18 +169,61 @@ class PerfRAM(BaseIndicator):
 
         app = flask.Flask(__name__)
         sustainable = Sustainable(app)
-        sustainable.add_indicator(PerfRAM())
+        sustainable.add_indicator(PerfRAM(backend="tracemalloc", sample_rate=100))
     """
 
     name = "Perf-RAM"
+    BACKENDS: tuple = ("tracemalloc", "rss")
+
+    # Number of requests being traced by tracemalloc, shared by all instances
+    _traced: int = 0
+    # True if the tracing has been started by PerfRAM (and not by someone else)
+    _started: bool = False
+    _lock = threading.Lock()
+
+    def __init__(self, backend: str = "rss", sample_rate: int = 1) -> None:
+        """Initialize the indicator.
+
+        :param backend: The backend, ``rss`` or ``tracemalloc``, defaults to ``rss``
+        :type backend: str
+        :param sample_rate: Measure 1 request out of ``sample_rate``, defaults to 1
+        :type sample_rate: int
+        :raises ValueError: If the backend is unknown
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, use one of {self.BACKENDS}")
+        self.backend = backend
+        self.sample_rate = max(sample_rate, 1)
+        self._counter = itertools.count()
 
     def before_request(self) -> None:
-        tracemalloc.start()
+        flask.g.perf_ram = None
+        if next(self._counter) % self.sample_rate:
+            return
+        if self.backend == "rss":
+            flask.g.perf_ram = _RSS()
+            return
+        with PerfRAM._lock:
+            if PerfRAM._traced == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                PerfRAM._started = True
+            PerfRAM._traced += 1
+        flask.g.perf_ram = tracemalloc.get_traced_memory()[0]
 
     def after_request(self, response: flask.Response) -> flask.Response:
-        current, _ = tracemalloc.get_traced_memory()
-        perf_ram = (current + tracemalloc.get_tracemalloc_memory()) / 10**6
-        tracemalloc.stop()
+        start = flask.g.get("perf_ram")
+        if start is None:
+            return response
+        if self.backend == "rss":
+            perf_ram = (_RSS() - start) / 10**6
+        else:
+            current, _ = tracemalloc.get_traced_memory()
+            perf_ram = (current - start + tracemalloc.get_tracemalloc_memory()) / 10**6
+            with PerfRAM._lock:
+                PerfRAM._traced -= 1
+                if PerfRAM._traced == 0 and PerfRAM._started:
+                    tracemalloc.stop()
+                    PerfRAM._started = False
         response.headers.update({self.name: f"{perf_ram:.5f}"})
         return response
 
@@ -106,54 +233,64 @@ class PerfEnergy(BaseIndicator):
 
     When the request is done, the response will contain a header named
     "Perf-Energy" with the energy usage of the request in watt-seconds.
+
+    The power is sampled in the background by an :class:`energy.EnergySampler`
+    shared by the process and started when the indicator is registered.
+    The energy of the machine is shared by the requests
+    in proportion to their CPU time, see :meth:`energy.EnergySampler.attribute`.
     """
 
     name = "Perf-Energy"
 
+    def __init__(self, sampler: EnergySampler = None) -> None:
+        """Initialize the indicator.
+
+        :param sampler: The power sampler, defaults to the sampler of the process
+        :type sampler: EnergySampler
+        """
+        self.sampler = sampler
+
+    def setup(self, app: flask.Flask) -> None:
+        if self.sampler is None:
+            self.sampler = get_sampler()
+        self.sampler.start()
+
     def before_request(self) -> None:
-        if not flask.g.get("tracker"):
-            flask.g.tracker = OfflineEmissionsTracker(
-                country_iso_code="FRA",
-                measure_power_secs=3,
-                log_level=flask.current_app.logger.level,
-                save_to_file=False,
-            )
-        flask.g.tracker.start()
+        if self.sampler is None or not self.sampler.running:
+            self.setup(flask.current_app)
+        start_request()
+        flask.g.perf_energy_start = self.sampler.snapshot()
 
     def after_request(self, response: flask.Response) -> flask.Response:
-        flask.g.tracker.stop()
-        # pylint: disable=w0212
-        perf_energy_ws = flask.g.tracker._total_energy.kWh * 3.6e6
+        perf_energy_ws = self.sampler.energy(flask.g.perf_energy_start)
+        # Used by the scores, see PerfScoreCO2
+        flask.g.perf_energy = perf_energy_ws
         response.headers.update({self.name: f"{perf_energy_ws:.5f}"})
         return response
 
 
-class PerfPower(BaseIndicator):
+class PerfPower(PerfEnergy):
     """Indicator that measure the power usage of the request.
 
     When the request is done, the response will contain a header named
     "Perf-Power" with the power usage of the request in watt.
+
+    The power is the energy attributed to the request (see :class:`PerfEnergy`)
+    divided by its duration.
+    This energy is also used by the scores, when Perf-Energy isn't requested.
     """
 
     name = "Perf-Power"
 
     def before_request(self) -> None:
-        if not flask.g.get("tracker"):
-            flask.g.tracker = OfflineEmissionsTracker(
-                country_iso_code="FRA",
-                measure_power_secs=3,
-                log_level=flask.current_app.logger.level,
-                save_to_file=False,
-            )
-        flask.g.tracker.start()
+        if self.sampler is None or not self.sampler.running:
+            self.setup(flask.current_app)
+        start_request()
+        flask.g.perf_power_start = self.sampler.snapshot()
 
     def after_request(self, response: flask.Response) -> flask.Response:
-        flask.g.tracker.stop()
-        # pylint: disable=w0212
-        perf_power = (
-            flask.g.tracker._cpu_power.W
-            + flask.g.tracker._gpu_power.W
-            + flask.g.tracker._ram_power.W
-        )
+        perf_power, perf_energy = self.sampler.attribute(flask.g.perf_power_start)
+        # Used by the scores, see PerfScoreCO2
+        flask.g.setdefault("perf_energy", perf_energy)
         response.headers.update({self.name: f"{perf_power:.5f}"})
         return response
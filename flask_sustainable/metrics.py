@@ -0,0 +1,262 @@
+# coding: utf-8
+
+"""
+Metrics module
+==============
+
+This module aggregates the values of the indicators and scores
+by endpoint, in the process.
+
+For each endpoint and header, the count, sum, min, max and the quantiles
+(p50, p95, p99) of the values are kept. The quantiles are estimated
+with a DDSketch: the memory is bounded and the relative error is 1%.
+
+.. code-block:: python
+
+    sustainable = Sustainable(app, metrics_url="/sustainable/metrics")
+    sustainable.metrics.snapshot()
+    {'index': {'Perf-Time': {'count': 1, 'sum': 1.2, 'min': 1.2, ..., 'p99': 1.2}}}
+"""
+
+import math
+import threading
+from typing import Callable, Dict, List, Tuple
+
+#: Called with the endpoint and the values of each recorded request
+Listener = Callable[[str, Dict[str, float]], None]
+
+#: Quantiles of the snapshots
+QUANTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+
+
+class DDSketch:
+    """Streaming quantiles with a relative accuracy (DDSketch).
+
+    The values are counted in buckets whose bounds grow geometrically,
+    so a quantile is estimated with a relative error of ``relative_accuracy``.
+    When there are more than ``max_buckets`` buckets,
+    the lowest ones are merged: only the lowest quantiles lose accuracy.
+
+    The sketch isn't thread-safe.
+    """
+
+    __slots__ = ("gamma", "_log_gamma", "max_buckets", "count", "zero", "_bins")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """Initialize the sketch.
+
+        :param relative_accuracy: The relative error of the quantiles,
+            defaults to 1%
+        :type relative_accuracy: float
+        :param max_buckets: The maximum number of buckets of each sign,
+            defaults to 2048
+        :type max_buckets: int
+        """
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.count = 0
+        self.zero = 0
+        # Buckets of the positive and the negative values: index -> count
+        self._bins: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+
+    def add(self, value: float) -> None:
+        """Add a value.
+
+        :param value: The value
+        :type value: float
+        :return: None
+        """
+        self.count += 1
+        if value == 0:
+            self.zero += 1
+            return
+        bins = self._bins[value < 0]
+        index = math.ceil(math.log(abs(value)) / self._log_gamma)
+        bins[index] = bins.get(index, 0) + 1
+        if len(bins) > self.max_buckets:
+            # Merge the two lowest buckets
+            lowest, second = sorted(bins)[:2]
+            bins[second] += bins.pop(lowest)
+
+    def _value(self, index: int) -> float:
+        """Get the value represented by a bucket.
+
+        :param index: The index of the bucket
+        :type index: int
+        :return: The value, at the middle of the bounds of the bucket
+        :rtype: float
+        """
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def quantile(self, quantile: float) -> float:
+        """Estimate a quantile.
+
+        :param quantile: The quantile, from 0 to 1
+        :type quantile: float
+        :return: The estimated value, 0 if there is no value
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        rank = quantile * (self.count - 1)
+        positive, negative = self._bins
+        seen = 0
+        # The negative values, from the lowest
+        for index in sorted(negative, reverse=True):
+            seen += negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(positive):
+            seen += positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(positive))
+
+
+class Metric:
+    """Aggregate of the values of a header.
+
+    The metric isn't thread-safe, see :class:`MetricsAggregator`.
+    """
+
+    __slots__ = ("count", "sum", "min", "max", "sketch")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = DDSketch()
+
+    def add(self, value: float) -> None:
+        """Add a value.
+
+        :param value: The value
+        :type value: float
+        :return: None
+        """
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sketch.add(value)
+
+    def to_dict(self) -> dict:
+        """Get the aggregate as a dict.
+
+        :return: The count, sum, min, max, mean and quantiles of the values
+        :rtype: dict
+        """
+        result = {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else 0.0,
+        }
+        for quantile in QUANTILES:
+            # The estimation can't be outside the values
+            estimation = self.sketch.quantile(quantile)
+            result[f"p{quantile * 100:g}"] = min(max(estimation, self.min), self.max)
+        return result
+
+
+class MetricsAggregator:
+    """Aggregate the values of the headers by endpoint and by header.
+
+    The metrics are protected by striped locks:
+    the requests of different endpoints rarely wait for each other.
+    """
+
+    def __init__(self, stripes: int = 16) -> None:
+        """Initialize the aggregator.
+
+        :param stripes: The number of locks, defaults to 16
+        :type stripes: int
+        """
+        self._metrics: Dict[Tuple[str, str], Metric] = {}
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(stripes)]
+        self._listeners: List[Listener] = []
+
+    def add_listener(self, listener: Listener) -> None:
+        """Call a function with the values of each recorded request.
+
+        It's used to export the values, e.g. :class:`prometheus.PrometheusMetrics`.
+
+        :param listener: The function, called with the endpoint and the values
+        :type listener: Listener
+        :return: None
+        """
+        self._listeners.append(listener)
+
+    def _lock(self, key: Tuple[str, str]) -> threading.Lock:
+        """Get the lock of a metric.
+
+        :param key: The endpoint and the name of the header
+        :type key: Tuple[str, str]
+        :return: The lock protecting the metric
+        :rtype: threading.Lock
+        """
+        return self._locks[hash(key) % len(self._locks)]
+
+    def record(self, endpoint: str, values: Dict[str, float]) -> None:
+        """Record the values of a request.
+
+        :param endpoint: The endpoint of the request
+        :type endpoint: str
+        :param values: The value of each header
+        :type values: Dict[str, float]
+        :return: None
+        """
+        for name, value in values.items():
+            key = (endpoint, name)
+            metric = self._metrics.get(key)
+            if metric is None:
+                # setdefault is atomic, a single metric is kept
+                metric = self._metrics.setdefault(key, Metric())
+            with self._lock(key):
+                metric.add(value)
+        for listener in self._listeners:
+            listener(endpoint, values)
+
+    def get(self, endpoint: str, name: str) -> dict:
+        """Get the aggregate of a header.
+
+        :param endpoint: The endpoint
+        :type endpoint: str
+        :param name: The name of the header
+        :type name: str
+        :return: The aggregate, see :meth:`Metric.to_dict`, None if there is none
+        :rtype: dict
+        """
+        key = (endpoint, name)
+        metric = self._metrics.get(key)
+        if metric is None:
+            return None
+        with self._lock(key):
+            return metric.to_dict()
+
+    def snapshot(self) -> Dict[str, Dict[str, dict]]:
+        """Get the aggregates.
+
+        :return: The aggregate of each header, by endpoint
+        :rtype: Dict[str, Dict[str, dict]]
+        """
+        result: Dict[str, Dict[str, dict]] = {}
+        for key, metric in list(self._metrics.items()):
+            with self._lock(key):
+                result.setdefault(key[0], {})[key[1]] = metric.to_dict()
+        return result
+
+    def reset(self) -> None:
+        """Remove all the aggregates.
+
+        :return: None
+        """
+        self._metrics.clear()
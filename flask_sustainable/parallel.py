@@ -0,0 +1,211 @@
+# coding: utf-8
+
+"""
+Parallel module
+===============
+
+This module compresses large bodies on several threads.
+
+zlib and zstandard release the GIL while compressing,
+so a large body can be split and compressed by a pool of threads:
+
+- ``gzip`` and ``deflate``: the body is split in chunks compressed
+  independently, each primed with the 32 KiB that precede it (like pigz),
+  the result is a single standard stream
+- ``zstd``: the native multithreaded mode of zstd is used
+
+The other codecs (``br``, ``lzma``) have no parallel format,
+their bodies are compressed in the request thread.
+
+.. code-block:: python
+
+    parallel = ParallelCompressor(threshold=1024 * 1024, workers=4)
+    sustainable = Sustainable(app, compress_parallel=parallel)
+"""
+
+import logging
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from flask_sustainable.codec import Codec
+
+logger = logging.getLogger(__name__)
+
+#: Size of the window of deflate, the data that primes a chunk
+WINDOW_SIZE: int = 1 << zlib.MAX_WBITS
+
+
+def gzip_header(level: int) -> bytes:
+    """Make the header of a gzip member without name nor modification time.
+
+    The extra flags tell the level, like zlib does.
+
+    :param level: The compression level
+    :type level: int
+    :return: The header
+    :rtype: bytes
+    """
+    extra = 2 if level == 9 else 4 if 0 <= level < 2 else 0
+    return b"\x1f\x8b\x08\x00\x00\x00\x00\x00" + bytes((extra, 0xFF))
+
+
+def zlib_header(level: int) -> bytes:
+    """Make the header of a zlib stream, with a 32 KiB window.
+
+    The FLEVEL bits tell the level, like zlib does.
+
+    :param level: The compression level, -1 for the default level
+    :type level: int
+    :return: The header
+    :rtype: bytes
+    """
+    level = 6 if level < 0 else level
+    flevel = 0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3
+    cmf, flg = 0x78, flevel << 6
+    # The header is a multiple of 31
+    flg += 31 - (cmf * 256 + flg) % 31
+    return bytes((cmf, flg))
+
+
+def _deflate(data: memoryview, level: int, last: bool, primer: memoryview) -> bytes:
+    """Compress a chunk as a part of a raw deflate stream.
+
+    Each chunk but the last one ends with a sync flush,
+    so the chunks can be concatenated.
+
+    :param data: The chunk to compress
+    :type data: memoryview
+    :param level: The compression level
+    :type level: int
+    :param last: If True, the chunk ends the stream
+    :type last: bool
+    :param primer: The data preceding the chunk (at most 32 KiB), empty for the
+        first chunk: the chunk can refer to it, as if the stream was compressed
+        in one piece
+    :type primer: memoryview
+    :return: The compressed chunk
+    :rtype: bytes
+    """
+    if primer:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=primer
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+class ParallelCompressor:
+    """Compress large bodies on a pool of threads.
+
+    Only the bodies larger than ``threshold`` bytes are compressed in parallel,
+    the overhead isn't worth it for the smaller ones.
+    """
+
+    #: Encodings that can be compressed in parallel
+    ENCODINGS: tuple = ("gzip", "deflate", "zstd")
+
+    def __init__(
+        self,
+        threshold: int = 1024 * 1024,
+        workers: int = None,
+        chunk_size: int = 256 * 1024,
+    ) -> None:
+        """Initialize the ParallelCompressor object.
+
+        :param threshold: The minimum size in bytes of a body compressed in parallel,
+            defaults to 1 MiB
+        :type threshold: int
+        :param workers: The number of threads, defaults to the number of CPU
+        :type workers: int
+        :param chunk_size: The size in bytes of the chunks of gzip and deflate,
+            defaults to 256 KiB
+        :type chunk_size: int
+        """
+        self.threshold = threshold
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="flask-sustainable"
+        )
+
+    def accepts(self, encoding: str, size: int) -> bool:
+        """Check if a body must be compressed in parallel.
+
+        :param encoding: The encoding of the codec
+        :type encoding: str
+        :param size: The size of the body in bytes
+        :type size: int
+        :return: True if the body must be compressed in parallel
+        :rtype: bool
+        """
+        return size >= self.threshold and encoding in self.ENCODINGS
+
+    def _deflate_chunks(self, data: bytes, level: int) -> List[bytes]:
+        """Compress the chunks of the data as a raw deflate stream.
+
+        :param data: The data to compress
+        :type data: bytes
+        :param level: The compression level
+        :type level: int
+        :return: The compressed chunks, to concatenate
+        :rtype: List[bytes]
+        """
+        view = memoryview(data)
+        offsets = range(0, len(data), self.chunk_size)
+        futures = [
+            self._executor.submit(
+                _deflate,
+                view[offset : offset + self.chunk_size],
+                level,
+                offset + self.chunk_size >= len(data),
+                view[max(offset - WINDOW_SIZE, 0) : offset],
+            )
+            for offset in offsets
+        ]
+        return [x.result() for x in futures]
+
+    def compress(self, codec: Codec, data: bytes, level: int = None) -> bytes:
+        """Compress the data in parallel.
+
+        :param codec: The codec, its encoding must be in :attr:`ENCODINGS`
+        :type codec: Codec
+        :param data: The data to compress
+        :type data: bytes
+        :param level: The compression level,
+            if None, the level of the ``balanced`` profile is used
+        :type level: int
+        :raises KeyError: If the encoding can't be compressed in parallel
+        :return: The compressed data
+        :rtype: bytes
+        """
+        level = codec.get_level() if level is None else level
+        if not data:
+            return codec.compress(data, level)
+        logger.debug("Compressing %s bytes with %s threads", len(data), self.workers)
+        if codec.encoding == "zstd":
+            import zstandard  # pylint: disable=import-outside-toplevel
+
+            compressor = zstandard.ZstdCompressor(level=level, threads=self.workers)
+            return compressor.compress(data)
+        if codec.encoding == "gzip":
+            trailer = struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF)
+            chunks = self._deflate_chunks(data, level)
+            return b"".join([gzip_header(level), *chunks, trailer])
+        if codec.encoding == "deflate":
+            trailer = struct.pack(">I", zlib.adler32(data))
+            chunks = self._deflate_chunks(data, level)
+            return b"".join([zlib_header(level), *chunks, trailer])
+        raise KeyError(codec.encoding)
+
+    def shutdown(self) -> None:
+        """Stop the threads of the pool.
+
+        :return: None
+        """
+        self._executor.shutdown(wait=True)
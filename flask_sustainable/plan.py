@@ -0,0 +1,212 @@
+# coding: utf-8
+
+"""
+Plan module
+===========
+
+This module prepares the execution of the indicators and scores.
+
+The registered headers rarely change, while they are dispatched on every request.
+So the work is done once, when a header is registered:
+
+- the headers are ordered: the indicators, then the scores,
+  each header after the headers it requires (see :attr:`BaseHeader.requires`)
+- the headers are indexed by name, a name is unique
+- the headers required by each header are resolved
+- the value of ``Access-Control-Allow-Headers`` is joined
+
+On a request, only the requested headers are looked up in the index,
+with the headers they require: a score gets the values of its indicators,
+which aren't added to the response unless they are requested.
+The selection is cached for each distinct ``Perf`` header.
+"""
+
+import heapq
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import flask
+
+from flask_sustainable.base import BaseHeader, BaseIndicator, requested_headers
+
+
+class ExecutionPlan:
+    """Frozen execution plan of the registered headers.
+
+    A plan is immutable, a new plan is built when a header is registered.
+
+    .. code-block:: python
+
+        plan = ExecutionPlan([PerfEnergy(), PerfScoreCO2()])
+        plan.allow_headers
+        'Perf-Energy, Perf-Score-1'
+    """
+
+    #: Maximum number of distinct selections cached
+    MAX_SELECTIONS: int = 256
+
+    def __init__(self, headers: Iterable[BaseHeader] = ()) -> None:
+        """Build the plan.
+
+        :param headers: The headers, in the order of registration
+        :type headers: Iterable[BaseHeader]
+        :raises ValueError: If two headers have the same name,
+            or if the requirements of the headers have a cycle
+        """
+        #: The headers, in the order of execution
+        self.headers: Tuple[BaseHeader, ...] = self.sort(headers)
+        #: Lowercased name -> position of the header in :attr:`headers`
+        self.index: Dict[str, int] = {
+            header.name.lower(): position
+            for position, header in enumerate(self.headers)
+        }
+        if len(self.index) < len(self.headers):
+            names = [x.name.lower() for x in self.headers]
+            duplicates = sorted({x for x in names if names.count(x) > 1})
+            raise ValueError(f"Duplicate headers: {', '.join(duplicates)}")
+        #: Positions of each header and of the headers it requires, recursively
+        self.requirements: Tuple[FrozenSet[int], ...] = ()
+        for position, header in enumerate(self.headers):
+            required = {position}
+            for name in header.requires:
+                # A required header comes before, it's already resolved
+                if self.index.get(name.lower(), position) < position:
+                    required |= self.requirements[self.index[name.lower()]]
+            self.requirements += (frozenset(required),)
+        self.before: Tuple[Optional[Callable[[], None]], ...] = tuple(
+            header.before_request if isinstance(header, BaseIndicator) else None
+            for header in self.headers
+        )
+        self.after: Tuple[Callable[[flask.Response], flask.Response], ...] = tuple(
+            header.after_request for header in self.headers
+        )
+        #: Lowercased names of all the headers
+        self.names: FrozenSet[str] = frozenset(self.index)
+        #: Value of the ``Access-Control-Allow-Headers`` header
+        self.allow_headers: str = ", ".join(x.name for x in self.headers)
+        # Requested names -> positions of the selection, names of the headers
+        # required but not requested
+        self._selections: Dict[
+            FrozenSet[str], Tuple[Tuple[int, ...], Tuple[str, ...]]
+        ] = {}
+
+    @staticmethod
+    def sort(headers: Iterable[BaseHeader]) -> Tuple[BaseHeader, ...]:
+        """Sort the headers in the order of execution (Kahn's algorithm).
+
+        The indicators come before the scores, a header comes after the headers
+        it requires. Otherwise, the order of registration is kept.
+        A requirement that isn't registered is ignored.
+
+        :param headers: The headers, in the order of registration
+        :type headers: Iterable[BaseHeader]
+        :raises ValueError: If the requirements of the headers have a cycle
+        :return: The sorted headers
+        :rtype: Tuple[BaseHeader, ...]
+        """
+        headers = list(headers)
+        # The rank keeps the order of registration, indicators first
+        ranks = sorted(
+            range(len(headers)),
+            key=lambda x: (not isinstance(headers[x], BaseIndicator), x),
+        )
+        positions = {headers[x].name.lower(): x for x in ranks}
+        dependents: List[List[int]] = [[] for _ in headers]
+        degrees = [0] * len(headers)
+        for position, header in enumerate(headers):
+            for name in header.requires:
+                required = positions.get(name.lower())
+                if required is not None and required != position:
+                    dependents[required].append(position)
+                    degrees[position] += 1
+        order = {position: rank for rank, position in enumerate(ranks)}
+        ready = [(order[x], x) for x, degree in enumerate(degrees) if not degree]
+        heapq.heapify(ready)
+        result = []
+        while ready:
+            _, position = heapq.heappop(ready)
+            result.append(headers[position])
+            for dependent in dependents[position]:
+                degrees[dependent] -= 1
+                if not degrees[dependent]:
+                    heapq.heappush(ready, (order[dependent], dependent))
+        if len(result) < len(headers):
+            cycle = [x.name for x, degree in zip(headers, degrees) if degree]
+            raise ValueError(f"Cyclic requirements between {', '.join(cycle)}")
+        return tuple(result)
+
+    def _select(
+        self, requested: FrozenSet[str]
+    ) -> Tuple[Tuple[int, ...], Tuple[str, ...]]:
+        """Select the requested headers and the headers they require.
+
+        :param requested: The lowercased names of the requested headers
+        :type requested: FrozenSet[str]
+        :return: The positions of the registered headers, in the order of execution,
+            and the names of the headers required but not requested
+        :rtype: Tuple[Tuple[int, ...], Tuple[str, ...]]
+        """
+        try:
+            return self._selections[requested]
+        except KeyError:
+            positions = set()
+            for name in requested:
+                if name in self.index:
+                    positions |= self.requirements[self.index[name]]
+            selection = tuple(sorted(positions))
+            pulled = tuple(
+                self.headers[x].name
+                for x in selection
+                if self.headers[x].name.lower() not in requested
+            )
+            if len(self._selections) >= self.MAX_SELECTIONS:
+                self._selections.clear()
+            self._selections[requested] = selection, pulled
+            return selection, pulled
+
+    def select(self, requested: FrozenSet[str]) -> Tuple[int, ...]:
+        """Select the positions of the requested headers,
+        and of the headers they require.
+
+        :param requested: The lowercased names of the requested headers
+        :type requested: FrozenSet[str]
+        :return: The positions of the registered headers, in the order of execution
+        :rtype: Tuple[int, ...]
+        """
+        return self._select(requested)[0]
+
+    def before_request(self, requested: FrozenSet[str] = None) -> None:
+        """Call the requested indicators before the request.
+
+        :param requested: The lowercased names of the headers to call,
+            defaults to :func:`base.requested_headers`
+        :type requested: FrozenSet[str]
+        :return: None
+        """
+        if requested is None:
+            requested = requested_headers()
+        for position in self.select(requested):
+            before = self.before[position]
+            if before is not None:
+                before()
+
+    def after_request(
+        self, response: flask.Response, requested: FrozenSet[str] = None
+    ) -> flask.Response:
+        """Call the requested headers after the request.
+
+        :param response: The response
+        :type response: flask.Response
+        :param requested: The lowercased names of the headers to call,
+            defaults to :func:`base.requested_headers`
+        :type requested: FrozenSet[str]
+        :return: The response
+        :rtype: flask.Response
+        """
+        if requested is None:
+            requested = requested_headers()
+        selection, pulled = self._select(requested)
+        for position in selection:
+            self.after[position](response=response)
+        for name in pulled:
+            response.headers.pop(name, None)
+        return response
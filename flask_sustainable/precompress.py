@@ -0,0 +1,180 @@
+# coding: utf-8
+
+"""
+Precompress module
+==================
+
+This module serves precompressed static files.
+
+Static files are immutable, compressing them on each request is a waste.
+The ``flask sustainable precompress`` command (see :mod:`flask_sustainable.cli`)
+writes a compressed sibling of each static file
+(``app.js.br``, ``app.js.zst``, ``app.js.gz``).
+
+Then, when a static file is served, :func:`serve_precompressed` replaces
+the response with the best sibling accepted by the client,
+without compressing anything. It's done after the request,
+so the ``before_request`` hooks of the application (e.g. authentication) apply.
+A sibling older than its file is ignored.
+
+.. code-block:: bash
+
+    $ flask sustainable precompress --profile max
+    12 files written
+"""
+
+import logging
+import mimetypes
+import os
+from typing import Dict, Iterable, Optional
+
+import flask
+from werkzeug.security import safe_join
+
+from flask_sustainable.codec import CodecRegistry
+from flask_sustainable.compress import Compression, CompressionPolicy
+
+logger = logging.getLogger(__name__)
+
+#: File extension of the sibling of each encoding
+EXTENSIONS: Dict[str, str] = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+
+
+def precompress_folder(
+    folder: str,
+    registry: CodecRegistry = None,
+    encodings: Iterable[str] = tuple(EXTENSIONS),
+    profile: str = "max",
+    policy: CompressionPolicy = None,
+    force: bool = False,
+) -> int:
+    """Write the compressed siblings of the files of a folder.
+
+    A sibling is written only if the file is compressible according to the policy
+    and if the compressed file is smaller than the original one.
+    Siblings more recent than their file are kept, unless ``force`` is True.
+
+    :param folder: The folder to precompress, recursively
+    :type folder: str
+    :param registry: The codecs to use, defaults to :attr:`Compression.CODECS`
+    :type registry: CodecRegistry
+    :param encodings: The encodings to write, must be in :data:`EXTENSIONS`
+    :type encodings: Iterable[str]
+    :param profile: The level profile of the codecs, defaults to ``max``
+    :type profile: str
+    :param policy: The policy deciding which files are compressed,
+        defaults to ``CompressionPolicy()``
+    :type policy: CompressionPolicy
+    :param force: If True, existing siblings are rewritten
+    :type force: bool
+    :return: The number of written files
+    :rtype: int
+    """
+    registry = registry or Compression.CODECS
+    policy = policy or CompressionPolicy()
+    codecs = [registry[x] for x in encodings if x in registry]
+    siblings = tuple(EXTENSIONS.values())
+    written = 0
+    for root, _, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            mimetype = mimetypes.guess_type(filename)[0]
+            if (
+                filename.endswith(siblings)
+                or not mimetype
+                or not policy.match_mimetype(mimetype)
+                or os.path.getsize(path) < policy.min_size
+            ):
+                continue
+            with open(path, "rb") as file:
+                data = file.read()
+            mtime = os.path.getmtime(path)
+            for codec in codecs:
+                sibling = path + EXTENSIONS[codec.encoding]
+                if (
+                    not force
+                    and os.path.exists(sibling)
+                    and os.path.getmtime(sibling) >= mtime
+                ):
+                    continue
+                compressed = codec.compress(data, codec.get_level(profile))
+                if len(compressed) >= len(data):
+                    continue
+                with open(sibling, "wb") as file:
+                    file.write(compressed)
+                logger.debug("%s written", sibling)
+                written += 1
+    return written
+
+
+def _static_folder() -> str:
+    """Get the static folder of the current request.
+
+    :return: The static folder, None if the request isn't for a static file
+    :rtype: str
+    """
+    endpoint = flask.request.endpoint or ""
+    if endpoint == "static":
+        return flask.current_app.static_folder
+    if flask.request.blueprint and endpoint == f"{flask.request.blueprint}.static":
+        blueprint = flask.current_app.blueprints.get(flask.request.blueprint)
+        return blueprint and blueprint.static_folder
+    return None
+
+
+def serve_precompressed(
+    response: flask.Response, registry: CodecRegistry = None
+) -> Optional[flask.Response]:
+    """Replace the response of a static file with its precompressed sibling.
+
+    This function is called after each request by :class:`Sustainable`.
+    Only a successful response of the static view is replaced.
+    The best sibling is chosen with the Accept-Encoding header of the request,
+    in the order of the registry. The siblings older than the file are ignored:
+    the response is then compressed on the fly.
+
+    :param response: The response of the view
+    :type response: flask.Response
+    :param registry: The codecs that can be used,
+        defaults to :attr:`Compression.CODECS`
+    :type registry: CodecRegistry
+    :return: The response with the sibling, None if there is no fresh sibling
+    :rtype: Optional[flask.Response]
+    """
+    if response.status_code != 200 or flask.request.method not in ("GET", "HEAD"):
+        return None
+    folder = _static_folder()
+    if not folder:
+        return None
+    filename = (flask.request.view_args or {}).get("filename")
+    path = safe_join(folder, filename) if filename else None
+    if not path or not os.path.isfile(path):
+        return None
+    mtime = os.path.getmtime(path)
+    registry = registry or Compression.CODECS
+    available = [
+        x
+        for x in registry.encodings
+        if x in EXTENSIONS
+        and os.path.isfile(path + EXTENSIONS[x])
+        and os.path.getmtime(path + EXTENSIONS[x]) >= mtime
+    ]
+    encoding = registry.negotiate(
+        flask.request.headers.get("Accept-Encoding", ""), available
+    )
+    if not encoding:
+        return None
+    logger.debug("Serving precompressed %s (%s)", filename, encoding)
+    sibling = flask.send_from_directory(
+        folder,
+        filename + EXTENSIONS[encoding],
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+    )
+    # Keep the headers added by the application (e.g. Content-Security-Policy)
+    for key, value in response.headers.items():
+        if key not in sibling.headers:
+            sibling.headers.add(key, value)
+    response.close()
+    sibling.content_encoding = encoding
+    sibling.vary.add("Accept-Encoding")
+    return sibling
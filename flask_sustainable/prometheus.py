@@ -0,0 +1,165 @@
+# coding: utf-8
+
+"""
+Prometheus module
+=================
+
+This module exposes the indicators and the compression to Prometheus.
+
+The metrics are:
+
+- ``sustainable_request_time_milliseconds``, ``sustainable_request_cpu_milliseconds``,
+  ``sustainable_request_ram_megabytes``, ``sustainable_request_energy_joules``:
+  histograms of ``Perf-Time``, ``Perf-CPU``, ``Perf-RAM`` and ``Perf-Energy``
+  by endpoint, for the requests measured (see :attr:`Sustainable.metrics`)
+- ``sustainable_compression_input_bytes_total``,
+  ``sustainable_compression_output_bytes_total``: bytes by encoding
+- ``sustainable_compression_seconds``: histogram of the compression time
+  by encoding
+- ``sustainable_compression_skipped_total``: responses not compressed, by reason
+
+The values are only incremented on the requests,
+the text format is rendered when Prometheus scrapes the endpoint.
+
+It requires ``prometheus_client`` (``pip install flask-sustainable[prometheus]``).
+
+.. code-block:: python
+
+    sustainable = Sustainable(app, prometheus=PrometheusMetrics())
+
+With several processes (e.g. the workers of gunicorn),
+set the ``PROMETHEUS_MULTIPROC_DIR`` environment variable to an empty directory:
+the values are written in memory-mapped files, aggregated when scraped.
+"""
+
+import os
+from typing import Dict, Tuple
+
+import flask
+
+from flask_sustainable.compress import CompressionObserver
+
+#: Histograms of the indicators: header -> (name, documentation, buckets)
+INDICATORS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "Perf-Time": (
+        "sustainable_request_time_milliseconds",
+        "Duration of the requests (Perf-Time)",
+        (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+    ),
+    "Perf-CPU": (
+        "sustainable_request_cpu_milliseconds",
+        "CPU time of the requests (Perf-CPU)",
+        (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+    ),
+    "Perf-RAM": (
+        "sustainable_request_ram_megabytes",
+        "Memory allocated by the requests (Perf-RAM)",
+        (0.01, 0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000),
+    ),
+    "Perf-Energy": (
+        "sustainable_request_energy_joules",
+        "Energy consumed by the requests (Perf-Energy)",
+        (0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 50, 100),
+    ),
+}
+
+
+class PrometheusMetrics(CompressionObserver):
+    """Prometheus metrics of the indicators and the compression.
+
+    The object observes the compression (see :class:`compress.CompressionObserver`)
+    and the values recorded by :class:`metrics.MetricsAggregator`.
+    """
+
+    def __init__(self, registry=None) -> None:
+        """Initialize the metrics.
+
+        :param registry: The registry of the metrics,
+            defaults to a new ``prometheus_client.CollectorRegistry``
+        :type registry: prometheus_client.CollectorRegistry
+        :raises ImportError: If prometheus_client is not installed
+        """
+        # pylint: disable=import-outside-toplevel
+        import prometheus_client
+
+        self._prometheus_client = prometheus_client
+        self.registry = registry or prometheus_client.CollectorRegistry()
+        self._indicators = {
+            header: prometheus_client.Histogram(
+                name,
+                documentation,
+                ["endpoint"],
+                buckets=buckets,
+                registry=self.registry,
+            )
+            for header, (name, documentation, buckets) in INDICATORS.items()
+        }
+        self._bytes_in = prometheus_client.Counter(
+            "sustainable_compression_input_bytes",
+            "Uncompressed bytes of the compressed responses",
+            ["encoding"],
+            registry=self.registry,
+        )
+        self._bytes_out = prometheus_client.Counter(
+            "sustainable_compression_output_bytes",
+            "Compressed bytes of the compressed responses",
+            ["encoding"],
+            registry=self.registry,
+        )
+        self._seconds = prometheus_client.Histogram(
+            "sustainable_compression_seconds",
+            "Duration of the compression of the responses",
+            ["encoding"],
+            buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1),
+            registry=self.registry,
+        )
+        self._skipped = prometheus_client.Counter(
+            "sustainable_compression_skipped",
+            "Responses not compressed",
+            ["reason"],
+            registry=self.registry,
+        )
+
+    def record(self, endpoint: str, values: Dict[str, float]) -> None:
+        """Observe the values of a request, see :meth:`MetricsAggregator.add_listener`.
+
+        :param endpoint: The endpoint of the request
+        :type endpoint: str
+        :param values: The value of each header
+        :type values: Dict[str, float]
+        :return: None
+        """
+        for name, value in values.items():
+            histogram = self._indicators.get(name)
+            if histogram is not None:
+                histogram.labels(endpoint).observe(value)
+
+    def compressed(
+        self, encoding: str, size_in: int, size_out: int, seconds: float
+    ) -> None:
+        self._bytes_in.labels(encoding).inc(size_in)
+        self._bytes_out.labels(encoding).inc(size_out)
+        self._seconds.labels(encoding).observe(seconds)
+
+    def skipped(self, reason: str) -> None:
+        self._skipped.labels(reason).inc()
+
+    def make_response(self) -> flask.Response:
+        """Render the metrics in the Prometheus text format.
+
+        In multiprocess mode, the metrics of all the processes are aggregated.
+
+        :return: The response with the metrics
+        :rtype: flask.Response
+        """
+        client = self._prometheus_client
+        registry = self.registry
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            # pylint: disable=import-outside-toplevel
+            from prometheus_client import multiprocess
+
+            registry = client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return flask.Response(
+            client.generate_latest(registry), mimetype=client.CONTENT_TYPE_LATEST
+        )
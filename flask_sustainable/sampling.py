@@ -0,0 +1,240 @@
+# coding: utf-8
+
+"""
+Sampling module
+===============
+
+This module measures a fraction of the requests, whatever the client asks.
+
+The indicators run only when the client sends the ``Perf`` header.
+With a sampler, the server also measures a sample of the requests
+and feeds the values to a :class:`metrics.MetricsAggregator`.
+The headers of a sampled request that the client didn't ask for
+are removed from the response.
+
+Two samplers are available:
+
+- :class:`RateSampler`: a fixed rate, optionally by endpoint
+- :class:`ReservoirSampler`: a uniform sample of a fixed number of requests
+  per time window, whatever the traffic
+
+An unsampled request only costs a random draw.
+
+.. code-block:: python
+
+    sampler = RateSampler(rate=0.01, rates={"checkout": 0.1})
+    sustainable = Sustainable(app, sampling=sampler)
+    sustainable.metrics.snapshot()
+"""
+
+import itertools
+import random
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask_sustainable.metrics import MetricsAggregator
+
+#: A sampled request: (endpoint, values of the headers)
+Sample = Tuple[str, Dict[str, float]]
+
+
+class BaseSampler(metaclass=ABCMeta):
+    """Base class for all samplers of requests."""
+
+    @abstractmethod
+    def sample(self, endpoint: str) -> Optional[Any]:
+        """Decide if a request is measured.
+
+        This method is called before each request, it must be cheap.
+
+        :param endpoint: The endpoint of the request, None if it's unknown
+        :type endpoint: str
+        :return: A token given to :meth:`record` if the request is measured,
+            None otherwise
+        :rtype: Optional[Any]
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def record(
+        self,
+        token: Any,
+        endpoint: str,
+        values: Dict[str, float],
+        aggregator: MetricsAggregator,
+    ) -> None:
+        """Record the values of a measured request.
+
+        :param token: The token returned by :meth:`sample`
+        :type token: Any
+        :param endpoint: The endpoint of the request
+        :type endpoint: str
+        :param values: The value of each header
+        :type values: Dict[str, float]
+        :param aggregator: The aggregator of the values
+        :type aggregator: MetricsAggregator
+        :return: None
+        """
+        raise NotImplementedError
+
+
+class RateSampler(BaseSampler):
+    """Measure a fixed fraction of the requests.
+
+    The rate can be overridden for some endpoints.
+    """
+
+    def __init__(self, rate: float = 0.01, rates: Dict[str, float] = None) -> None:
+        """Initialize the sampler.
+
+        :param rate: The probability to measure a request, defaults to 1%
+        :type rate: float
+        :param rates: The probability of some endpoints, by name of endpoint
+        :type rates: Dict[str, float]
+        """
+        self.rate = rate
+        self.rates = rates or {}
+
+    def sample(self, endpoint: str) -> Optional[int]:
+        return 0 if random.random() < self.rates.get(endpoint, self.rate) else None
+
+    def record(
+        self,
+        token: int,
+        endpoint: str,
+        values: Dict[str, float],
+        aggregator: MetricsAggregator,
+    ) -> None:
+        aggregator.record(endpoint, values)
+
+
+class ReservoirSampler(BaseSampler):
+    """Record a uniform sample of ``size`` requests per window of time.
+
+    The reservoir is filled with the algorithm R: the first ``size`` requests
+    of the window are measured, then the n-th request is measured
+    with a probability of ``size / n`` and replaces a previous sample.
+    For ``n`` requests in a window, about ``size * (1 + ln(n / size))`` requests
+    are measured (e.g. 560 for 100 samples among 10,000 requests):
+    the cost grows with the logarithm of the traffic.
+    The samples are recorded when the window is over: by the next request,
+    or by a timer started with the first sample of the window
+    when no request follows.
+    The measures that end after their window are dropped.
+    """
+
+    def __init__(self, size: int = 100, window: float = 60.0) -> None:
+        """Initialize the sampler.
+
+        :param size: The number of requests measured per window, defaults to 100
+        :type size: int
+        :param window: The duration of a window in seconds, defaults to 60
+        :type window: float
+        """
+        self.size = size
+        self.window = window
+        self._reservoir: List[Optional[Sample]] = [None] * size
+        self._aggregator: MetricsAggregator = None
+        # Number of the window and counter of its requests, replaced together
+        self._window: Tuple[int, itertools.count] = (0, itertools.count(1))
+        self._end = time.monotonic() + window
+        self._timer: threading.Timer = None
+        self._lock = threading.Lock()
+
+    def sample(self, endpoint: str) -> Optional[Tuple[int, int]]:
+        """Decide if a request is measured.
+
+        :param endpoint: The endpoint of the request, None if it's unknown
+        :type endpoint: str
+        :return: The number of the window and the slot of the sample
+            if the request is measured, None otherwise
+        :rtype: Optional[Tuple[int, int]]
+        """
+        if time.monotonic() >= self._end:
+            self.flush(expired=True)
+        window, counter = self._window
+        count = next(counter)
+        if count <= self.size:
+            return window, count - 1
+        slot = random.randrange(count)
+        return (window, slot) if slot < self.size else None
+
+    def record(
+        self,
+        token: Tuple[int, int],
+        endpoint: str,
+        values: Dict[str, float],
+        aggregator: MetricsAggregator,
+    ) -> None:
+        window, slot = token
+        with self._lock:
+            # The sample belongs to a window already recorded
+            if window != self._window[0]:
+                return
+            self._aggregator = aggregator
+            self._reservoir[slot] = (endpoint, values)
+            if self._timer is None:
+                delay = max(self._end - time.monotonic(), 0.0)
+                self._timer = threading.Timer(delay, self._expire, (window,))
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _expire(self, window: int) -> None:
+        """Record the samples of a window at its end, unless it's already done.
+
+        :param window: The number of the window
+        :type window: int
+        :return: None
+        """
+        with self._lock:
+            if window != self._window[0]:
+                return
+            samples, aggregator = self._swap()
+        self._record(samples, aggregator)
+
+    def _swap(self) -> Tuple[List[Optional[Sample]], MetricsAggregator]:
+        """Start a new window, the lock must be held.
+
+        :return: The samples of the window and the aggregator
+        :rtype: Tuple[List[Optional[Sample]], MetricsAggregator]
+        """
+        samples, aggregator = self._reservoir, self._aggregator
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._reservoir = [None] * self.size
+        self._window = (self._window[0] + 1, itertools.count(1))
+        self._end = time.monotonic() + self.window
+        return samples, aggregator
+
+    @staticmethod
+    def _record(samples: List[Optional[Sample]], aggregator: MetricsAggregator) -> None:
+        """Record the samples of a window.
+
+        :param samples: The samples, None for an empty slot
+        :type samples: List[Optional[Sample]]
+        :param aggregator: The aggregator, None if nothing was recorded
+        :type aggregator: MetricsAggregator
+        :return: None
+        """
+        if aggregator is None:
+            return
+        for sample in samples:
+            if sample is not None:
+                aggregator.record(*sample)
+
+    def flush(self, expired: bool = False) -> None:
+        """Record the samples of the window and start a new window.
+
+        :param expired: If True, nothing is done unless the window is over
+            (another thread may have started a new window), defaults to False
+        :type expired: bool
+        :return: None
+        """
+        with self._lock:
+            if expired and time.monotonic() < self._end:
+                return
+            samples, aggregator = self._swap()
+        self._record(samples, aggregator)
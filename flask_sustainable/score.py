@@ -18,26 +18,41 @@ class PerfScoreCO2(BaseScore):
     When the request is done, the response will contain a header named "Perf-Score-1"
     with an equivalent of CO2 emissions of the request in kilograms.
 
-    The CO2 emissions are the emissions of the process
-    that is different from the execution time.
+    The CO2 emissions are computed from the energy measured by
+    :class:`indicator.PerfEnergy` or :class:`indicator.PerfPower`,
+    one of them must be registered (it runs even if it is not requested).
 
     Example ::
 
         from flask_sustainable import Sustainable
+        from flask_sustainable.indicator import PerfEnergy
         from flask_sustainable.score import PerfScoreCO2
 
         app = flask.Flask(__name__)
         sustainable = Sustainable(app)
-        sustainable.add_score(PerfScoreCO2())
+        sustainable.add_indicator(PerfEnergy())
+        sustainable.add_score(PerfScoreCO2(carbon_intensity=0.4))
     """
 
     name = "Perf-Score-1"
+    requires = ("Perf-Energy", "Perf-Power")
+
+    def __init__(self, carbon_intensity: float = 0.056) -> None:
+        """Initialize the score.
+
+        :param carbon_intensity: The emissions of the electricity
+            in kilograms of CO2 per kWh, defaults to an average of France
+        :type carbon_intensity: float
+        """
+        self.carbon_intensity = carbon_intensity
 
     def after_request(self, response: flask.Response) -> flask.Response:
-        try:
-            final_emissions = flask.g.tracker.final_emissions
-            if final_emissions:
-                response.headers.update({self.name: f"{final_emissions:.16f}"})
-        except AttributeError:
-            logging.warning("No tracker found in flask.g")
+        perf_energy = flask.g.get("perf_energy")
+        if perf_energy is None:
+            logging.warning(
+                "No energy found in flask.g, PerfEnergy or PerfPower is required"
+            )
+            return response
+        final_emissions = perf_energy / 3.6e6 * self.carbon_intensity
+        response.headers.update({self.name: f"{final_emissions:.16f}"})
         return response
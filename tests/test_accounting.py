@@ -0,0 +1,169 @@
+"""Class test for accounting.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import asyncio
+import importlib.util
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+from flask import Flask
+
+from flask_sustainable import Sustainable
+from flask_sustainable.accounting import _TASK_CPU, measure
+from flask_sustainable.indicator import PerfCPU
+
+
+def burn(seconds: float) -> None:
+    """Use the CPU of the thread during the given time."""
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+async def work(seconds: float, steps: int = 5) -> str:
+    for _ in range(steps):
+        burn(seconds / steps)
+        await asyncio.sleep(0)
+    return "done"
+
+
+#: Print the Perf-CPU of the first request of an async view burning 10 ms
+FIRST_REQUEST = """
+import time
+from flask import Flask
+from flask_sustainable import Sustainable
+from flask_sustainable.indicator import PerfCPU
+
+app = Flask(__name__)
+Sustainable(app).add_indicator(PerfCPU())
+
+@app.route("/")
+async def index():
+    end = time.thread_time() + 0.01
+    while time.thread_time() < end:
+        pass
+    return "done"
+
+response = app.test_client().get("/", headers={"Perf": "Perf-CPU"})
+print(response.headers["Perf-CPU"])
+"""
+
+
+class MeasureTestCase(unittest.TestCase):
+    def test_concurrent_tasks(self):
+        durations = [0.01 * (x % 4 + 1) for x in range(20)]
+
+        async def task(seconds: float):
+            cell = [0.0]
+            _TASK_CPU.set(cell)
+            result = await measure(work)(seconds)
+            return result, cell[0]
+
+        async def main():
+            return await asyncio.gather(*(task(x) for x in durations))
+
+        results = asyncio.run(main())
+        for seconds, (result, measured) in zip(durations, results):
+            self.assertEqual(result, "done")
+            # The other tasks, run between the steps, are not counted
+            self.assertAlmostEqual(measured, seconds, delta=seconds * 0.5 + 0.005)
+
+    def test_exception(self):
+        async def fail():
+            await asyncio.sleep(0)
+            raise KeyError("fail")
+
+        async def main():
+            _TASK_CPU.set([0.0])
+            await measure(fail)()
+
+        with self.assertRaises(KeyError):
+            asyncio.run(main())
+
+    def test_without_request(self):
+        self.assertEqual(asyncio.run(measure(work)(0.001)), "done")
+
+
+class PerfCPUThreadsTestCase(unittest.TestCase):
+    def test_concurrent_requests(self):
+        app = Flask(__name__)
+        sustainable = Sustainable(app)
+        sustainable.add_indicator(PerfCPU())
+
+        @app.route("/heavy")
+        def heavy():
+            burn(0.2)
+            return "heavy"
+
+        @app.route("/light")
+        def light():
+            burn(0.01)
+            return "light"
+
+        results = {}
+
+        def request(path: str, index: int):
+            with app.test_client() as client:
+                response = client.get(path, headers={"Perf": "Perf-CPU"})
+                results[(path, index)] = float(response.headers["Perf-CPU"])
+
+        threads = [
+            threading.Thread(target=request, args=(path, index))
+            for index in range(4)
+            for path in ("/heavy", "/light")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for (path, _), perf_cpu in results.items():
+            expected = 200 if path == "/heavy" else 10
+            self.assertAlmostEqual(perf_cpu, expected, delta=expected * 0.5 + 5)
+
+
+@unittest.skipIf(
+    importlib.util.find_spec("asgiref") is None, "async views require asgiref"
+)
+class PerfCPUAsyncTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        sustainable = Sustainable(self.app)
+        sustainable.add_indicator(PerfCPU())
+
+        @self.app.route("/<int:milliseconds>")
+        async def index(milliseconds: int):
+            return await work(milliseconds / 1000)
+
+    def test_first_request(self):
+        # In a new interpreter, the first async request imports asgiref
+        # and asyncio, and starts an event loop
+        process = subprocess.run(
+            [sys.executable, "-c", FIRST_REQUEST],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        self.assertAlmostEqual(float(process.stdout), 10, delta=3)
+
+    def test_async_view(self):
+        results = {}
+
+        def request(milliseconds: int):
+            with self.app.test_client() as client:
+                response = client.get(f"/{milliseconds}", headers={"Perf": "Perf-CPU"})
+                results[milliseconds] = float(response.headers["Perf-CPU"])
+
+        threads = [
+            threading.Thread(target=request, args=(x,)) for x in (10, 20, 50, 100)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for milliseconds, perf_cpu in results.items():
+            self.assertAlmostEqual(perf_cpu, milliseconds, delta=milliseconds * 0.2 + 3)
@@ -0,0 +1,89 @@
+"""Class test for adaptive.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import gzip
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from flask_sustainable.adaptive import AdaptiveProfile
+from flask_sustainable.cache import LRUCompressionCache
+from flask_sustainable.extension import Sustainable
+
+
+class AdaptiveProfileTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        # The load is never measured during the tests
+        self.adaptive = AdaptiveProfile(window=3600)
+
+    def test_idle(self):
+        self.adaptive.load = 0.1
+        self.assertEqual(self.adaptive.choose("gzip", 1000), "max")
+        self.assertEqual(self.adaptive.choose("gzip", 200 * 1024), "balanced")
+        self.assertEqual(self.adaptive.choose("gzip", 2 * 1024 * 1024), "balanced")
+        self.assertEqual(self.adaptive.choose("gzip"), "balanced")
+
+    def test_busy(self):
+        self.adaptive.load = 0.5
+        self.assertEqual(self.adaptive.choose("gzip", 1000), "balanced")
+        self.assertEqual(self.adaptive.choose("gzip", 2 * 1024 * 1024), "fast")
+        self.adaptive.load = 0.9
+        self.assertEqual(self.adaptive.choose("gzip", 1000), "fast")
+        self.assertEqual(
+            self.adaptive.stats()["decisions"], {"fast": 2, "balanced": 1, "max": 0}
+        )
+
+    def test_latency_budget(self):
+        self.adaptive.load = 0.1
+        # 1 byte/ms with max, 10 KB/ms with balanced
+        self.adaptive.record("br", "max", 1000, 1)
+        self.adaptive.record("br", "balanced", 10000, 0.001)
+        self.assertEqual(self.adaptive.choose("br", 1000), "balanced")
+        self.assertEqual(self.adaptive.choose("gzip", 1000), "max")
+        self.assertIn("br:max", self.adaptive.stats()["throughput"])
+
+    def test_load(self):
+        adaptive = AdaptiveProfile(window=0.05)
+        end = time.monotonic() + 0.1
+        while time.monotonic() < end:
+            pass
+        adaptive.choose("gzip", 1000)
+        self.assertGreater(adaptive.load, 0)
+
+
+class SustainableAdaptiveTestCase(unittest.TestCase):
+    def test_adaptive(self):
+        app = Flask(__name__)
+        adaptive = AdaptiveProfile()
+        Sustainable(app, compress_adaptive=adaptive)
+        app.add_url_rule("/", view_func=lambda: "Welcome! " * 1000)
+        with app.test_client() as client:
+            response = client.get("/", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(gzip.decompress(response.data), b"Welcome! " * 1000)
+        stats = adaptive.stats()
+        self.assertEqual(sum(stats["decisions"].values()), 1)
+        self.assertEqual(len(stats["throughput"]), 1)
+
+    def test_cache(self):
+        app = Flask(__name__)
+        adaptive = AdaptiveProfile()
+        Sustainable(
+            app, compress_adaptive=adaptive, compress_cache=LRUCompressionCache()
+        )
+        app.add_url_rule("/", view_func=lambda: "Welcome! " * 1000)
+        with mock.patch.object(adaptive, "record", wraps=adaptive.record) as record:
+            with app.test_client() as client:
+                for _ in range(3):
+                    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+                    self.assertEqual(
+                        gzip.decompress(response.data), b"Welcome! " * 1000
+                    )
+        # Only the miss of the cache is compressed
+        record.assert_called_once()
+        encoding, _, size, _ = record.call_args[0]
+        self.assertEqual((encoding, size), ("gzip", 9000))
+        self.assertEqual(len(adaptive.stats()["throughput"]), 1)
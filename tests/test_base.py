@@ -7,7 +7,8 @@ import unittest
 
 from flask import Flask
 
-from flask_sustainable.base import BaseHeader
+from flask_sustainable import Sustainable
+from flask_sustainable.base import BaseHeader, BaseScore, requested_headers
 
 
 class RaiseBaseTestCase(unittest.TestCase):
@@ -67,3 +68,44 @@ class NormalHeaderTestCase(unittest.TestCase):
             response = client.get("/")
             self.assertIn("Perf-Example", response.headers)
             self.assertEqual(response.headers["Perf-Example"], "1.0")
+
+
+class RequestedHeadersTestCase(unittest.TestCase):
+    class Score(BaseScore):
+        name: str = "Perf-Score-1"
+
+        def after_request(self, response):
+            response.headers[self.name] = "1"
+
+    class OtherScore(Score):
+        name: str = "Perf-Score-10"
+
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        sustainable = Sustainable(self.app)
+        sustainable.add_scores(self.Score(), self.OtherScore())
+
+        @self.app.route("/")
+        def _():
+            return "Welcome!"
+
+    def test_parse(self):
+        with self.app.test_request_context(
+            headers={"Perf": " Perf-Time,perf-CPU  Perf-RAM,, "}
+        ):
+            self.assertEqual(requested_headers(), {"perf-time", "perf-cpu", "perf-ram"})
+            # The header is parsed once
+            self.assertIs(requested_headers(), requested_headers())
+        with self.app.test_request_context():
+            self.assertEqual(requested_headers(), frozenset())
+
+    def test_exact_match(self):
+        with self.app.test_client() as client:
+            response = client.get("/", headers={"Perf": "Perf-Score-10"})
+            self.assertIn("Perf-Score-10", response.headers)
+            self.assertNotIn("Perf-Score-1", response.headers)
+            response = client.get("/", headers={"Perf": "Perf-Score-1"})
+            self.assertIn("Perf-Score-1", response.headers)
+            self.assertNotIn("Perf-Score-10", response.headers)
+            response = client.get("/", headers={"Perf": "Perf-Score-1X"})
+            self.assertNotIn("Perf-Score-1", response.headers)
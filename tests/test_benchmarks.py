@@ -0,0 +1,102 @@
+"""Class test for the benchmarks runner."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks import scenarios
+from benchmarks.__main__ import compare, main, percentile
+from benchmarks.scenarios import CONTENT_TYPES, all_scenarios, make_payload
+
+
+class BenchmarksTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "benchmark.json")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def run_main(self, *args: str) -> int:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return main(
+                [
+                    "--quick",
+                    "--min-time=0",
+                    "--min-iterations=3",
+                    "-k",
+                    "indicator/Perf-Time",
+                    "-k",
+                    "codec/gzip/json/10000",
+                    *args,
+                ]
+            )
+
+    def test_run(self):
+        self.assertEqual(self.run_main("--output", self.output), 0)
+        with open(self.output, encoding="utf-8") as file:
+            results = json.load(file)
+        self.assertEqual(
+            set(results["scenarios"]), {"indicator/Perf-Time", "codec/gzip/json/10000"}
+        )
+        result = results["scenarios"]["codec/gzip/json/10000"]
+        self.assertEqual(result["group"], "codec")
+        self.assertEqual(result["iterations"], 3)
+        self.assertEqual(result["size_in"], 10000)
+        self.assertLess(result["size_out"], result["size_in"])
+        self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        self.assertGreater(result["peak_memory_bytes"], 0)
+
+    def test_baseline(self):
+        self.run_main("--output", self.output)
+        with open(self.output, encoding="utf-8") as file:
+            baseline = json.load(file)
+        for result in baseline["scenarios"].values():
+            result["p50_ms"] /= 100
+        with open(self.output, "w", encoding="utf-8") as file:
+            json.dump(baseline, file)
+        self.assertEqual(self.run_main("--baseline", self.output), 1)
+
+    def test_lazy(self):
+        # The applications are built when their scenarios run
+        with mock.patch.object(scenarios, "make_app", wraps=scenarios.make_app) as make:
+            names = [x.name for x in all_scenarios(quick=True)]
+            self.assertIn("dictionary/dcz/json/1000", names)
+            make.assert_not_called()
+            with contextlib.redirect_stdout(io.StringIO()):
+                main(["--quick", "--min-time=0", "-k", "codec/gzip/json/10000"])
+            make.assert_called_once_with()
+
+    def test_compare(self):
+        baseline = {"scenarios": {"a": {"p50_ms": 1.0, "peak_memory_bytes": 1000}}}
+        results = {
+            "scenarios": {
+                "a": {"p50_ms": 1.1, "peak_memory_bytes": 10**6},
+                "b": {"p50_ms": 9.0, "peak_memory_bytes": 0},
+            }
+        }
+        regressions = compare(results, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("a: peak_memory_bytes"))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([3.0], 0.99), 3.0)
+
+    def test_payload(self):
+        for kind in CONTENT_TYPES:
+            with self.subTest(kind=kind):
+                self.assertEqual(len(make_payload(kind, 12345)), 12345)
+
+
+if __name__ == "__main__":
+    unittest.main()
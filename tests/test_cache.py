@@ -0,0 +1,93 @@
+"""Class test for cache.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from flask_sustainable.cache import FileCompressionCache, LRUCompressionCache
+from flask_sustainable.codec import default_registry
+from flask_sustainable.extension import Sustainable
+
+
+class LRUCompressionCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.codec = default_registry()["gzip"]
+        self.message = b"Welcome! " * 100
+
+    def test_hit(self):
+        cache = LRUCompressionCache()
+        with mock.patch.object(self.codec, "_compress", wraps=self.codec._compress):
+            first = cache.compress(self.codec, self.message)
+            second = cache.compress(self.codec, self.message)
+            self.assertEqual(self.codec._compress.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(gzip.decompress(first), self.message)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_level(self):
+        cache = LRUCompressionCache()
+        cache.compress(self.codec, self.message, 1)
+        cache.compress(self.codec, self.message, 9)
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.hits, 0)
+
+    def test_eviction(self):
+        cache = LRUCompressionCache(max_bytes=10)
+        cache.set(("a", "gzip", 1), b"12345")
+        cache.set(("b", "gzip", 1), b"12345")
+        cache.get(("a", "gzip", 1))
+        cache.set(("c", "gzip", 1), b"12345")
+        self.assertIsNotNone(cache.get(("a", "gzip", 1)))
+        self.assertIsNone(cache.get(("b", "gzip", 1)))
+        self.assertEqual(cache.size, 10)
+        # Too big to be cached
+        cache.set(("d", "gzip", 1), b"12345678901")
+        self.assertIsNone(cache.get(("d", "gzip", 1)))
+
+
+class FileCompressionCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.codec = default_registry()["br"]
+        self.message = b"Welcome! " * 100
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_shared(self):
+        first = FileCompressionCache(self.directory.name)
+        second = FileCompressionCache(self.directory.name)
+        encoded = first.compress(self.codec, self.message)
+        self.assertEqual(second.compress(self.codec, self.message), encoded)
+        self.assertEqual((first.misses, second.hits), (1, 1))
+
+    def test_eviction(self):
+        cache = FileCompressionCache(self.directory.name, max_bytes=10)
+        cache.set((b"a", "gzip", 1), b"12345")
+        os.utime(cache._path((b"a", "gzip", 1)), (0, 0))
+        cache.set((b"b", "gzip", 1), b"12345")
+        cache.set((b"c", "gzip", 1), b"12345")
+        self.assertIsNone(cache.get((b"a", "gzip", 1)))
+        self.assertEqual(cache.get((b"c", "gzip", 1)), b"12345")
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+
+
+class SustainableCacheTestCase(unittest.TestCase):
+    def test_cache(self):
+        app = Flask(__name__)
+        cache = LRUCompressionCache()
+        Sustainable(app, compress_cache=cache)
+        app.add_url_rule("/", view_func=lambda: "Welcome! " * 100)
+        with app.test_client() as client:
+            for _ in range(3):
+                response = client.get("/", headers={"Accept-Encoding": "gzip"})
+                self.assertEqual(gzip.decompress(response.data), b"Welcome! " * 100)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
@@ -0,0 +1,178 @@
+"""Class test for codec.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import gzip
+import lzma
+import unittest
+import zlib
+from unittest import mock
+
+import brotli
+import zstandard
+from flask import Flask
+
+from flask_sustainable.codec import (
+    PROFILES,
+    Codec,
+    CodecRegistry,
+    default_registry,
+    parse_accept_encoding,
+)
+from flask_sustainable.extension import Sustainable
+
+DECOMPRESS = {
+    "lzma": lzma.decompress,
+    # Streamed frames don't contain the content size
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+    "br": brotli.decompress,
+    "gzip": gzip.decompress,
+    "deflate": zlib.decompress,
+}
+
+
+class CodecTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.message = b"Welcome! " * 100
+
+    def test_profiles(self):
+        for codec in default_registry():
+            for profile in PROFILES:
+                with self.subTest(name=codec.encoding, profile=profile):
+                    encoded = codec.compress(self.message, codec.get_level(profile))
+                    self.assertEqual(DECOMPRESS[codec.encoding](encoded), self.message)
+
+    def test_level_fallback(self):
+        codec = Codec("x-test", lambda data, level: data, profiles={"balanced": 4})
+        self.assertEqual(codec.get_level("max"), 4)
+        self.assertEqual(codec.get_level("unknow"), 4)
+        self.assertFalse(codec.streamable)
+        with self.assertRaises(TypeError):
+            codec.compressobj()
+
+    def test_stream(self):
+        for codec in default_registry():
+            with self.subTest(name=codec.encoding):
+                compressor = codec.compressobj(codec.get_level("fast"))
+                encoded = b"".join(
+                    [
+                        compressor.compress(self.message),
+                        compressor.flush(),
+                        compressor.compress(self.message),
+                        compressor.finish(),
+                    ]
+                )
+                data = DECOMPRESS[codec.encoding](encoded)
+                self.assertEqual(data, self.message * 2)
+
+
+class CodecRegistryTestCase(unittest.TestCase):
+    def test_order(self):
+        registry = default_registry()
+        self.assertEqual(registry.encodings, ("lzma", "zstd", "br", "gzip", "deflate"))
+        registry.unregister("lzma")
+        registry.register(Codec("X-Test", lambda data, level: data))
+        self.assertEqual(
+            registry.encodings, ("zstd", "br", "gzip", "deflate", "x-test")
+        )
+        self.assertIn("X-TEST", registry)
+        self.assertNotIn("lzma", registry)
+        with self.assertRaises(KeyError):
+            registry["lzma"]  # pylint: disable=pointless-statement
+
+    def test_copy(self):
+        registry = CodecRegistry(*default_registry())
+        copied = registry.copy()
+        copied.unregister("gzip")
+        self.assertIn("gzip", registry)
+        self.assertEqual(len(copied), len(registry) - 1)
+
+
+class NegotiateTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = default_registry()
+
+    def test_parse(self):
+        self.assertEqual(
+            parse_accept_encoding("GZIP, br;q=0.8, *;q=0, zstd;q=x, gzip;q=0.1"),
+            {"gzip": 1.0, "br": 0.8, "*": 0.0, "zstd": 0.0},
+        )
+        self.assertEqual(parse_accept_encoding(""), {})
+
+    def test_negotiate(self):
+        cases = {
+            "": None,
+            "gzip": "gzip",
+            "gzip, deflate, br": "br",
+            "deflate;q=0.5, gzip;q=0.8": "gzip",
+            "*": "zstd",
+            "lzma, gzip": "lzma",
+            "*, zstd;q=0, br;q=0": "gzip",
+            "gzip, *;q=0": "gzip",
+            "*;q=0": None,
+            "gzip;q=0": None,
+            "identity;q=0": None,
+            "gzip, identity;q=0": "gzip",
+            "gzip;q=0.5, identity": None,
+            "gzip;q=0.5, *": "zstd",
+            "unknown": None,
+        }
+        for header, encoding in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(self.registry.negotiate(header), encoding)
+
+    def test_encodings(self):
+        self.assertEqual(self.registry.negotiate("*", ("br", "gzip")), "br")
+        self.assertIsNone(self.registry.negotiate("zstd", ("br", "gzip")))
+
+    def test_cache(self):
+        self.assertEqual(self.registry.negotiate("zstd, gzip"), "zstd")
+        with mock.patch.object(self.registry, "_negotiate") as negotiate:
+            self.assertEqual(self.registry.negotiate("zstd, gzip"), "zstd")
+            negotiate.assert_not_called()
+        # The cache is cleared when the codecs change
+        self.registry.unregister("zstd")
+        self.assertEqual(self.registry.negotiate("zstd, gzip"), "gzip")
+
+    def test_max_negotiations(self):
+        with mock.patch.object(CodecRegistry, "MAX_NEGOTIATIONS", 2):
+            for quality in range(5):
+                self.registry.negotiate(f"gzip;q=0.{quality}")
+            # pylint: disable=protected-access
+            self.assertLessEqual(len(self.registry._negotiations), 2)
+
+
+class SustainableCodecTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.message = "Welcome! " * 100
+        self.app = Flask(__name__)
+
+        @self.app.route("/")
+        def _():
+            return self.message
+
+    def test_registry(self):
+        registry = CodecRegistry(
+            Codec("x-reverse", lambda data, level: data[::-1]),
+            *default_registry(),
+        )
+        Sustainable(self.app, codecs=registry)
+        with self.app.test_client() as client:
+            response = client.get("/", headers={"Accept-Encoding": "x-reverse, gzip"})
+            self.assertEqual(response.content_encoding, "x-reverse")
+            self.assertEqual(response.data[::-1], self.message.encode())
+
+    def test_profile(self):
+        sizes = {}
+        for profile in ("fast", "max"):
+            app = Flask(__name__)
+            app.add_url_rule("/", view_func=lambda: self.message)
+            Sustainable(app, compress_profile=lambda response, p=profile: p)
+            with app.test_client() as client:
+                response = client.get("/", headers={"Accept-Encoding": "br"})
+                sizes[profile] = len(response.data)
+                self.assertEqual(
+                    brotli.decompress(response.data), self.message.encode()
+                )
+        self.assertLess(sizes["max"], sizes["fast"])
@@ -4,23 +4,26 @@
 # pylint: disable=missing-function-docstring
 
 import gzip
+import io
+import json
 import lzma
-import sys
 import unittest
 import zlib
+from unittest import mock
 
 import brotli
 import zstandard
-from flask import Flask, Response
+from flask import Flask, Response, send_file
 
-from flask_sustainable.compress import Compression
+from flask_sustainable.compress import Codec, Compression, CompressionPolicy
 from flask_sustainable.extension import Sustainable
+from flask_sustainable.indicator import PerfTime
 
 
 class CompressTestCase(unittest.TestCase):
     def setUp(self):
         self.app = Flask(__name__)
-        Sustainable(self.app)
+        Sustainable(self.app, compress_policy=CompressionPolicy(min_size=0))
 
         @self.app.route("/")
         def _():
@@ -74,16 +77,22 @@ class CompressTestCase(unittest.TestCase):
             self.assertEqual(response.data, b"Welcome!")
 
     def test_all(self):
-        algorithm = Compression.SUPPORTED_ALGORITHMS[0]
         with self.app.test_client() as client:
             response = client.get("/", headers={"Accept-Encoding": "*"})
-            # By default, will use gzip
-            self.assertEqual(response.headers["Content-Encoding"], algorithm)
-            self.assertEqual(response.content_encoding, algorithm)
-            # Decompress gzip
-            welcome = sys.modules[algorithm].decompress(response.data)
+            # By default, will use the first codec registered for HTTP (not lzma)
+            self.assertEqual(response.headers["Content-Encoding"], "zstd")
+            self.assertEqual(response.content_encoding, "zstd")
+            welcome = zstandard.decompress(response.data)
             self.assertEqual(welcome, b"Welcome!")
 
+    def test_identity(self):
+        with self.app.test_client() as client:
+            response = client.get(
+                "/", headers={"Accept-Encoding": "gzip;q=0.5, identity"}
+            )
+            self.assertNotIn("Content-Encoding", response.headers)
+            self.assertEqual(response.data, b"Welcome!")
+
 
 class CompressDataTestCase(unittest.TestCase):
     def setUp(self):
@@ -111,6 +120,101 @@ class CompressDataTestCase(unittest.TestCase):
                 self.assertEqual(data, self.message)
 
 
+class CompressionPolicyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        self.policy = CompressionPolicy(min_size=10, exclude_mimetypes=("text/csv",))
+
+    def test_size(self):
+        self.assertFalse(self.policy.should_compress(Response("Welcome!")))
+        self.assertTrue(self.policy.should_compress(Response("Welcome!" * 2)))
+        # The size of a stream is unknown
+        self.assertTrue(self.policy.should_compress(Response(iter([b"!"]))))
+
+    def test_check(self):
+        self.assertEqual(self.policy.check(Response("Welcome!")), "size")
+        self.assertEqual(
+            self.policy.check(Response("Welcome!" * 2, mimetype="text/csv")),
+            "mimetype",
+        )
+        self.assertIsNone(self.policy.check(Response("Welcome!" * 2)))
+
+    def test_mimetype(self):
+        for mimetype, expected in (
+            ("text/html", True),
+            ("application/json", True),
+            ("application/problem+json", True),
+            ("image/png", False),
+            ("application/zip", False),
+            ("text/csv", False),
+        ):
+            with self.subTest(mimetype=mimetype):
+                response = Response("Welcome!" * 2, mimetype=mimetype)
+                self.assertEqual(self.policy.should_compress(response), expected)
+
+    def test_status(self):
+        for status, expected in ((200, True), (404, True), (204, False), (304, False)):
+            with self.subTest(status=status):
+                response = Response("Welcome!" * 2, status=status)
+                self.assertEqual(self.policy.should_compress(response), expected)
+
+    def test_headers(self):
+        response = Response("Welcome!" * 2)
+        response.content_encoding = "gzip"
+        self.assertFalse(self.policy.should_compress(response))
+        response = Response("Welcome!" * 2)
+        response.cache_control.no_transform = True
+        self.assertFalse(self.policy.should_compress(response))
+
+    def test_sustainable(self):
+        Sustainable(self.app)
+
+        @self.app.route("/<int:size>")
+        def _(size):
+            return "!" * size
+
+        with self.app.test_client() as client:
+            response = client.get("/20", headers={"Accept-Encoding": "gzip"})
+            self.assertIsNone(response.content_encoding)
+            response = client.get("/2000", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(response.content_encoding, "gzip")
+
+
+class CodecTestCase(unittest.TestCase):
+    def test_only_one_codec_runs(self):
+        codecs = {
+            codec.encoding: mock.Mock(wraps=codec) for codec in Compression.CODECS
+        }
+        with mock.patch.object(Compression, "CODECS", codecs):
+            for name in codecs:
+                with self.subTest(name=name):
+                    Compression.compress_data(name, b"Welcome!")
+                    for encoding, codec in codecs.items():
+                        calls = codec.compress.call_count
+                        self.assertEqual(calls, int(encoding == name), encoding)
+                        codec.reset_mock()
+
+    def test_register(self):
+        class CustomCompression(Compression):
+            pass
+
+        CustomCompression.register_codec(
+            Codec(
+                "X-Reverse",
+                lambda data, level: data[::-level],
+                profiles={"balanced": 1},
+            )
+        )
+        self.assertIn("x-reverse", CustomCompression.SUPPORTED_ALGORITHMS)
+        self.assertNotIn("x-reverse", Compression.SUPPORTED_ALGORITHMS)
+        encoded = CustomCompression.compress_data("x-reverse", b"Welcome!")
+        self.assertEqual(encoded, b"!emocleW")
+
+    def test_unsupported(self):
+        with self.assertRaises(KeyError):
+            Compression.compress_data("unknow", b"Welcome!")
+
+
 class ResponseTestCase(unittest.TestCase):
     def setUp(self) -> None:
         self.app = Flask(__name__)
@@ -131,6 +235,80 @@ class ResponseTestCase(unittest.TestCase):
                     response = Compression(self.response).make_response(name)
                     data = func(response.data)
                     self.assertEqual(data, b"Welcome!")
+                    self.assertEqual(self.response.data, b"Welcome!")
+                    self.assertIsNone(self.response.content_encoding)
+
+    def test_inplace(self) -> None:
+        with self.app.test_request_context():
+            compression = Compression(self.response, "gzip", inplace=True)
+            response = compression.compress()
+            self.assertIs(response, self.response)
+            self.assertEqual(response.content_encoding, "gzip")
+            self.assertEqual(gzip.decompress(response.data), b"Welcome!")
+
+    def test_copy_shares_body(self) -> None:
+        with self.app.test_request_context():
+            compression = Compression(self.response, "gzip")
+            self.assertIsNot(compression.response, self.response)
+            self.assertIsNot(compression.response.headers, self.response.headers)
+            self.assertIs(compression.response.response, self.response.response)
+
+
+class StreamTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        Sustainable(self.app, compress_flush_size=16)
+        self.chunks = [b"Welcome!", b" " * 32, b"Bye!"]
+        self.decompress = {
+            "lzma": lambda: lzma.LZMADecompressor().decompress,
+            "zstd": lambda: zstandard.ZstdDecompressor().decompressobj().decompress,
+            "br": lambda: brotli.Decompressor().process,
+            "gzip": lambda: zlib.decompressobj(16 + zlib.MAX_WBITS).decompress,
+            "deflate": lambda: zlib.decompressobj().decompress,
+        }
+
+        @self.app.route("/")
+        def _():
+            return Response(iter(self.chunks))
+
+        @self.app.route("/file")
+        def _file():
+            return send_file(io.BytesIO(b"Welcome!" * 1000), mimetype="text/plain")
+
+    def test_all(self):
+        with self.app.test_client() as client:
+            for name, decompressor in self.decompress.items():
+                with self.subTest(name=name):
+                    response = client.get("/", headers={"Accept-Encoding": name})
+                    self.assertEqual(response.content_encoding, name)
+                    self.assertNotIn("Content-Length", response.headers)
+                    data = decompressor()(response.data)
+                    self.assertEqual(data, b"".join(self.chunks))
+
+    def test_first_chunk(self):
+        with self.app.test_client() as client:
+            response = client.get(
+                "/", headers={"Accept-Encoding": "gzip"}, buffered=False
+            )
+            decompress = self.decompress["gzip"]()
+            # The first chunk is available before the end of the stream
+            self.assertEqual(decompress(next(response.response)), b"Welcome!")
+            response.close()
+
+    def test_direct_passthrough(self):
+        with self.app.test_client() as client:
+            response = client.get("/file", headers={"Accept-Encoding": "br"})
+            self.assertEqual(response.content_encoding, "br")
+            self.assertEqual(brotli.decompress(response.data), b"Welcome!" * 1000)
+
+    def test_disabled(self):
+        app = Flask(__name__)
+        Sustainable(app, compress_stream=False)
+        app.add_url_rule("/", view_func=lambda: Response(iter(self.chunks)))
+        with app.test_client() as client:
+            response = client.get("/", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(response.content_length, len(response.data))
+            self.assertEqual(gzip.decompress(response.data), b"".join(self.chunks))
 
 
 class AcceptEncodingTestCase(unittest.TestCase):
@@ -144,3 +322,124 @@ class AcceptEncodingTestCase(unittest.TestCase):
     def test_parse(self):
         with self.app.test_client() as client:
             client.get("/", headers={"Accept-Encoding": "gzip, deflate"})
+
+
+class ValidatorsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        Sustainable(self.app, compress_policy=CompressionPolicy(min_size=0))
+        self.consumed = []
+
+        @self.app.route("/")
+        def _():
+            response = Response("Welcome!")
+            response.set_etag("abc")
+            return response
+
+        @self.app.route("/stream")
+        def _stream():
+            def generate():
+                self.consumed.append(True)
+                yield "Welcome!"
+
+            response = Response(generate())
+            response.set_etag("abc")
+            return response
+
+        @self.app.route("/image")
+        def _image():
+            return Response(b"\x89PNG", mimetype="image/png")
+
+    def test_vary(self):
+        with self.app.test_client() as client:
+            response = client.get("/", headers={"Accept-Encoding": "gzip"})
+            self.assertIn("Accept-Encoding", response.vary)
+            # Not compressed, but it depends on the Accept-Encoding header
+            response = client.get("/", headers={"Accept-Encoding": "unknown"})
+            self.assertIn("Accept-Encoding", response.vary)
+            # Never compressed
+            response = client.get("/image", headers={"Accept-Encoding": "gzip"})
+            self.assertNotIn("Accept-Encoding", response.vary)
+
+    def test_etag(self):
+        with self.app.test_client() as client:
+            response = client.get("/", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(response.headers["ETag"], 'W/"abc-gzip"')
+            response = client.get("/stream", headers={"Accept-Encoding": "br"})
+            self.assertEqual(response.headers["ETag"], 'W/"abc-br"')
+            response = client.get("/", headers={"Accept-Encoding": "unknown"})
+            self.assertEqual(response.headers["ETag"], '"abc"')
+
+    def test_not_modified(self):
+        with self.app.test_client() as client, mock.patch.object(
+            Codec, "compress"
+        ) as compress:
+            response = client.get(
+                "/",
+                headers={"Accept-Encoding": "gzip", "If-None-Match": 'W/"abc-gzip"'},
+            )
+            compress.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.headers["ETag"], 'W/"abc-gzip"')
+        self.assertIn("Accept-Encoding", response.vary)
+
+    def test_not_modified_stream(self):
+        with self.app.test_client() as client:
+            response = client.get(
+                "/stream",
+                headers={"Accept-Encoding": "gzip", "If-None-Match": '"abc-gzip"'},
+            )
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(self.consumed, [])
+
+    def test_other_encoding(self):
+        with self.app.test_client() as client:
+            response = client.get(
+                "/", headers={"Accept-Encoding": "gzip", "If-None-Match": 'W/"abc-br"'}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(gzip.decompress(response.data), b"Welcome!")
+
+
+class StreamJSONTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        self.sustainable = Sustainable(self.app)
+        self.sustainable.add_indicator(PerfTime())
+        self.records = [{"id": x, "name": f"user {x}"} for x in range(1000)]
+
+        @self.app.route("/")
+        def _():
+            return self.sustainable.stream_json(iter(self.records), chunk_size=1024)
+
+        @self.app.route("/empty")
+        def _empty():
+            return self.sustainable.stream_json([])
+
+    def test_compressed(self):
+        with self.app.test_client() as client:
+            response = client.get(
+                "/", headers={"Accept-Encoding": "gzip", "Perf": "Perf-Time"}
+            )
+            self.assertEqual(response.content_encoding, "gzip")
+            self.assertEqual(response.mimetype, "application/json")
+            self.assertIn("Perf-Time", response.headers)
+            self.assertEqual(json.loads(gzip.decompress(response.data)), self.records)
+
+    def test_chunks(self):
+        with self.app.test_client() as client:
+            response = client.get("/", buffered=False)
+            chunks = list(response.response)
+            response.close()
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertGreater(len(chunks), 10)
+        # A chunk is at most the chunk size plus a record
+        self.assertLess(max(len(x) for x in chunks), 1024 + 64)
+        self.assertEqual(json.loads(b"".join(chunks)), self.records)
+
+    def test_empty(self):
+        with self.app.test_client() as client:
+            response = client.get("/empty", headers={"Accept-Encoding": "br"})
+            self.assertEqual(brotli.decompress(response.data), b"[]")
@@ -0,0 +1,163 @@
+"""Class test for dictionary.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import json
+import os
+import tempfile
+import unittest
+
+import zstandard
+from flask import Flask, Response, jsonify
+
+from flask_sustainable.compress import CompressionPolicy
+from flask_sustainable.dictionary import (
+    DCZ_MAGIC,
+    CompressionDictionary,
+    DictionarySampler,
+)
+from flask_sustainable.extension import Sustainable
+
+
+def make_corpus(size: int) -> list:
+    return [
+        json.dumps(
+            {
+                "id": i,
+                "name": f"user{i}",
+                "email": f"user{i}@example.com",
+                "active": bool(i % 2),
+                "roles": ["reader", "writer"][: i % 3],
+            }
+        ).encode()
+        for i in range(size)
+    ]
+
+
+def decompress(dictionary: CompressionDictionary, data: bytes) -> bytes:
+    header = DCZ_MAGIC + dictionary.hash
+    assert data.startswith(header)
+    prepared = zstandard.ZstdCompressionDict(
+        dictionary.data, dict_type=zstandard.DICT_TYPE_RAWCONTENT
+    )
+    return zstandard.ZstdDecompressor(dict_data=prepared).decompress(
+        data[len(header) :]
+    )
+
+
+class CompressionDictionaryTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.corpus = make_corpus(2000)
+        cls.dictionary = CompressionDictionary.train(cls.corpus[:1000], size=4096)
+
+    def test_ratio(self):
+        plain, shared = 0, 0
+        for sample in self.corpus[1000:]:
+            encoded = self.dictionary.compress(sample)
+            self.assertEqual(decompress(self.dictionary, encoded), sample)
+            plain += len(zstandard.compress(sample, 3))
+            shared += len(encoded)
+        self.assertLess(shared, plain * 0.8)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dictionary.zdict")
+            self.dictionary.save(path)
+            loaded = CompressionDictionary.load(path)
+        self.assertEqual(loaded.available, self.dictionary.available)
+
+
+class SustainableDictionaryTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.corpus = make_corpus(1000)
+        self.dictionary = CompressionDictionary.train(self.corpus, size=4096)
+        self.app = Flask(__name__)
+        Sustainable(self.app, compress_dictionary=self.dictionary)
+
+        @self.app.route("/users/<int:user>")
+        def _(user):
+            return jsonify(json.loads(self.corpus[user]))
+
+    def test_dictionary(self):
+        with self.app.test_client() as client:
+            response = client.get("/sustainable/dictionary")
+            self.assertEqual(response.data, self.dictionary.data)
+            self.assertEqual(response.headers["Use-As-Dictionary"], 'match="/*"')
+            response = client.get(
+                "/users/42",
+                headers={
+                    "Accept-Encoding": "gzip, br, zstd, dcz",
+                    "Available-Dictionary": self.dictionary.available,
+                },
+            )
+            self.assertEqual(response.content_encoding, "dcz")
+            self.assertIn("Available-Dictionary", response.vary)
+            data = json.loads(decompress(self.dictionary, response.data))
+            self.assertEqual(data["id"], 42)
+
+    def test_fallback(self):
+        with self.app.test_client() as client:
+            for headers in (
+                {"Accept-Encoding": "zstd, dcz"},
+                {"Accept-Encoding": "zstd", "Available-Dictionary": ":unknow:"},
+                {
+                    "Accept-Encoding": "zstd, dcz;q=0",
+                    "Available-Dictionary": self.dictionary.available,
+                },
+            ):
+                with self.subTest(headers=headers):
+                    # The policy excludes small bodies, only dictionaries help
+                    response = client.get("/users/42", headers=headers)
+                    self.assertNotEqual(response.content_encoding, "dcz")
+
+
+class DictionarySamplerTestCase(unittest.TestCase):
+    def test_workflow(self):
+        with tempfile.TemporaryDirectory() as directory:
+            samples = os.path.join(directory, "samples")
+            app = Flask(__name__)
+            Sustainable(app, dictionary_sampler=DictionarySampler(samples, rate=1))
+            corpus = make_corpus(500)
+            app.add_url_rule(
+                "/<int:user>", view_func=lambda user: jsonify(json.loads(corpus[user]))
+            )
+            with app.test_client() as client:
+                for user in range(len(corpus)):
+                    client.get(f"/{user}")
+            self.assertEqual(len(os.listdir(samples)), len(corpus))
+            output = os.path.join(directory, "dictionary.zdict")
+            result = app.test_cli_runner().invoke(
+                args=[
+                    "sustainable",
+                    "train-dictionary",
+                    samples,
+                    output,
+                    "--size",
+                    "2048",
+                ]
+            )
+            self.assertIn("written", result.output)
+            self.assertLessEqual(os.path.getsize(output), 2048)
+
+    def test_filter(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sampler = DictionarySampler(directory, rate=1)
+            body = b'{"name": "user"}'
+            responses = {
+                "404": Response(body, status=404, mimetype="application/json"),
+                "500": Response(body, status=500, mimetype="application/json"),
+                "image": Response(body, mimetype="image/png"),
+            }
+            for name, response in responses.items():
+                with self.subTest(name=name):
+                    self.assertFalse(sampler.sample(response))
+            response = Response(body, content_type="Application/JSON")
+            self.assertTrue(sampler.sample(response))
+            self.assertEqual(len(os.listdir(directory)), 1)
+            # The patterns of the policy are compared in lowercase
+            policy = CompressionPolicy(mimetypes=("Text/CSV",))
+            response = Response(b"a,b", mimetype="text/csv")
+            self.assertTrue(sampler.sample(response, policy))
+            self.assertFalse(sampler.sample(Response(body), policy))
@@ -0,0 +1,173 @@
+"""Class test for energy.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from flask_sustainable import Sustainable
+from flask_sustainable.energy import (
+    EnergySampler,
+    EnergySource,
+    RAPLSource,
+    TDPSource,
+    default_source,
+)
+from flask_sustainable.indicator import PerfEnergy, PerfPower
+
+
+class FakeSource(EnergySource):
+    """A machine consuming 10 watts."""
+
+    def __init__(self) -> None:
+        self.origin = time.monotonic()
+        self.closed = False
+
+    def read(self) -> float:
+        return (time.monotonic() - self.origin) * 10
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def busy(seconds: float) -> None:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+class EnergySamplerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.source = FakeSource()
+        self.sampler = EnergySampler(self.source, interval=0.01)
+
+    def tearDown(self) -> None:
+        self.sampler.stop()
+
+    def test_sample(self):
+        self.sampler.start()
+        self.assertTrue(self.sampler.running)
+        time.sleep(0.1)
+        self.assertAlmostEqual(self.sampler.power, 10, delta=1)
+        self.sampler.stop()
+        self.assertFalse(self.sampler.running)
+        self.assertTrue(self.source.closed)
+
+    def test_attribute(self):
+        self.sampler.start()
+        time.sleep(0.05)
+        start = self.sampler.snapshot()
+        busy(0.1)
+        power, energy = self.sampler.attribute(start)
+        # The request used (almost) all the CPU time of the process
+        self.assertGreater(power, 5)
+        self.assertAlmostEqual(energy, power * 0.1, delta=0.2)
+
+    def test_idle_request(self):
+        self.sampler.start()
+        time.sleep(0.05)
+        start = self.sampler.snapshot()
+        time.sleep(0.05)
+        power, _ = self.sampler.attribute(start)
+        self.assertLess(power, 5)
+
+    def test_share(self):
+        # The machine consumed 10 J per second, the process 50 ms of CPU per second
+        sampler = EnergySampler(FakeSource(), interval=1.0)
+        sampler._samples.extend([(101.0, 10.0, 0.05), (102.0, 10.0, 0.05)])
+        for request_cpu, expected in ((0.05, 10.0), (0.001, 0.2)):
+            with self.subTest(request_cpu=request_cpu), mock.patch(
+                "time.monotonic", return_value=101.5
+            ), mock.patch(
+                "flask_sustainable.energy.cpu_time", return_value=request_cpu
+            ):
+                power, energy = sampler.attribute((100.5, 0.0))
+            # The duration of the request doesn't multiply the energy
+            self.assertAlmostEqual(energy, expected)
+            self.assertAlmostEqual(power, expected)
+
+
+class RAPLSourceTestCase(unittest.TestCase):
+    """The powercap interface is faked in a temporary directory."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=r1732
+        self.root = self.tmp.name
+        self.write("intel-rapl:0", 1_000_000, 10_000_000)
+        self.write("intel-rapl:1", 2_000_000, 10_000_000)
+        # Sub-domains are included in their package
+        self.write("intel-rapl:0:0", 500_000, 10_000_000)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def write(self, domain: str, energy: int, max_range: int = None) -> None:
+        path = os.path.join(self.root, domain)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "energy_uj"), "w") as file:
+            file.write(f"{energy}\n")
+        if max_range is not None:
+            with open(os.path.join(path, "max_energy_range_uj"), "w") as file:
+                file.write(f"{max_range}\n")
+
+    def test_read(self):
+        source = RAPLSource(self.root)
+        self.assertEqual(source.read(), 0)
+        self.write("intel-rapl:0", 3_000_000)
+        self.write("intel-rapl:1", 2_500_000)
+        self.write("intel-rapl:0:0", 9_000_000)
+        self.assertAlmostEqual(source.read(), 2.5)
+        source.close()
+
+    def test_wraparound(self):
+        source = RAPLSource(self.root)
+        self.write("intel-rapl:0", 9_000_000)
+        self.assertAlmostEqual(source.read(), 8)
+        self.write("intel-rapl:0", 500_000)
+        self.assertAlmostEqual(source.read(), 9.5)
+        source.close()
+
+    def test_unavailable(self):
+        with self.assertRaises(OSError):
+            RAPLSource(os.path.join(self.root, "intel-rapl:0"))
+        with self.assertRaises(OSError):
+            RAPLSource(os.path.join(self.root, "missing"))
+
+    def test_default_source(self):
+        source = default_source()
+        self.assertIsInstance(source, (RAPLSource, TDPSource))
+        source.close()
+
+
+class TDPSourceTestCase(unittest.TestCase):
+    def test_read(self):
+        source = TDPSource(tdp=80, cpu_count=8)
+        self.assertEqual(source.power_per_cpu, 10)
+        with mock.patch("time.process_time", return_value=2.5):
+            self.assertEqual(source.read(), 25)
+
+
+class SustainableEnergyTestCase(unittest.TestCase):
+    def test_indicators(self):
+        sampler = EnergySampler(FakeSource(), interval=0.01)
+        app = Flask(__name__)
+        sustainable = Sustainable(app)
+        sustainable.add_indicators(PerfEnergy(sampler), PerfPower(sampler))
+        self.assertTrue(sampler.running)
+
+        @app.route("/")
+        def _():
+            busy(0.05)
+            return "Welcome!"
+
+        with app.test_client() as client:
+            response = client.get("/", headers={"Perf": "Perf-Energy, Perf-Power"})
+        self.assertGreater(float(response.headers["Perf-Energy"]), 0)
+        self.assertGreater(float(response.headers["Perf-Power"]), 0)
+        sampler.stop()
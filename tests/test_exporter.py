@@ -0,0 +1,219 @@
+"""Class test for exporter.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import gc
+import http.server
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import weakref
+
+from flask import Flask
+
+from flask_sustainable import Sustainable
+from flask_sustainable import exporter as exporter_module
+from flask_sustainable.exporter import (
+    BaseSink,
+    HTTPSink,
+    JSONLinesSink,
+    StatsDSink,
+    TelemetryExporter,
+)
+from flask_sustainable.indicator import PerfTime
+
+RECORD = {"endpoint": "index", "values": {"Perf-Time": 1.5}}
+
+
+class ListSink(BaseSink):
+    def __init__(self, event: threading.Event = None) -> None:
+        self.batches = []
+        self.event = event
+        self.closed = 0
+
+    def write(self, records):
+        if self.event is not None:
+            self.event.wait()
+        self.batches.append(records)
+
+    def close(self):
+        self.closed += 1
+
+
+class TelemetryExporterTestCase(unittest.TestCase):
+    def test_export(self):
+        sink = ListSink()
+        exporter = TelemetryExporter(sink, batch_size=10, interval=0.01)
+        for _ in range(25):
+            self.assertTrue(exporter.submit(RECORD))
+        exporter.stop()
+        self.assertEqual(sum(len(x) for x in sink.batches), 25)
+        self.assertTrue(all(len(x) <= 10 for x in sink.batches))
+        self.assertEqual(exporter.stats()["exported"], 25)
+
+    def test_overflow(self):
+        event = threading.Event()
+        exporter = TelemetryExporter(
+            ListSink(event), max_queue=5, batch_size=1, interval=0.01
+        )
+        results = [exporter.submit(RECORD) for _ in range(20)]
+        stats = exporter.stats()
+        self.assertFalse(all(results))
+        self.assertEqual(stats["dropped"], results.count(False))
+        self.assertLessEqual(stats["depth"], 5)
+        event.set()
+        exporter.stop()
+        self.assertEqual(exporter.stats()["depth"], 0)
+
+    def test_error(self):
+        class FailingSink(BaseSink):
+            def write(self, records):
+                raise OSError("unreachable")
+
+        exporter = TelemetryExporter(FailingSink(), interval=0.01)
+        exporter.submit(RECORD)
+        exporter.stop()
+        self.assertEqual(exporter.stats()["errors"], 1)
+
+    def test_stopped(self):
+        sink = ListSink()
+        exporter = TelemetryExporter(sink, interval=0.01)
+        exporter.submit(RECORD)
+        exporter.stop()
+        self.assertFalse(exporter.submit(RECORD))
+        self.assertIsNone(exporter._thread)
+        exporter.stop()
+        self.assertEqual(sink.closed, 1)
+        self.assertEqual(exporter.stats()["exported"], 1)
+
+    def test_registry(self):
+        exporter = TelemetryExporter(ListSink())
+        self.assertIn(exporter, exporter_module._EXPORTERS)
+        # The registry doesn't keep the exporter alive
+        reference = weakref.ref(exporter)
+        del exporter
+        gc.collect()
+        self.assertIsNone(reference())
+
+
+class JSONLinesSinkTestCase(unittest.TestCase):
+    def test_rotation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "telemetry.jsonl")
+            sink = JSONLinesSink(path, max_bytes=100, backups=2)
+            for _ in range(10):
+                sink.write([RECORD, RECORD])
+            sink.close()
+            self.assertTrue(os.path.exists(f"{path}.1"))
+            self.assertTrue(os.path.exists(f"{path}.2"))
+            self.assertFalse(os.path.exists(f"{path}.3"))
+            with open(f"{path}.1", encoding="utf-8") as file:
+                self.assertEqual(json.loads(file.readline()), RECORD)
+
+
+class StatsDSinkTestCase(unittest.TestCase):
+    def test_write(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server:
+            server.bind(("127.0.0.1", 0))
+            server.settimeout(5)
+            sink = StatsDSink(port=server.getsockname()[1])
+            sink.write([RECORD, {"endpoint": None, "values": {"Perf-CPU": 2}}])
+            sink.close()
+            packet = server.recv(4096).decode()
+        self.assertEqual(
+            packet.splitlines(),
+            ["sustainable.index.perf_time:1.5|ms", "sustainable.none.perf_cpu:2|ms"],
+        )
+
+    def test_metric_types(self):
+        values = {
+            "Perf-Time": 1.5,
+            "Perf-CPU": 1.2,
+            "Perf-RAM": 0.5,
+            "Perf-Energy": 0.1,
+            "Perf-Power": 3.2,
+            "Perf-Score-1": 7,
+        }
+        expected = {
+            None: ["ms", "ms", "h", "h", "h", "h"],
+            "h": ["ms", "ms", "h", "h", "h", "h"],
+            "g": ["ms", "ms", "g", "g", "g", "g"],
+        }
+        for metric_type, types in expected.items():
+            with self.subTest(metric_type=metric_type):
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server:
+                    server.bind(("127.0.0.1", 0))
+                    server.settimeout(5)
+                    options = {"metric_type": metric_type} if metric_type else {}
+                    sink = StatsDSink(port=server.getsockname()[1], **options)
+                    sink.write([{"endpoint": "index", "values": values}])
+                    sink.close()
+                    packet = server.recv(4096).decode()
+                self.assertEqual(
+                    [x.rsplit("|", 1)[1] for x in packet.splitlines()], types
+                )
+        with self.assertRaises(ValueError):
+            StatsDSink(metric_type="ms")
+
+    def test_negative_gauge(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server:
+            server.bind(("127.0.0.1", 0))
+            server.settimeout(5)
+            sink = StatsDSink(port=server.getsockname()[1], metric_type="g")
+            sink.write([{"endpoint": "index", "values": {"Perf-RAM": -0.3}}])
+            sink.close()
+            packet = server.recv(4096).decode()
+        self.assertEqual(
+            packet.splitlines(),
+            ["sustainable.index.perf_ram:0|g", "sustainable.index.perf_ram:-0.3|g"],
+        )
+
+
+class HTTPSinkTestCase(unittest.TestCase):
+    def test_write(self):
+        bodies = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):  # pylint: disable=invalid-name
+                length = int(self.headers["Content-Length"])
+                bodies.append(json.loads(self.rfile.read(length)))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        HTTPSink(f"http://127.0.0.1:{server.server_port}/").write([RECORD])
+        thread.join()
+        server.server_close()
+        self.assertEqual(bodies, [{"records": [RECORD]}])
+
+
+class SustainableExporterTestCase(unittest.TestCase):
+    def test_export(self):
+        sink = ListSink()
+        exporter = TelemetryExporter(sink, interval=0.01)
+        app = Flask(__name__)
+        sustainable = Sustainable(app, exporter=exporter)
+        sustainable.add_indicator(PerfTime())
+
+        @app.route("/")
+        def index():
+            return "Welcome!"
+
+        with app.test_client() as client:
+            client.get("/", headers={"Perf": "Perf-Time"})
+            client.get("/")
+        exporter.stop()
+        records = [x for batch in sink.batches for x in batch]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["endpoint"], "index")
+        self.assertEqual(records[0]["status"], 200)
+        self.assertIn("Perf-Time", records[0]["values"])
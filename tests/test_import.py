@@ -0,0 +1,68 @@
+"""Class test for the import time of the package."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import subprocess
+import sys
+import unittest
+from typing import Dict
+
+#: Modules that must only be imported when they are used
+LAZY_MODULES = ("brotli", "zstandard", "lzma", "codecarbon", "prometheus_client")
+#: Maximum import time of the modules of the package, in microseconds
+BUDGET = 500_000
+
+
+def import_times(statement: str) -> Dict[str, int]:
+    """Import modules in a new interpreter, with ``python -X importtime``.
+
+    :param statement: The import statement
+    :type statement: str
+    :return: The time spent by each imported module itself, in microseconds
+    :rtype: Dict[str, int]
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        own, _, name = line[12:].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = int(own)
+    return times
+
+
+class ImportTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # The modules imported by flask itself are excluded
+        flask = import_times("import flask")
+        cls.times = {
+            name: value
+            for name, value in import_times("import flask_sustainable").items()
+            if name not in flask
+        }
+
+    def test_lazy_modules(self):
+        for module in LAZY_MODULES:
+            with self.subTest(module=module):
+                self.assertNotIn(module, self.times)
+
+    def test_budget(self):
+        own = sum(
+            value
+            for name, value in self.times.items()
+            if name.startswith("flask_sustainable")
+        )
+        self.assertGreater(own, 0)
+        self.assertLess(own, BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
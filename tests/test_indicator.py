@@ -3,11 +3,15 @@
 # pylint: disable=missing-class-docstring
 # pylint: disable=missing-function-docstring
 
+import os
+import threading
+import tracemalloc
 import unittest
+from unittest import mock
 
 from flask import Flask
 
-from flask_sustainable import Sustainable
+from flask_sustainable import Sustainable, indicator
 from flask_sustainable.indicator import (
     PerfCPU,
     PerfEnergy,
@@ -65,7 +69,7 @@ class PerfRAMTestCase(unittest.TestCase):
     def setUp(self) -> None:
         self.app = Flask(__name__)
         sustainable = Sustainable(self.app)
-        sustainable.add_indicator(PerfRAM())
+        sustainable.add_indicator(PerfRAM(backend="tracemalloc"))
 
         @self.app.route("/")
         def _():
@@ -83,6 +87,94 @@ class PerfRAMTestCase(unittest.TestCase):
             self.assertIn("PERF-RAM", response.headers)
 
 
+class PerfRAMBackendTestCase(unittest.TestCase):
+    def make_app(self, indicator: PerfRAM) -> Flask:
+        app = Flask(__name__)
+        sustainable = Sustainable(app)
+        sustainable.add_indicator(indicator)
+
+        @app.route("/")
+        def _():
+            return "Welcome!" * 1000
+
+        return app
+
+    def test_rss(self):
+        # The default backend doesn't trace the allocations
+        self.assertEqual(PerfRAM().backend, "rss")
+        app = self.make_app(PerfRAM())
+        with app.test_client() as client:
+            response = client.get("/", headers={"perf": "perf-ram"})
+            float(response.headers.get("Perf-RAM"))
+        self.assertFalse(tracemalloc.is_tracing())
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "requires procfs")
+    def test_statm_threads(self):
+        # A descriptor inherited from a parent process
+        inherited = os.open("/proc/self/statm", os.O_RDONLY)
+        indicator._STATM = (-1, inherited)
+        barrier = threading.Barrier(8)
+        results = []
+
+        def rss():
+            barrier.wait()
+            results.append(indicator._rss_statm())
+
+        with mock.patch("os.open", wraps=os.open) as opened:
+            threads = [threading.Thread(target=rss) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(indicator._STATM[0], os.getpid())
+        with self.assertRaises(OSError):
+            os.fstat(inherited)
+
+    def test_sample_rate(self):
+        app = self.make_app(PerfRAM(sample_rate=3))
+        with app.test_client() as client:
+            responses = [
+                client.get("/", headers={"perf": "perf-ram"}) for _ in range(6)
+            ]
+        measured = ["Perf-RAM" in x.headers for x in responses]
+        self.assertEqual(measured, [True, False, False, True, False, False])
+
+    def test_threads(self):
+        app = self.make_app(PerfRAM(backend="tracemalloc"))
+        results = []
+
+        def request():
+            with app.test_client() as client:
+                for _ in range(20):
+                    response = client.get("/", headers={"perf": "perf-ram"})
+                    results.append(float(response.headers["Perf-RAM"]))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 160)
+        # The last request stops the tracing
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_external_tracing(self):
+        app = self.make_app(PerfRAM(backend="tracemalloc"))
+        tracemalloc.start()
+        try:
+            with app.test_client() as client:
+                client.get("/", headers={"perf": "perf-ram"})
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            PerfRAM(backend="unknow")
+
+
 class PerfAllTestCase(unittest.TestCase):
     def setUp(self) -> None:
         self.app = Flask(__name__)
@@ -0,0 +1,92 @@
+"""Class test for metrics.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import random
+import threading
+import unittest
+
+from flask import Flask
+
+from flask_sustainable import Sustainable
+from flask_sustainable.indicator import PerfTime
+from flask_sustainable.metrics import DDSketch, MetricsAggregator
+
+
+class DDSketchTestCase(unittest.TestCase):
+    def test_quantile(self):
+        sketch = DDSketch(relative_accuracy=0.01)
+        values = [random.lognormvariate(0, 2) for _ in range(10000)]
+        for value in values:
+            sketch.add(value)
+        values.sort()
+        for quantile in (0.5, 0.95, 0.99):
+            expected = values[int(quantile * (len(values) - 1))]
+            self.assertAlmostEqual(
+                sketch.quantile(quantile), expected, delta=expected * 0.02
+            )
+
+    def test_signs(self):
+        sketch = DDSketch()
+        for value in (-10, -1, 0, 0, 1, 10):
+            sketch.add(value)
+        self.assertAlmostEqual(sketch.quantile(0), -10, delta=0.1)
+        self.assertEqual(sketch.quantile(0.5), 0)
+        self.assertAlmostEqual(sketch.quantile(1), 10, delta=0.1)
+        self.assertEqual(DDSketch().quantile(0.5), 0)
+
+    def test_max_buckets(self):
+        sketch = DDSketch(max_buckets=10)
+        for value in range(1, 1000):
+            sketch.add(value)
+        self.assertLessEqual(len(sketch._bins[0]), 10)
+        # The highest quantiles keep their accuracy
+        self.assertAlmostEqual(sketch.quantile(0.99), 989, delta=20)
+
+
+class MetricsAggregatorTestCase(unittest.TestCase):
+    def test_record(self):
+        aggregator = MetricsAggregator()
+        for value in (1.0, 2.0, 3.0):
+            aggregator.record("index", {"Perf-Time": value, "Perf-CPU": value * 2})
+        metric = aggregator.get("index", "Perf-Time")
+        self.assertEqual(metric["count"], 3)
+        self.assertEqual(metric["sum"], 6)
+        self.assertEqual((metric["min"], metric["max"]), (1, 3))
+        self.assertAlmostEqual(metric["p50"], 2, delta=0.02)
+        self.assertIn("p99", metric)
+        self.assertEqual(set(aggregator.snapshot()["index"]), {"Perf-Time", "Perf-CPU"})
+        self.assertIsNone(aggregator.get("other", "Perf-Time"))
+        aggregator.reset()
+        self.assertEqual(aggregator.snapshot(), {})
+
+    def test_threads(self):
+        aggregator = MetricsAggregator(stripes=4)
+
+        def record():
+            for _ in range(1000):
+                aggregator.record("index", {"Perf-Time": 1.0})
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(aggregator.get("index", "Perf-Time")["count"], 8000)
+
+
+class SustainableMetricsTestCase(unittest.TestCase):
+    def test_endpoint(self):
+        app = Flask(__name__)
+        sustainable = Sustainable(app, metrics_url="/sustainable/metrics")
+        sustainable.add_indicator(PerfTime())
+
+        @app.route("/")
+        def index():
+            return "Welcome!"
+
+        with app.test_client() as client:
+            client.get("/", headers={"Perf": "Perf-Time"})
+            response = client.get("/sustainable/metrics")
+        self.assertEqual(response.json["index"]["Perf-Time"]["count"], 1)
@@ -0,0 +1,92 @@
+"""Class test for parallel.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import gzip
+import os
+import unittest
+import zlib
+
+import zstandard
+from flask import Flask
+
+from flask_sustainable.codec import default_registry
+from flask_sustainable.extension import Sustainable
+from flask_sustainable.parallel import ParallelCompressor
+
+
+class ParallelCompressorTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.parallel = ParallelCompressor(threshold=1024, workers=4, chunk_size=4096)
+        self.registry = default_registry()
+        # Mix of compressible and random data
+        self.data = (b"Welcome! " * 10000 + os.urandom(10000)) * 3
+
+    def tearDown(self) -> None:
+        self.parallel.shutdown()
+
+    def test_accepts(self):
+        self.assertTrue(self.parallel.accepts("gzip", 1024))
+        self.assertFalse(self.parallel.accepts("gzip", 1023))
+        self.assertFalse(self.parallel.accepts("br", 10**6))
+
+    def test_all(self):
+        decompress = {
+            "gzip": gzip.decompress,
+            "deflate": zlib.decompress,
+            "zstd": zstandard.decompress,
+        }
+        for encoding, func in decompress.items():
+            for size in (1, 4096, 4097, len(self.data)):
+                with self.subTest(encoding=encoding, size=size):
+                    data = self.data[:size]
+                    encoded = self.parallel.compress(self.registry[encoding], data)
+                    self.assertEqual(func(encoded), data)
+
+    def test_single_member(self):
+        encoded = self.parallel.compress(self.registry["gzip"], self.data)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(decompressor.decompress(encoded), self.data)
+        self.assertTrue(decompressor.eof)
+        self.assertEqual(decompressor.unused_data, b"")
+
+    def test_headers(self):
+        for level in (1, 6, 9):
+            with self.subTest(level=level):
+                encoded = self.parallel.compress(
+                    self.registry["deflate"], self.data, level
+                )
+                self.assertEqual(encoded[:2], zlib.compress(self.data, level)[:2])
+                self.assertEqual(zlib.decompress(encoded), self.data)
+                encoded = self.parallel.compress(
+                    self.registry["gzip"], self.data, level
+                )
+                # The extra flags of the header: 4 is the fastest, 2 the best
+                self.assertEqual(encoded[8], {1: 4, 6: 0, 9: 2}[level])
+
+    def test_primed(self):
+        # Each chunk repeats the previous one: it refers to it
+        data = os.urandom(4096) * 20
+        encoded = self.parallel.compress(self.registry["deflate"], data, 6)
+        self.assertEqual(zlib.decompress(encoded), data)
+        self.assertLess(len(encoded), 2 * 4096)
+
+    def test_unsupported(self):
+        with self.assertRaises(KeyError):
+            self.parallel.compress(self.registry["br"], self.data)
+
+
+class SustainableParallelTestCase(unittest.TestCase):
+    def test_parallel(self):
+        app = Flask(__name__)
+        parallel = ParallelCompressor(threshold=1024, workers=2)
+        Sustainable(app, compress_parallel=parallel)
+        app.add_url_rule("/", view_func=lambda: "Welcome! " * 100000)
+        with app.test_client() as client:
+            for encoding in ("gzip", "br"):
+                response = client.get("/", headers={"Accept-Encoding": encoding})
+                self.assertEqual(response.content_encoding, encoding)
+            response = client.get("/", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(gzip.decompress(response.data), b"Welcome! " * 100000)
+        parallel.shutdown()
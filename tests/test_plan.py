@@ -0,0 +1,160 @@
+"""Class test for plan.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import unittest
+
+import flask
+from flask import Flask
+
+from flask_sustainable import Sustainable
+from flask_sustainable.base import BaseIndicator, BaseScore
+from flask_sustainable.plan import ExecutionPlan
+
+
+class Recorder:
+    """Record the calls of a header."""
+
+    def __init__(self, name: str, calls: list, requires: tuple = ()) -> None:
+        self._name = name
+        self.calls = calls
+        self.requires = requires
+
+    @property
+    def name(self):
+        return self._name
+
+    def after_request(self, response):
+        self.calls.append(f"after {self.name}")
+        response.headers[self.name] = "1"
+        return response
+
+
+class Indicator(Recorder, BaseIndicator):
+    def before_request(self) -> None:
+        self.calls.append(f"before {self.name}")
+
+
+class Score(Recorder, BaseScore):
+    pass
+
+
+class ExecutionPlanTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.calls = []
+
+    def test_sort(self):
+        score_1 = Score("Perf-Score-1", self.calls, requires=("Perf-Score-2",))
+        score_2 = Score("Perf-Score-2", self.calls, requires=("perf-b",))
+        indicator_a = Indicator("Perf-A", self.calls)
+        indicator_b = Indicator("Perf-B", self.calls)
+        plan = ExecutionPlan([score_1, indicator_a, score_2, indicator_b])
+        self.assertEqual(plan.headers, (indicator_a, indicator_b, score_2, score_1))
+        self.assertEqual(plan.index["perf-score-1"], 3)
+        self.assertEqual(
+            plan.allow_headers, "Perf-A, Perf-B, Perf-Score-2, Perf-Score-1"
+        )
+        self.assertIsNone(plan.before[2])
+
+    def test_unknown_requirement(self):
+        score = Score("Perf-Score-1", self.calls, requires=("Perf-Unknown",))
+        self.assertEqual(ExecutionPlan([score]).headers, (score,))
+
+    def test_cycle(self):
+        score_1 = Score("Perf-Score-1", self.calls, requires=("Perf-Score-2",))
+        score_2 = Score("Perf-Score-2", self.calls, requires=("Perf-Score-1",))
+        with self.assertRaises(ValueError):
+            ExecutionPlan([score_1, score_2])
+
+    def test_select(self):
+        plan = ExecutionPlan(
+            [Indicator("Perf-A", self.calls), Indicator("Perf-B", self.calls)]
+        )
+        requested = frozenset({"perf-b", "perf-a", "perf-c"})
+        self.assertEqual(plan.select(requested), (0, 1))
+        self.assertIs(plan.select(requested), plan.select(requested))
+        self.assertEqual(plan.select(frozenset()), ())
+
+    def test_duplicate(self):
+        with self.assertRaises(ValueError):
+            ExecutionPlan(
+                [Indicator("Perf-A", self.calls), Indicator("perf-a", self.calls)]
+            )
+
+    def test_requirements(self):
+        score_1 = Score("Perf-Score-1", self.calls, requires=("Perf-Score-2",))
+        score_2 = Score("Perf-Score-2", self.calls, requires=("perf-b",))
+        plan = ExecutionPlan(
+            [
+                score_1,
+                score_2,
+                Indicator("Perf-A", self.calls),
+                Indicator("Perf-B", self.calls),
+            ]
+        )
+        self.assertEqual(plan.select(frozenset({"perf-score-1"})), (1, 2, 3))
+        self.assertEqual(plan.select(frozenset({"perf-score-2", "perf-a"})), (0, 1, 2))
+
+
+class SustainablePlanTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.calls = []
+        self.app = Flask(__name__)
+        self.sustainable = Sustainable(self.app)
+        # The score is registered before the indicator it requires
+        self.sustainable.add_score(
+            Score("Perf-Score-1", self.calls, requires=("Perf-A",))
+        )
+        self.sustainable.add_indicators(
+            Indicator("Perf-A", self.calls), Indicator("Perf-B", self.calls)
+        )
+
+        @self.app.route("/", methods=["GET", "OPTIONS"])
+        def _():
+            self.calls.append("view")
+            return flask.make_response("Welcome!")
+
+    def test_order(self):
+        with self.app.test_client() as client:
+            client.get("/", headers={"Perf": "Perf-Score-1, Perf-A"})
+        self.assertEqual(
+            self.calls,
+            ["before Perf-A", "view", "after Perf-A", "after Perf-Score-1"],
+        )
+
+    def test_requirements(self):
+        with self.app.test_client() as client:
+            response = client.get("/", headers={"Perf": "Perf-Score-1"})
+        self.assertEqual(
+            self.calls,
+            ["before Perf-A", "view", "after Perf-A", "after Perf-Score-1"],
+        )
+        # The required indicator isn't requested
+        self.assertIn("Perf-Score-1", response.headers)
+        self.assertNotIn("Perf-A", response.headers)
+
+    def test_duplicate(self):
+        plan = self.sustainable._plan
+        with self.assertRaises(ValueError):
+            self.sustainable.add_indicator(Indicator("perf-a", self.calls))
+        self.assertIs(self.sustainable._plan, plan)
+
+    def test_options(self):
+        with self.app.test_client() as client:
+            response = client.options("/")
+        self.assertEqual(
+            response.headers["Access-Control-Allow-Headers"],
+            "Perf-A, Perf-B, Perf-Score-1",
+        )
+
+    def test_cycle(self):
+        self.sustainable.add_score(
+            Score("Perf-Score-2", self.calls, requires=("Perf-Score-3",))
+        )
+        with self.assertRaises(ValueError):
+            self.sustainable.add_score(
+                Score("Perf-Score-3", self.calls, requires=("Perf-Score-2",))
+            )
+        # The plan is unchanged
+        self.assertNotIn("perf-score-3", self.sustainable._plan.index)
@@ -0,0 +1,131 @@
+"""Class test for precompress.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import brotli
+import flask
+from flask import Flask
+
+from flask_sustainable.compress import Compression
+from flask_sustainable.extension import Sustainable
+from flask_sustainable.precompress import precompress_folder
+
+
+class PrecompressTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.script = b"console.log('Welcome!');\n" * 100
+        with open(os.path.join(self.directory.name, "app.js"), "wb") as file:
+            file.write(self.script)
+        with open(os.path.join(self.directory.name, "image.png"), "wb") as file:
+            file.write(b"\x89PNG" * 1000)
+        self.app = Flask(
+            __name__, static_folder=self.directory.name, static_url_path="/static"
+        )
+        Sustainable(self.app)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_folder(self):
+        written = precompress_folder(self.directory.name)
+        self.assertEqual(written, 3)
+        files = sorted(os.listdir(self.directory.name))
+        self.assertEqual(
+            files, ["app.js", "app.js.br", "app.js.gz", "app.js.zst", "image.png"]
+        )
+        # The siblings are up to date
+        self.assertEqual(precompress_folder(self.directory.name), 0)
+        self.assertEqual(precompress_folder(self.directory.name, force=True), 3)
+
+    def test_command(self):
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=["sustainable", "precompress", "-e", "gzip"])
+        self.assertIn("1 files written", result.output)
+        path = os.path.join(self.directory.name, "app.js.gz")
+        with open(path, "rb") as file:
+            self.assertEqual(gzip.decompress(file.read()), self.script)
+
+    def test_serve(self):
+        precompress_folder(self.directory.name)
+        with self.app.test_client() as client, mock.patch.object(
+            Compression, "make_response"
+        ) as make_response:
+            response = client.get("/static/app.js", headers={"Accept-Encoding": "br"})
+            self.assertEqual(response.content_encoding, "br")
+            self.assertIn("javascript", response.mimetype)
+            self.assertIn("Accept-Encoding", response.vary)
+            self.assertEqual(brotli.decompress(response.data), self.script)
+            # Nothing is compressed on the fly
+            make_response.assert_not_called()
+            response.close()
+
+    def test_fallback(self):
+        precompress_folder(self.directory.name, encodings=("gzip",))
+        with self.app.test_client() as client:
+            response = client.get("/static/app.js", headers={"Accept-Encoding": "br"})
+            self.assertEqual(response.content_encoding, "br")
+            self.assertEqual(brotli.decompress(response.data), self.script)
+            response = client.get(
+                "/static/app.js", headers={"Accept-Encoding": "identity"}
+            )
+            self.assertIsNone(response.content_encoding)
+            self.assertEqual(response.data, self.script)
+            response.close()
+
+    def test_before_request_hooks(self):
+        precompress_folder(self.directory.name)
+
+        @self.app.before_request
+        def _():
+            if "Authorization" not in flask.request.headers:
+                flask.abort(403)
+
+        with self.app.test_client() as client:
+            for encoding in ("gzip", "br", "identity"):
+                with self.subTest(encoding=encoding):
+                    response = client.get(
+                        "/static/app.js", headers={"Accept-Encoding": encoding}
+                    )
+                    self.assertEqual(response.status_code, 403)
+                    self.assertIsNone(response.content_encoding)
+            response = client.get(
+                "/static/app.js",
+                headers={"Accept-Encoding": "gzip", "Authorization": "token"},
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(gzip.decompress(response.data), self.script)
+            response.close()
+
+    def test_stale_sibling(self):
+        precompress_folder(self.directory.name, encodings=("gzip", "br"))
+        path = os.path.join(self.directory.name, "app.js")
+        script = b"console.log('Updated!');\n" * 100
+        with open(path, "wb") as file:
+            file.write(script)
+        with open(path + ".gz", "wb") as file:
+            file.write(gzip.compress(script))
+        # The brotli sibling is older than the file, the gzip one is fresh
+        mtime = os.path.getmtime(path)
+        os.utime(path + ".br", (mtime - 10, mtime - 10))
+        os.utime(path + ".gz", (mtime + 10, mtime + 10))
+        with self.app.test_client() as client, mock.patch.object(
+            Compression, "make_response"
+        ) as make_response:
+            response = client.get("/static/app.js", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(gzip.decompress(response.data), script)
+            make_response.assert_not_called()
+            response.close()
+        with self.app.test_client() as client:
+            # The stale sibling is ignored, the file is compressed on the fly
+            response = client.get("/static/app.js", headers={"Accept-Encoding": "br"})
+            self.assertEqual(response.content_encoding, "br")
+            self.assertEqual(brotli.decompress(response.data), script)
+            response.close()
@@ -0,0 +1,128 @@
+"""Class test for prometheus.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from flask import Flask
+
+from flask_sustainable import Sustainable
+from flask_sustainable.compress import CompressionPolicy
+from flask_sustainable.indicator import PerfCPU, PerfTime
+from flask_sustainable.prometheus import PrometheusMetrics
+
+#: A worker sending requests (argument: the number), or scraping the metrics
+WORKER = """
+import sys
+from flask import Flask
+from flask_sustainable import Sustainable
+from flask_sustainable.compress import CompressionPolicy
+from flask_sustainable.indicator import PerfTime
+from flask_sustainable.prometheus import PrometheusMetrics
+
+app = Flask(__name__)
+sustainable = Sustainable(
+    app,
+    prometheus=PrometheusMetrics(),
+    compress_policy=CompressionPolicy(min_size=100),
+)
+sustainable.add_indicator(PerfTime())
+app.add_url_rule("/", "index", lambda: "Welcome!" * 100)
+client = app.test_client()
+if sys.argv[1] == "scrape":
+    print(client.get("/metrics").get_data(as_text=True))
+else:
+    for _ in range(int(sys.argv[1])):
+        client.get("/", headers={"Perf": "Perf-Time", "Accept-Encoding": "gzip"})
+"""
+
+
+@unittest.skipIf(
+    importlib.util.find_spec("prometheus_client") is None,
+    "prometheus_client is not installed",
+)
+class PrometheusMetricsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        self.prometheus = PrometheusMetrics()
+        self.sustainable = Sustainable(
+            self.app,
+            prometheus=self.prometheus,
+            compress_policy=CompressionPolicy(min_size=100),
+        )
+        self.sustainable.add_indicators(PerfTime(), PerfCPU())
+
+        @self.app.route("/")
+        def index():
+            return "Welcome!" * 100
+
+        @self.app.route("/small")
+        def small():
+            return "Welcome!"
+
+    def get_metrics(self, client) -> str:
+        return client.get("/metrics").get_data(as_text=True)
+
+    def test_metrics(self):
+        with self.app.test_client() as client:
+            client.get("/", headers={"Perf": "Perf-Time", "Accept-Encoding": "gzip"})
+            client.get("/small", headers={"Accept-Encoding": "gzip"})
+            metrics = self.get_metrics(client)
+        self.assertIn(
+            'sustainable_request_time_milliseconds_count{endpoint="index"} 1.0',
+            metrics,
+        )
+        self.assertNotIn("sustainable_request_cpu_milliseconds_count", metrics)
+        self.assertIn(
+            'sustainable_compression_input_bytes_total{encoding="gzip"} 800.0', metrics
+        )
+        self.assertIn('sustainable_compression_seconds_count{encoding="gzip"}', metrics)
+        self.assertIn('sustainable_compression_skipped_total{reason="size"}', metrics)
+
+    def test_stream(self):
+        @self.app.route("/stream")
+        def stream():
+            return self.app.response_class(
+                (b"Welcome!" for _ in range(100)), mimetype="text/plain"
+            )
+
+        with self.app.test_client() as client:
+            client.get("/stream", headers={"Accept-Encoding": "gzip"}).get_data()
+            metrics = self.get_metrics(client)
+        self.assertIn(
+            'sustainable_compression_input_bytes_total{encoding="gzip"} 800.0', metrics
+        )
+
+    def test_multiprocess(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # The directory is set before prometheus_client is imported
+            env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory}
+
+            def run(argument: str) -> str:
+                return subprocess.run(
+                    [sys.executable, "-c", WORKER, argument],
+                    capture_output=True,
+                    check=True,
+                    env=env,
+                    text=True,
+                ).stdout
+
+            run("1")
+            run("2")
+            self.assertTrue(any(x.endswith(".db") for x in os.listdir(directory)))
+            metrics = run("scrape")
+        # The values of both workers are aggregated
+        self.assertIn(
+            'sustainable_request_time_milliseconds_count{endpoint="index"} 3.0',
+            metrics,
+        )
+        self.assertIn(
+            'sustainable_compression_input_bytes_total{encoding="gzip"} 2400.0',
+            metrics,
+        )
@@ -0,0 +1,116 @@
+"""Class test for sampling.py module."""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from flask_sustainable import Sustainable
+from flask_sustainable.indicator import PerfCPU, PerfTime
+from flask_sustainable.metrics import MetricsAggregator
+from flask_sustainable.sampling import RateSampler, ReservoirSampler
+
+
+class RateSamplerTestCase(unittest.TestCase):
+    def test_rate(self):
+        sampler = RateSampler(rate=0, rates={"index": 1})
+        self.assertIsNone(sampler.sample("other"))
+        self.assertEqual(sampler.sample("index"), 0)
+        aggregator = MetricsAggregator()
+        sampler.record(0, "index", {"Perf-Time": 2.0}, aggregator)
+        self.assertEqual(aggregator.snapshot()["index"]["Perf-Time"]["count"], 1)
+
+
+class ReservoirSamplerTestCase(unittest.TestCase):
+    def test_reservoir(self):
+        sampler = ReservoirSampler(size=10, window=3600)
+        aggregator = MetricsAggregator()
+        sampled = 0
+        for _ in range(1000):
+            token = sampler.sample("index")
+            if token is not None:
+                self.assertEqual(token[0], 0)
+                self.assertLess(token[1], 10)
+                sampler.record(token, "index", {"Perf-Time": 1.0}, aggregator)
+                sampled += 1
+        # The first requests fill the reservoir, then the probability decreases:
+        # about 10 * (1 + ln(1000 / 10)) = 56 requests are measured
+        self.assertGreaterEqual(sampled, 10)
+        self.assertLess(sampled, 120)
+        # Nothing is recorded until the window is over
+        self.assertEqual(aggregator.snapshot(), {})
+        sampler.flush()
+        self.assertEqual(aggregator.snapshot()["index"]["Perf-Time"]["count"], 10)
+
+    def test_window(self):
+        sampler = ReservoirSampler(size=2, window=60)
+        aggregator = MetricsAggregator()
+        sampler.record(sampler.sample("index"), "index", {"Perf-Time": 1}, aggregator)
+        with mock.patch("time.monotonic", return_value=sampler._end + 1):
+            self.assertEqual(sampler.sample("index"), (1, 0))
+        self.assertEqual(aggregator.snapshot()["index"]["Perf-Time"]["count"], 1)
+
+    def test_timer(self):
+        sampler = ReservoirSampler(size=2, window=0.05)
+        aggregator = MetricsAggregator()
+        sampler.record(sampler.sample("index"), "index", {"Perf-Time": 1}, aggregator)
+        # No request follows the window
+        time.sleep(0.3)
+        self.assertEqual(aggregator.snapshot()["index"]["Perf-Time"]["count"], 1)
+        # The window is recorded once
+        sampler.flush()
+        self.assertEqual(aggregator.snapshot()["index"]["Perf-Time"]["count"], 1)
+
+    def test_flush_before_record(self):
+        sampler = ReservoirSampler(size=1, window=3600)
+        aggregator = MetricsAggregator()
+        stale = sampler.sample("index")
+        sampler.flush()
+        token = sampler.sample("index")
+        self.assertEqual(token, (1, 0))
+        sampler.record(token, "index", {"Perf-Time": 2.0}, aggregator)
+        # The request sampled in the previous window ends after the flush
+        sampler.record(stale, "index", {"Perf-Time": 1.0}, aggregator)
+        sampler.flush()
+        metric = aggregator.snapshot()["index"]["Perf-Time"]
+        self.assertEqual(metric["count"], 1)
+        self.assertEqual(metric["sum"], 2.0)
+
+
+class SustainableSamplingTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        self.sustainable = Sustainable(self.app, sampling=RateSampler(rate=1))
+        self.sustainable.add_indicators(PerfTime(), PerfCPU())
+
+        @self.app.route("/")
+        def index():
+            return "Welcome!"
+
+    def test_sampled(self):
+        with self.app.test_client() as client:
+            response = client.get("/")
+            self.assertNotIn("Perf-Time", response.headers)
+            response = client.get("/", headers={"Perf": "Perf-CPU"})
+            self.assertNotIn("Perf-Time", response.headers)
+            self.assertIn("Perf-CPU", response.headers)
+        metrics = self.sustainable.metrics.snapshot()
+        self.assertEqual(metrics["index"]["Perf-Time"]["count"], 2)
+        self.assertEqual(metrics["index"]["Perf-CPU"]["count"], 2)
+
+    def test_not_sampled(self):
+        self.sustainable._sampling.rate = 0
+        with self.app.test_client() as client:
+            response = client.get("/", headers={"Perf": "Perf-Time"})
+        self.assertIn("Perf-Time", response.headers)
+        # The values requested by the client are aggregated too
+        metrics = self.sustainable.metrics.snapshot()
+        self.assertEqual(list(metrics["index"]), ["Perf-Time"])
+        self.sustainable._metrics_requested = False
+        with self.app.test_client() as client:
+            client.get("/", headers={"Perf": "Perf-Time"})
+        self.assertEqual(self.sustainable.metrics.get("index", "Perf-Time")["count"], 1)
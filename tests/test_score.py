@@ -4,11 +4,12 @@
 # pylint: disable=missing-function-docstring
 
 import unittest
+from unittest import mock
 
 from flask import Flask
 
 from flask_sustainable import Sustainable
-from flask_sustainable.indicator import PerfEnergy
+from flask_sustainable.indicator import PerfEnergy, PerfPower
 from flask_sustainable.score import PerfScoreCO2
 
 
@@ -35,3 +36,27 @@ class PerfScore2TestCase(unittest.TestCase):
             response = client.get("/", headers={"perf": "perf-energy,perf-score-1"})
             print(response.headers)
             self.assertIsNotNone(response.headers.get(PerfScoreCO2.name))
+
+    def test_requirement(self):
+        self.sustainable.add_indicator(PerfEnergy())
+        with self.app.test_client() as client:
+            response = client.get("/", headers={"perf": "perf-score-1"})
+        self.assertIsNotNone(response.headers.get(PerfScoreCO2.name))
+        self.assertIsNone(response.headers.get(PerfEnergy.name))
+
+    def test_power(self):
+        self.sustainable.add_indicator(PerfPower())
+        with self.app.test_client() as client, mock.patch("logging.warning") as warn:
+            response = client.get("/", headers={"perf": "perf-power,perf-score-1"})
+        warn.assert_not_called()
+        self.assertIsNotNone(response.headers.get(PerfScoreCO2.name))
+
+    def test_carbon_intensity(self):
+        app = Flask(__name__)
+        app.add_url_rule("/", view_func=lambda: "Welcome!")
+        sustainable = Sustainable(app)
+        sustainable.add_indicator(PerfEnergy())
+        sustainable.add_score(PerfScoreCO2(carbon_intensity=0))
+        with app.test_client() as client:
+            response = client.get("/", headers={"perf": "perf-energy,perf-score-1"})
+        self.assertEqual(float(response.headers[PerfScoreCO2.name]), 0)